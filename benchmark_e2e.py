@@ -0,0 +1,290 @@
+"""
+Offline end-to-end benchmark of ChatService.process_message.
+
+Usage:
+    python benchmark_e2e.py [--iterations 5] [--llm-latency-ms 300] [--out bench_e2e.json]
+                            [--compare previous.json] [--real-rag] [--units 10000]
+
+Runs a fixed corpus of English, Arabic and Franco turns (unit search, payment
+plan, policy RAG, chit-chat) through the real chat pipeline with:
+- a deterministic fake LLM (fake_llm.py) with configurable latency and scripted
+  tool calls, instead of OpenAI;
+- the local SQLite stand-in database (generated on first run), instead of MySQL;
+- canned policy retrieval with --rag-latency-ms (or the real RAG store with --real-rag).
+
+For every turn it reports total and per-stage latency (p50/p95 over the
+iterations) and Python allocations (tracemalloc, in a separate pass so tracing
+does not skew the timings). Stage times are inclusive: "sql_generation" contains
+its LLM call, "agent_invoke" contains the tools. Results are written as JSON;
+--compare prints the change against an earlier run, e.g. of the previous commit.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# The benchmark never talks to the live services
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+
+from config import settings
+from fake_llm import FakeChatModel, install_fake_llm
+
+CORPUS = [
+    # (turn id, language, kind, message, orchestrator route)
+    ("en_search", "en", "search", "Show me apartments with 3 bedrooms under 10 million", "call_sql_agent"),
+    ("en_payment", "en", "payment_plan", "What is the payment plan for unit 100123?", "call_sql_agent"),
+    ("en_rag", "en", "rag", "What is the cancellation and refund policy?", "call_rag_agent"),
+    ("en_chat", "en", "chat", "Hello, who are you?", "call_chat_agent"),
+    ("ar_search", "ar", "search", "عايز شقة 3 غرف أقل من 8 مليون", "call_sql_agent"),
+    ("ar_payment", "ar", "payment_plan", "ايه خطة السداد للوحدة 100123", "call_sql_agent"),
+    ("ar_rag", "ar", "rag", "ايه سياسة الاسترداد؟", "call_rag_agent"),
+    ("ar_chat", "ar", "chat", "مرحبا، انت مين؟", "call_chat_agent"),
+    ("franco_search", "franco", "search", "3ayez sha2a 3 owd a2al men 8 milyon", "call_sql_agent"),
+    ("franco_payment", "franco", "payment_plan", "eh el payment plan le unit 100123", "call_sql_agent"),
+    ("franco_rag", "franco", "rag", "eh el refund policy 3andoko?", "call_rag_agent"),
+    ("franco_chat", "franco", "chat", "ezayak, enta meen?", "call_chat_agent"),
+]
+
+# (module, attribute, stage name) of the functions timed on every call
+TIMED_FUNCTIONS = [
+    ("services.chat_service", "detect_language", "language_detection"),
+    ("services.chat_service", "create_agent", "agent_creation"),
+    ("services.agent_service", "guard_agent", "guard"),
+    ("services.agent_service", "generate_sql_tool", "sql_generation"),
+    ("services.agent_service", "run_sql", "sql_execution"),
+    ("services.agent_service", "_get_payment_plan_impl", "payment_plan"),
+    ("services.agent_service", "translate_segments", "franco_translation"),
+    ("services.chat_service", "sanitize_response", "sanitize"),
+]
+
+
+class StageRecorder:
+    """Collects (stage, seconds) pairs from any thread for the turn being measured."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.append((stage, seconds))
+
+    def take(self) -> dict:
+        with self._lock:
+            samples, self.samples = self.samples, []
+        stages = {}
+        for stage, seconds in samples:
+            stages.setdefault(stage, []).append(seconds)
+        return {stage: {"calls": len(times), "ms": round(sum(times) * 1000, 2)} for stage, times in stages.items()}
+
+    def wrap(self, fn, stage: str):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        timed.__name__ = getattr(fn, "__name__", stage)
+        timed.__doc__ = getattr(fn, "__doc__", None)
+        return timed
+
+
+def instrument(recorder: StageRecorder, args):
+    """Patch the fake LLM, retrieval and stage timers into the services."""
+    import importlib
+    from services import agent_service
+    from services.rag_service import rag_service
+
+    model = install_fake_llm(FakeChatModel(
+        latency_ms=args.llm_latency_ms,
+        ms_per_output_token=args.ms_per_token,
+        routes={message: route for _, _, _, message, route in CORPUS},
+    ))
+    FakeChatModel._generate = recorder.wrap(FakeChatModel._generate, "llm")
+
+    for module_name, attribute, stage in TIMED_FUNCTIONS:
+        module = importlib.import_module(module_name)
+        setattr(module, attribute, recorder.wrap(getattr(module, attribute), stage))
+    agent_service.AgentAdapter.invoke = recorder.wrap(agent_service.AgentAdapter.invoke, "agent_invoke")
+
+    if args.real_rag:
+        rag_service.search = recorder.wrap(rag_service.search, "rag_retrieval")
+    else:
+        policy = open("./data/policy.txt", encoding="utf-8").read()
+        chunks = [policy[i:i + 1000] for i in range(0, min(len(policy), 5000), 1000)]
+        canned = "\n\n".join(f"Chunk {i + 1}:\n{chunk}" for i, chunk in enumerate(chunks))
+
+        def fake_search(query, k=10, language=None, token_budget=None, **kwargs):
+            time.sleep(args.rag_latency_ms / 1000)
+            return canned
+        rag_service.search = recorder.wrap(fake_search, "rag_retrieval")
+    return model
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_turn(chat_service, message: str, session_id: str, verbose: bool):
+    from services.cache_service import response_cache
+
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        response_cache.clear()  # Measure the pipeline, not the response cache
+        start = time.perf_counter()
+        result = chat_service.process_message(session_id, message)
+        elapsed = time.perf_counter() - start
+        chat_service.clear_session(session_id)
+    return elapsed, result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def benchmark(args) -> dict:
+    from services.local_db import generate_inventory
+
+    if not os.path.exists(settings.sqlite_db_path):
+        print(f"Generating local database ({args.units:,} units) at {settings.sqlite_db_path} ...")
+        generate_inventory(settings.sqlite_db_path, n_units=args.units, seed=42)
+
+    recorder = StageRecorder()
+    model = instrument(recorder, args)
+    from services.chat_service import chat_service
+
+    turns = {}
+    for turn_id, language, kind, message, _ in CORPUS:
+        for i in range(args.warmup):
+            run_turn(chat_service, message, f"bench-warmup-{turn_id}-{i}", args.verbose)
+        recorder.take()
+
+        totals, stage_runs, llm_calls, response = [], [], [], None
+        for i in range(args.iterations):
+            calls_before = sum(model.calls.values())
+            elapsed, response = run_turn(chat_service, message, f"bench-{turn_id}-{i}", args.verbose)
+            totals.append(elapsed * 1000)
+            stage_runs.append(recorder.take())
+            llm_calls.append(sum(model.calls.values()) - calls_before)
+
+        # Allocation pass (tracemalloc slows Python down, so it is not timed)
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        run_turn(chat_service, message, f"bench-alloc-{turn_id}", args.verbose)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        recorder.take()
+
+        stages = {}
+        for name in sorted({name for run in stage_runs for name in run}):
+            times = [run[name]["ms"] if name in run else 0.0 for run in stage_runs]
+            stages[name] = {
+                "calls": max(run[name]["calls"] if name in run else 0 for run in stage_runs),
+                "p50_ms": round(statistics.median(times), 2),
+                "mean_ms": round(statistics.mean(times), 2),
+            }
+
+        text = (response or {}).get("response", "") if isinstance(response, dict) else ""
+        usage = (response or {}).get("llm_usage", {}) if isinstance(response, dict) else {}
+        turns[turn_id] = {
+            "language": language,
+            "kind": kind,
+            "message": message,
+            "total_ms": {
+                "p50": round(statistics.median(totals), 2),
+                "p95": round(percentile(totals, 95), 2),
+                "mean": round(statistics.mean(totals), 2),
+                "min": round(min(totals), 2),
+                "max": round(max(totals), 2),
+            },
+            "llm_calls": max(llm_calls),
+            "llm_tokens": usage.get("input_tokens", 0) + usage.get("output_tokens", 0),
+            "llm_calls_by_site": {site: entry["calls"] for site, entry in usage.get("by_call_site", {}).items()},
+            "stages": stages,
+            "alloc_peak_kb": round((peak - before) / 1024, 1),
+            "alloc_retained_kb": round((after - before) / 1024, 1),
+            "response_chars": len(text),
+        }
+        print(f"{turn_id:<16} p50 {turns[turn_id]['total_ms']['p50']:>9.1f} ms | "
+              f"p95 {turns[turn_id]['total_ms']['p95']:>9.1f} ms | LLM calls {max(llm_calls):>2} | "
+              f"peak alloc {turns[turn_id]['alloc_peak_kb']:>8.1f} KB")
+
+    all_p50 = [turn["total_ms"]["p50"] for turn in turns.values()]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "iterations": args.iterations,
+            "llm_latency_ms": args.llm_latency_ms,
+            "ms_per_token": args.ms_per_token,
+            "rag": "real" if args.real_rag else f"canned ({args.rag_latency_ms} ms)",
+            "db": settings.sqlite_db_path,
+        },
+        "summary": {
+            "turns": len(turns),
+            "p50_ms_mean": round(statistics.mean(all_p50), 2),
+            "p50_ms_max": round(max(all_p50), 2),
+            "llm_calls": sum(turn["llm_calls"] for turn in turns.values()),
+            "llm_tokens": sum(turn["llm_tokens"] for turn in turns.values()),
+        },
+        "turns": turns,
+    }
+
+
+def compare(results: dict, previous_path: str):
+    """Print p50 changes against an earlier results file."""
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nChange vs {previous_path} (commit {previous['meta'].get('commit')}):")
+    for turn_id, turn in results["turns"].items():
+        old = previous["turns"].get(turn_id)
+        if not old:
+            continue
+        old_p50, new_p50 = old["total_ms"]["p50"], turn["total_ms"]["p50"]
+        change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0.0
+        print(f"  {turn_id:<16} {old_p50:>9.1f} -> {new_p50:>9.1f} ms ({change:+.1f}%) | "
+              f"LLM calls {old['llm_calls']} -> {turn['llm_calls']}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Offline end-to-end chat benchmark")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="Fixed latency of every LLM call")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Extra latency per output token")
+    parser.add_argument("--rag-latency-ms", type=float, default=40.0, help="Latency of canned retrieval")
+    parser.add_argument("--real-rag", action="store_true", help="Use the real RAG store instead of canned chunks")
+    parser.add_argument("--units", type=int, default=10000, help="Units to generate if the local DB is missing")
+    parser.add_argument("--out", default="bench_e2e.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the services' own output")
+    args = parser.parse_args(argv)
+
+    results = benchmark(args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\nMean p50 {results['summary']['p50_ms_mean']} ms over {results['summary']['turns']} turns "
+          f"-> {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,155 @@
+"""
+Parity check and latency/RSS benchmark: HuggingFace (PyTorch) vs quantized ONNX embeddings.
+
+Usage:
+    python benchmark_embeddings.py [--queries 200] [--min-cosine 0.99]
+
+1. Parity: embeds every chunk of the policy corpus in data/ with both backends and
+   reports the cosine similarity between the two vectors of each chunk. Exits with
+   status 1 if any chunk falls below --min-cosine.
+2. Latency: p50/p95 single-query embedding time per backend.
+3. RSS: resident memory of a fresh process after loading each backend.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from config import settings
+from services.embedding_service import create_huggingface_embeddings, create_onnx_embeddings
+
+DATA_DIR = "./data"
+
+SAMPLE_QUERIES = [
+    "What projects are available?",
+    "who are the shareholders?",
+    "ما هي المشاريع المتاحة",
+    "meen el shareholders?",
+    "How many hours do I have to pay the deposit?",
+    "What documents are needed to reserve a unit?",
+]
+
+BACKENDS = {
+    "huggingface": create_huggingface_embeddings,
+    "onnx": create_onnx_embeddings,
+}
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB."""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # ru_maxrss is KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_policy_chunks() -> list:
+    """Chunk the policy corpus exactly as the RAG rebuild does."""
+    from services.rag_service import RAGService
+
+    service = RAGService()
+    texts = []
+    for file in sorted(os.listdir(DATA_DIR)):
+        path = os.path.join(DATA_DIR, file)
+        if file.lower().endswith(".pdf"):
+            from langchain_community.document_loaders import PyPDFLoader
+            full_text = "\n".join(d.page_content for d in PyPDFLoader(path).load())
+        elif file.lower().endswith(".txt"):
+            full_text = service.load_txt_file(path)
+        else:
+            continue
+        texts.extend(c.page_content for c in service.enhanced_chunk_policy_text(full_text))
+    return texts
+
+
+def parity_check(texts: list, hf, onnx, min_cosine: float) -> dict:
+    import numpy as np
+
+    a = np.asarray(hf.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(onnx.embed_documents(texts), dtype=np.float32)
+    # Both backends return L2-normalized vectors, so the row-wise dot product is the cosine
+    cosines = (a * b).sum(axis=1)
+    return {
+        "chunks": len(texts),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "below_threshold": int((cosines < min_cosine).sum()),
+        "threshold": min_cosine,
+    }
+
+
+def latency(embeddings, n: int) -> dict:
+    # One untimed call so lazy initialization is not counted
+    embeddings.embed_query("warmup")
+    timings = []
+    for i in range(n):
+        query = f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} {i}"
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "mean_ms": round(sum(timings) / len(timings), 2),
+    }
+
+
+def rss_in_subprocess(backend: str) -> float:
+    """Measure RSS after loading a backend in a clean interpreter."""
+    out = subprocess.run(
+        [sys.executable, __file__, "--rss-only", backend],
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])["rss_mb"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--rss-only", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rss_only:
+        embeddings = BACKENDS[args.rss_only]()
+        embeddings.embed_query("warmup")
+        print(json.dumps({"rss_mb": round(current_rss_mb(), 1)}))
+        return 0
+
+    print(f"Model: {settings.embedding_model}")
+    print(f"ONNX model dir: {settings.onnx_model_dir}\n")
+
+    hf = create_huggingface_embeddings()
+    onnx = create_onnx_embeddings()
+
+    texts = load_policy_chunks()
+    parity = parity_check(texts, hf, onnx, args.min_cosine)
+    print(f"Parity over {parity['chunks']} chunks: min cosine {parity['min_cosine']:.4f}, "
+          f"mean {parity['mean_cosine']:.4f}, below {args.min_cosine}: {parity['below_threshold']}")
+
+    results = {"parity": parity, "latency": {}, "rss_mb": {}}
+    for name, embeddings in (("huggingface", hf), ("onnx", onnx)):
+        results["latency"][name] = latency(embeddings, args.queries)
+        results["rss_mb"][name] = rss_in_subprocess(name)
+        print(f"{name:12s} p50 {results['latency'][name]['p50_ms']:7.2f} ms | "
+              f"p95 {results['latency'][name]['p95_ms']:7.2f} ms | RSS {results['rss_mb'][name]:7.1f} MB")
+
+    speedup = results["latency"]["huggingface"]["p50_ms"] / max(results["latency"]["onnx"]["p50_ms"], 1e-6)
+    print(f"\nONNX p50 speedup: {speedup:.1f}x")
+    print(json.dumps(results, indent=2))
+
+    if parity["below_threshold"]:
+        print(f"\n❌ Parity check failed: {parity['below_threshold']} chunks below cosine {args.min_cosine}")
+        return 1
+    print("\n✅ Parity check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Benchmark: response sanitizer vs the former sequential re.sub passes.
+
+Usage:
+    python benchmark_sanitizer.py [--iterations 2000]
+
+Runs both implementations over representative responses (plain policy answers,
+answers with image/video sections, echoed carousel and payment-plan payloads),
+checks their outputs are identical and prints the per-call time of each.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+
+from services.response_sanitizer import sanitize_response
+
+
+def legacy_clean_image_sections(text: str) -> str:
+    """Reference copy of the former ChatService._clean_image_sections (sequential re.sub passes)."""
+    
+    # Remove "#### Images:" or "## Images:" headers
+    text = re.sub(
+        r'(?:^|\n)\s*#{1,4}\s*Images?:\s*(?:\n|$)',
+        '\n',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove "Images:" section with all its content
+    # Matches patterns like:
+    # Images:
+    # ![Unit Image](url)
+    # ![Compound Image](url)
+    text = re.sub(
+        r'(?:^|\n)\s*Images?:\s*\n(?:\s*!\[.*?\]\(.*?\)\s*\n?)*',
+        '',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove patterns like "Unit Image: !View Unit Image" or "Compound Image: !View Compound Image"
+    text = re.sub(
+        r'(?:^|\n)\s*(?:Unit|Compound|Developer|Property)\s*(?:Image|Logo):\s*!\[?(?:View\s*)?.*?(?:Image|Logo)\]?.*?(?:\n|$)',
+        '\n',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove standalone image markdown that might have been missed
+    # Matches: ![Unit Image](url) or ![Compound Image](url) or similar
+    text = re.sub(
+        r'!\[(?:Unit|Compound|Developer|Property)?\s*(?:Image|Logo|Photo).*?\]\(.*?\)',
+        '',
+        text,
+        flags=re.IGNORECASE
+    )
+    
+    # Remove "Unit Image:" and "Compound Image:" labels (with or without URLs)
+    # Matches patterns like:
+    # Unit Image: https://...
+    # Compound Image: https://...
+    text = re.sub(
+        r'(?:^|\n)\s*(?:Unit|Compound|Developer)\s*(?:Image|Logo):\s*(?:https?://\S+)?\s*',
+        '',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove any remaining orphaned "Images:" headers
+    text = re.sub(r'(?:^|\n)\s*Images?:\s*(?:\n|$)', '\n', text, flags=re.IGNORECASE | re.MULTILINE)
+    
+    # ═══════════════════════════════════════════════════════════════
+    # VIDEO CONTENT REMOVAL
+    # ═══════════════════════════════════════════════════════════════
+    
+    # Remove "Video Tour:" section with all its content
+    # Matches patterns like:
+    # Video Tour: https://...
+    # Video Tour: [Watch Video](url)
+    # Watch Video: url
+    text = re.sub(
+        r'(?:^|\n)\s*(?:Video\s*Tour|Watch\s*Video):\s*(?:\[.*?\]\(.*?\)|https?://\S+)?\s*',
+        '',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove standalone video links (markdown or plain URLs)
+    # Matches: [Watch Video](url) or [Video Tour](url)
+    text = re.sub(
+        r'\[(?:Watch\s*Video|Video\s*Tour|View\s*Video).*?\]\(.*?\)',
+        '',
+        text,
+        flags=re.IGNORECASE
+    )
+    
+    # Remove any standalone video URLs (youtube, vimeo, etc.)
+    # This will catch URLs that might be displayed as plain text
+    text = re.sub(
+        r'(?:^|\n|\s)(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be|vimeo\.com|dailymotion\.com)/\S+',
+        '',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Remove any text mentioning "video tour" or "watch video" followed by any content
+    text = re.sub(
+        r'(?:^|\n)\s*(?:video\s*tour|watch\s*video).*?(?:\n|$)',
+        '\n',
+        text,
+        flags=re.IGNORECASE | re.MULTILINE
+    )
+    
+    # Clean up excessive newlines (more than 2)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    
+    # ═══════════════════════════════════════════════════════════════
+    # REMOVE DEBUG MARKERS AND JSON DATA
+    # ═══════════════════════════════════════════════════════════════
+    
+    # 1. Remove ###UNIT_DETAIL###...###END_DETAIL###
+    text = re.sub(
+        r'###UNIT_DETAIL###.*?###END_DETAIL###',
+        '',
+        text,
+        flags=re.DOTALL
+    )
+
+    # 2. Remove <<PROPERTY_CAROUSEL_DATA>> and trailing content
+    text = re.sub(
+        r'<<PROPERTY_CAROUSEL_DATA>>.*$',
+        '',
+        text,
+        flags=re.DOTALL | re.MULTILINE
+    )
+
+    # 3. Remove <<PAYMENT_PLAN_DATA>> and trailing content
+    text = re.sub(
+        r'<<PAYMENT_PLAN_DATA>>.*$',
+        '',
+        text,
+        flags=re.DOTALL | re.MULTILINE
+    )
+
+    # 4. Remove leftover JSON arrays (if any)
+    text = re.sub(
+        r'\[\s*{\s*"unit_id".*?\}\s*\]',
+        '',
+        text,
+        flags=re.DOTALL
+    )
+    
+    text = re.sub(
+        r'\[\s*\{\s*".*?".*?\}\s*\]',
+        '',
+        text,
+        flags=re.DOTALL
+    )
+
+    # Clean up leading/trailing whitespace
+    text = text.strip()
+    
+    return text
+
+
+def _carousel_payload(count: int = 5) -> str:
+    items = [{
+        "option": i,
+        "unit_id": 53198262 + i,
+        "code": f"TM-{i:04d}",
+        "image": f"https://cdn.eshtriaqar.com/compounds/noor_{i}.jpg",
+        "unit_image": f"https://cdn.eshtriaqar.com/units/{53198262 + i}.jpg",
+        "compound_image": f"https://cdn.eshtriaqar.com/compounds/noor_{i}.jpg",
+        "title": "Noor City",
+        "price": f"{4_250_000 + i * 125_000:,} EGP",
+        "has_promo": i % 2 == 0,
+        "promo_text": "10% discount on cash payment" if i % 2 == 0 else "",
+        "area": f"{120 + i * 5} m²",
+        "bedrooms": 3,
+        "bathrooms": 2,
+        "delivery": "2027-06-30",
+        "status": "Available",
+        "developer": "Talaat Moustafa Group",
+        "floor": i,
+        "model": "Apartment Type B",
+        "video_url": f"https://www.youtube.com/watch?v=abc{i}"
+    } for i in range(1, count + 1)]
+    return json.dumps({"count": count, "language": "en", "labels": {"option": "Option"}, "items": items})
+
+
+def sample_responses() -> dict:
+    """Representative agent outputs, keyed by name."""
+    policy_answer = (
+        "The reservation deposit must be paid within 48 hours of booking the unit. "
+        "If the payment is not received in time, the reservation is cancelled automatically "
+        "and the unit becomes available to other customers.\n\n"
+        "Required documents:\n1. National ID copy\n2. Signed reservation form\n3. Deposit receipt\n\n"
+    ) * 4
+    return {
+        "policy_answer": policy_answer,
+        "arabic_answer": "يجب دفع مقدم الحجز خلال 48 ساعة من حجز الوحدة، وإلا يتم إلغاء الحجز تلقائياً.\n\n" * 6,
+        "image_and_video_sections": (
+            "Here are the details of the unit you asked about:\n\n"
+            "#### Images:\n"
+            "![Unit Image](https://cdn.eshtriaqar.com/units/53198262.jpg)\n"
+            "![Compound Image](https://cdn.eshtriaqar.com/compounds/noor.jpg)\n\n"
+            "Unit Image: https://cdn.eshtriaqar.com/units/53198262.jpg\n"
+            "Compound Image: !View Compound Image\n"
+            "- Area: 165 m²\n- Bedrooms: 3\n- Price: 4,250,000 EGP\n\n\n\n"
+            "Video Tour: [Watch Video](https://www.youtube.com/watch?v=abc123)\n"
+            "You can also see it here https://youtu.be/abc123 before visiting.\n"
+            "Watch video of the clubhouse too.\n"
+            "Let me know if you want the payment plan!"
+        ),
+        "echoed_carousel": (
+            "I found 5 properties for you. The frontend shows them below.\n\n"
+            f"<<PROPERTY_CAROUSEL_DATA>>{_carousel_payload()}\n\n"
+            "Video Tour: https://www.youtube.com/watch?v=abc1"
+        ),
+        "payment_plan": (
+            "Here is the payment plan for unit 53198262:\n- Down payment: 10%\n- 8 years installments\n\n"
+            "<<PAYMENT_PLAN_DATA>>" + json.dumps({
+                "unit_id": 53198262, "price": 4250000, "down_payment": 425000,
+                "installments": [{"year": y, "amount": 478125} for y in range(1, 9)]
+            })
+        ),
+        "unit_detail_in_middle": (
+            "Here are the full details:\n\n"
+            "###UNIT_DETAIL###" + json.dumps({
+                "unit_id": 53198262, "video_url": "https://www.youtube.com/watch?v=abc123",
+                "unit_image": "https://cdn.eshtriaqar.com/units/53198262.jpg", "title": "Noor City"
+            }) + "###END_DETAIL###\n\n"
+            "The unit has 3 bedrooms and a private garden.\n\n\n\nDeveloper Logo: https://cdn.eshtriaqar.com/logo.png\n"
+        ),
+        "leftover_json_rows": (
+            "I found these units:\n"
+            '[{"unit_id": 1, "price": 100}, {"unit_id": 2, "price": 200}]\n'
+            "Ask me for details about any of them."
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    mismatches = 0
+    total_legacy = total_new = 0.0
+    for name, text in sample_responses().items():
+        if legacy_clean_image_sections(text) != sanitize_response(text):
+            mismatches += 1
+            print(f"❌ Output differs for {name}")
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            legacy_clean_image_sections(text)
+        legacy_us = (time.perf_counter() - start) / args.iterations * 1e6
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            sanitize_response(text)
+        new_us = (time.perf_counter() - start) / args.iterations * 1e6
+
+        total_legacy += legacy_us
+        total_new += new_us
+        print(f"{name:26s} {len(text):6d} chars | legacy {legacy_us:8.1f} µs | new {new_us:7.1f} µs | "
+              f"{legacy_us / max(new_us, 1e-9):5.1f}x")
+
+    print(f"\nTotal: legacy {total_legacy:.1f} µs | new {total_new:.1f} µs | {total_legacy / max(total_new, 1e-9):.1f}x faster")
+    if mismatches:
+        print(f"❌ {mismatches} outputs differ")
+        return 1
+    print("✅ Outputs identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
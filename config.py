@@ -19,6 +19,40 @@ class Settings(BaseSettings):
     db_host: str = os.getenv("DB_HOST", "")
     db_port: int = int(os.getenv("DB_PORT", "31306"))
     db_name: str = os.getenv("DB_NAME", "eshtri")
+    # "mysql" (live eshtri DB) or "sqlite" (local synthetic stand-in, see generate_local_db.py)
+    db_backend: str = os.getenv("DB_BACKEND", "mysql")
+    sqlite_db_path: str = os.getenv("SQLITE_DB_PATH", "./local_db/eshtri.db")
+    # MySQL connection pool (services/db_pool.py); bursts above max size wait up to the timeout
+    db_pool_min_size: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    db_pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    db_pool_wait_timeout: float = float(os.getenv("DB_POOL_WAIT_TIMEOUT", "5"))  # Seconds
+    db_pool_max_waiters: int = 32  # Requests queued beyond this fail immediately
+    db_pool_validate_after: float = 5.0  # Ping a connection on checkout if idle longer (seconds)
+    db_pool_keepalive_interval: float = 60.0  # Ping idle connections this often (below MySQL wait_timeout)
+    db_pool_max_lifetime: float = 1800.0  # Retire connections older than this when they are returned
+    # Slow-query log with sampled EXPLAIN plans (services/slow_query_log.py, index_advisor.py)
+    enable_slow_query_log: bool = os.getenv("ENABLE_SLOW_QUERY_LOG", "true").lower() == "true"
+    slow_query_log_path: str = os.getenv("SLOW_QUERY_LOG_PATH", "./logs/slow_queries.jsonl")
+    slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", "200"))
+    slow_query_explain_interval: float = 300.0  # EXPLAIN each query shape at most this often (seconds)
+    # SELECT result cache (DatabaseService.execute_query); cleared when the inventory version probe changes
+    enable_sql_cache: bool = os.getenv("ENABLE_SQL_CACHE", "true").lower() == "true"
+    sql_cache_max_entries: int = 2000
+    sql_cache_ttl_seconds: int = int(os.getenv("SQL_CACHE_TTL_SECONDS", "300"))  # Upper bound on staleness
+    sql_cache_version_interval: float = float(os.getenv("SQL_CACHE_VERSION_INTERVAL", "30"))  # Probe at most this often
+    # One cheap aggregate row; any change in its values invalidates the cache (SUM(stat_id) catches status flips)
+    sql_cache_version_query: str = os.getenv(
+        "SQL_CACHE_VERSION_QUERY",
+        "SELECT COUNT(*) AS row_count, MAX(price_update_date) AS last_price_update, SUM(stat_id) AS status_sum "
+        "FROM unit_search_sorting",
+    )
+    # In-memory projection of the search columns that searches run on (services/available_units.py)
+    enable_available_units: bool = os.getenv("ENABLE_AVAILABLE_UNITS", "true").lower() == "true"
+    available_units_refresh_interval: float = float(os.getenv("AVAILABLE_UNITS_REFRESH_INTERVAL", "300"))  # Seconds
+    # Generated SQL validator (services/sql_validator.py)
+    sql_max_limit: int = 5  # LIMIT added to / lowered on generated searches (run_sql shows 5 units)
+    sql_max_offset: int = 100  # Larger OFFSETs are rejected ("show me more" pages with a keyset cursor)
+    sql_name_lookup_ttl: float = 600.0  # Reload region/compound/developer name -> ID pairs this often (seconds)
     
     # RAG Configuration
     rag_db_path: str = os.getenv("RAG_DB_PATH", "./rag_db")
@@ -26,7 +60,17 @@ class Settings(BaseSettings):
     # embedding_model: str = "intfloat/multilingual-e5-large"
     # 🚀 PERFORMANCE: Using smaller/faster model (3x faster than large)
     embedding_model: str = "intfloat/multilingual-e5-base"
-    
+    enable_rag_warmup: bool = True  # Load embeddings + Chroma in the background at startup
+    # "huggingface" (PyTorch) or "onnx" (int8-quantized ONNX Runtime, see export_onnx_model.py)
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "huggingface")
+    onnx_model_dir: str = os.getenv("ONNX_MODEL_DIR", "./models/multilingual-e5-base-onnx-int8")
+    onnx_num_threads: int = 0  # 0 = let onnxruntime decide
+    # "chroma" or "numpy" (exact in-memory dot product + vectorized MMR; returns real cosine scores)
+    rag_search_engine: str = os.getenv("RAG_SEARCH_ENGINE", "chroma")
+    rag_min_relevance_score: float = 0.0  # Drop chunks below this cosine score (numpy engine only)
+    rag_context_token_budget: int = 2000  # Max tokens of retrieved context in the RAG prompt (0 = no limit)
+    query_embedding_cache_mb: int = 16  # LRU budget for cached query vectors (~3 KB each for e5-base)
+
     # LLM Configuration
     llm_model: str = "gpt-4o-mini"
     llm_temperature: float = 0.2
@@ -37,6 +81,12 @@ class Settings(BaseSettings):
     enable_file_logging: bool = False  # Disable per-request file logging for speed
     enable_debug_logging: bool = False  # Disable verbose debug prints for speed
     enable_rag_debug: bool = False  # Disable RAG debug output
+    # Per-request spans (OTLP/JSON lines), see services/tracing_service.py and trace_report.py
+    enable_trace_log: bool = os.getenv("ENABLE_TRACE_LOG", "true").lower() == "true"
+    trace_log_path: str = os.getenv("TRACE_LOG_PATH", "./logs/traces.jsonl")
+    trace_min_duration_ms: float = float(os.getenv("TRACE_MIN_DURATION_MS", "2000"))  # Only keep slow requests
+    trace_max_bytes: int = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))  # Rotate the file past this size
+    trace_backup_count: int = int(os.getenv("TRACE_BACKUP_COUNT", "3"))  # Rotated files kept (traces.jsonl.1, ...)
     
     # Application
     app_title: str = "Eshtri Aqar Chatbot"
@@ -50,6 +100,11 @@ class Settings(BaseSettings):
     max_chat_history_messages: int = 2  # Minimal context for speed
     use_llm_language_detection: bool = False  # Use heuristics only for speed
     enable_safety_guard: bool = False  # Skip safety guard LLM call for speed
+    enable_speculative_rag_prefetch: bool = True  # Retrieve policy chunks while the orchestrator routes
+    enable_sql_short_circuit: bool = True  # End the agent loop at the SQL tool when results go to the carousel
+    # Per-turn LLM budget (0 = unlimited); over budget, optional calls are skipped and the agent loop ends
+    max_llm_calls_per_turn: int = int(os.getenv("MAX_LLM_CALLS_PER_TURN", "12"))
+    max_llm_tokens_per_turn: int = int(os.getenv("MAX_LLM_TOKENS_PER_TURN", "40000"))
     
     @property
     def db_config(self) -> dict:
@@ -85,4 +140,42 @@ COLUMNS = [
     "unit_search_status", "status_text", "financing"
 ]
 
+# Columns each consumer of unit rows reads, used as SELECT lists instead of * (73 columns)
+PROJECTIONS = {
+    # Keyset paging, the language filter, and the indexed ID filters of name matches
+    "search_keys": ["unit_id", "lang_id", "sorting_id", "comp_id", "reg_id", "dev_id"],
+    # Carousel cards (chat_service)
+    "carousel": [
+        "unit_id", "unt_code", "compound_name", "compound_text", "developer_name", "status_text",
+        "area", "room", "bathroom", "floor", "delivery_date", "model_name", "price", "has_promo", "promo_text",
+        "video_url", "unit_image", "compound_image",
+    ],
+    # Unit detail view: the card plus every image
+    "detail": [
+        "unit_id", "unt_code", "compound_name", "compound_text", "developer_name", "status_text",
+        "area", "room", "bathroom", "floor", "delivery_date", "model_name", "price", "has_promo", "promo_text",
+        "video_url", "unit_image", "compound_image",
+        "unit_image2", "sm_unit_image", "developer_logo", "sm_developer_logo", "md_developer_logo",
+    ],
+    # Price and payment terms (UnitRepository.price)
+    "payment": ["unit_id", "price", "compound_name", "has_promo", "promo_text",
+                "down_payment", "payment_plan", "deposit", "monthly_installment"],
+    # Search results as the LLM sees them (no image URLs, logos or internal keys)
+    "llm_summary": [
+        "unit_id", "unt_code", "compound_name", "developer_name", "region_text", "category", "usage_text",
+        "model_name", "area", "room", "bathroom", "floor", "garden_size", "finishing", "delivery_date",
+        "price", "down_payment", "deposit", "monthly_installment", "installment_type", "payment_plan",
+        "has_promo", "promo_text", "status_text",
+    ],
+}
+
+
+def projection(*names: str) -> list:
+    """Columns of the named PROJECTIONS, in order, without repeats."""
+    return list(dict.fromkeys(column for name in names for column in PROJECTIONS[name]))
+
+
+# What a unit search selects: every search-result consumer's columns
+SEARCH_COLUMNS = projection("search_keys", "detail", "llm_summary")
+
 DB_CONFIG = settings.db_config
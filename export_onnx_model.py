@@ -0,0 +1,59 @@
+"""
+Export intfloat/multilingual-e5-base to ONNX and quantize it to int8 for the ONNX embedding backend.
+
+Usage:
+    pip install "optimum[onnxruntime]"
+    python export_onnx_model.py [--model intfloat/multilingual-e5-base] [--out ./models/multilingual-e5-base-onnx-int8]
+
+Then set EMBEDDING_BACKEND=onnx (and ONNX_MODEL_DIR if you changed --out) and verify
+with `python benchmark_embeddings.py`.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from config import settings
+from services.embedding_service import ONNX_MODEL_FILE, TOKENIZER_FILE
+
+
+def export(model_name: str, out_dir: str):
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError as e:
+        print(f"❌ Missing export dependency: {e}")
+        print('Please run: pip install "optimum[onnxruntime]"')
+        sys.exit(1)
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"⏳ Exporting {model_name} to ONNX (fp32)...")
+        model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+        model.save_pretrained(tmp_dir)
+        fp32_path = os.path.join(tmp_dir, "model.onnx")
+
+        print("⏳ Quantizing weights to int8 (dynamic quantization)...")
+        quantize_dynamic(
+            model_input=fp32_path,
+            model_output=os.path.join(out_dir, ONNX_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+
+        # The backend only needs the fast tokenizer file
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(tmp_dir)
+        shutil.copy(os.path.join(tmp_dir, TOKENIZER_FILE), os.path.join(out_dir, TOKENIZER_FILE))
+
+    size_mb = os.path.getsize(os.path.join(out_dir, ONNX_MODEL_FILE)) / (1024 * 1024)
+    print(f"✅ Quantized model written to {out_dir} ({size_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.embedding_model)
+    parser.add_argument("--out", default=settings.onnx_model_dir)
+    args = parser.parse_args()
+    export(args.model, args.out)
@@ -0,0 +1,239 @@
+"""
+Recommend composite indexes from the slow-query log.
+
+Usage:
+    python index_advisor.py [--file logs/slow_queries.jsonl] [--top 5]
+    python index_advisor.py --no-db          # Log only, no row-count estimates
+
+Reads the JSON lines written by services/slow_query_log.py and groups the
+statements by shape. For every table it proposes the composite index that
+serves the most slow executions: equality columns first (the ones most shapes
+filter on lead, so one index serves many shapes by prefix), then one range
+column. Conditions no index can serve, such as LOWER(status_text) NOT IN (...)
+or LIKE '%...%', are listed separately.
+
+With database access (the configured DB_BACKEND) each index is costed. "Rows
+before" is the EXPLAIN rows estimate (SQLite: rows in the range of the index it
+chose), or the table's row count for full scans.
+"Rows after" is a COUNT(*) of the rows matching the conditions the index covers.
+Existing indexes that already start with the proposed columns are skipped
+(with --no-db they are not checked).
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from config import settings
+from services.slow_query_log import parse_predicates, EQUALITY, RANGE, NOT_SARGABLE
+
+UNINDEXABLE_HINTS = {
+    "function": "a function on the column hides it from indexes; store the computed value in its own indexed column",
+    "like_infix": "a leading wildcard cannot use a B-tree index; match a normalized lookup column or a FULLTEXT index",
+    "negation": "NOT / != / NOT IN reads everything else; filter on the positive values instead",
+    "or": "top-level OR: each branch needs its own index (or a UNION)",
+}
+
+
+def load_entries(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def group_queries(entries: List[dict]) -> List[dict]:
+    """One record per query shape: executions, time, a sample statement, its predicates and latest plan."""
+    groups: Dict[str, dict] = {}
+    for entry in entries:
+        group = groups.get(entry["query_id"])
+        if group is None:
+            table, predicates = parse_predicates(entry["sql"])
+            group = groups[entry["query_id"]] = {
+                "query_id": entry["query_id"], "shape": entry["shape"], "table": table,
+                "predicates": predicates, "sql": entry["sql"], "params": entry.get("params"),
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": None,
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        if "plan" in entry:
+            group["plan"] = {key: entry.get(key) for key in ("full_scan", "rows_examined", "keys", "index_columns")}
+    return sorted(groups.values(), key=lambda g: g["total_ms"], reverse=True)
+
+
+def candidate_index(group: dict, frequency: Dict[str, int]) -> List[str]:
+    """Equality columns (most used across the log first), then the most used range column."""
+    equality = {p.column for p in group["predicates"] if p.kind == EQUALITY}
+    ranges = [p.column for p in group["predicates"] if p.kind == RANGE and p.column not in equality]
+    columns = sorted(equality, key=lambda c: (-frequency[c], c))
+    if ranges:
+        columns.append(min(ranges, key=lambda c: (-frequency[c], c)))
+    return columns
+
+
+def recommend(groups: List[dict], db=None) -> List[dict]:
+    """Index recommendations per table, largest estimated rows saved (or slow time served) first."""
+    frequency: Dict[str, int] = defaultdict(int)
+    for group in groups:
+        for predicate in group["predicates"]:
+            if predicate.indexable:
+                frequency[predicate.column] += group["count"]
+
+    candidates: Dict[tuple, dict] = {}
+    for group in groups:
+        if not group["table"]:
+            continue
+        # A plan that uses some index may still read far more rows than needed (e.g. an index on
+        # lang_id alone), so every shape gets a candidate; existing indexes are filtered out below
+        columns = candidate_index(group, frequency)
+        if columns:
+            key = (group["table"], tuple(columns))
+            candidates.setdefault(key, {"table": group["table"], "columns": list(columns), "groups": []})["groups"].append(group)
+
+    # An index also serves every shape whose columns are a prefix of it
+    for key in sorted(candidates, key=lambda k: len(k[1])):
+        for longer in candidates:
+            if longer != key and longer[0] == key[0] and longer[1][:len(key[1])] == key[1] and key in candidates:
+                candidates[longer]["groups"].extend(candidates.pop(key)["groups"])
+                break
+
+    existing = _existing_indexes(db, {table for table, _ in candidates}) if db else {}
+    recommendations = []
+    for (table, columns), candidate in candidates.items():
+        if any(index[:len(columns)] == list(columns) for index in existing.get(table, [])):
+            continue
+        served = candidate["groups"]
+        recommendation = {
+            "table": table,
+            "columns": list(columns),
+            "shapes": len(served),
+            "executions": sum(g["count"] for g in served),
+            "total_ms": sum(g["total_ms"] for g in served),
+            "rows_saved": None,
+            "estimates": [],
+        }
+        if db is not None:
+            saved = 0
+            for group in served:
+                before, after = _rows_before(db, group), _rows_after(db, group, columns)
+                if before is not None and after is not None:
+                    recommendation["estimates"].append((group["query_id"], before, after))
+                    saved += max(0, before - after) * group["count"]
+            recommendation["rows_saved"] = saved
+        recommendations.append(recommendation)
+    recommendations.sort(key=lambda r: (r["rows_saved"] or 0, r["total_ms"]), reverse=True)
+    return recommendations
+
+
+def unindexable_conditions(groups: List[dict]) -> List[tuple]:
+    """(kind, column, executions, example) for conditions no index can serve, most frequent first."""
+    found: Dict[tuple, list] = {}
+    for group in groups:
+        for predicate in group["predicates"]:
+            if predicate.kind in NOT_SARGABLE:
+                entry = found.setdefault((predicate.kind, predicate.column), [0, predicate.text])
+                entry[0] += group["count"]
+    return sorted(((kind, column, count, text) for (kind, column), (count, text) in found.items()),
+                  key=lambda item: item[2], reverse=True)
+
+
+def _existing_indexes(db, tables) -> Dict[str, List[List[str]]]:
+    indexes = {}
+    for table in tables:
+        rows, error = db.execute_query(f"SHOW INDEX FROM `{table}`", use_cache=False)
+        by_name = defaultdict(list)
+        for row in sorted(rows if not error else [], key=lambda r: (r["Key_name"], r["Seq_in_index"])):
+            by_name[row["Key_name"]].append(str(row["Column_name"]).lower())
+        indexes[table] = list(by_name.values())
+    return indexes
+
+
+def _count(db, table: str, conditions: List[str], params) -> Optional[int]:
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f"SELECT COUNT(*) AS n FROM `{table}`{where}"
+    if params and sql.count("%s") != len(params):
+        return None  # Placeholders sit in conditions we dropped
+    rows, error = db.execute_query(sql, tuple(params) if params and "%s" in sql else None, use_cache=False)
+    return None if error or not rows else int(rows[0]["n"])
+
+
+def _rows_before(db, group: dict) -> Optional[int]:
+    plan = group["plan"] or {}
+    if plan.get("rows_examined"):
+        return plan["rows_examined"]
+    if plan.get("index_columns") and not plan.get("full_scan"):
+        # SQLite: rows in the range of the index it chose
+        return _rows_after(db, group, plan["index_columns"])
+    return _count(db, group["table"], [], None)
+
+
+def _rows_after(db, group: dict, columns: List[str]) -> Optional[int]:
+    """Rows the index range would read: the conditions on its leading columns that the shape uses."""
+    by_column = {p.column: p for p in group["predicates"] if p.indexable}
+    covered = []
+    for column in columns:
+        if column not in by_column:
+            break
+        covered.append(by_column[column].text)
+        if by_column[column].kind == RANGE:
+            break
+    return _count(db, group["table"], covered, group["params"])
+
+
+def print_report(groups: List[dict], recommendations: List[dict], top: int):
+    executions = sum(g["count"] for g in groups)
+    print(f"{executions} slow statements, {len(groups)} query shapes\n")
+    print("Slowest shapes (total time):")
+    for group in groups[:top]:
+        plan = group["plan"] or {}
+        scan = "FULL SCAN" if plan.get("full_scan") else ("index " + ",".join(plan.get("keys") or []) if plan else "no plan")
+        print(f"  {group['total_ms']:9.0f} ms  x{group['count']:<4} max {group['max_ms']:7.0f} ms  [{scan}]")
+        print(f"      {group['shape'][:140]}")
+
+    print("\nRecommended indexes:")
+    if not recommendations:
+        print("  (none: every logged shape already uses an index, or filters only on unindexable conditions)")
+    for recommendation in recommendations[:top]:
+        table, columns = recommendation["table"], recommendation["columns"]
+        name = f"idx_{table}_{'_'.join(columns)}"[:64]
+        print(f"  CREATE INDEX {name} ON {table} ({', '.join(columns)});")
+        saved = recommendation["rows_saved"]
+        saved_text = f", ~{saved:,} rows not read" if saved is not None else ""
+        print(f"      serves {recommendation['shapes']} shapes / {recommendation['executions']} executions "
+              f"({recommendation['total_ms']:.0f} ms){saved_text}")
+        for query_id, before, after in recommendation["estimates"][:3]:
+            print(f"      {query_id}: ~{before:,} -> ~{after:,} rows per execution")
+
+    unindexable = unindexable_conditions(groups)
+    if unindexable:
+        print("\nConditions no index can serve:")
+        for kind, column, count, text in unindexable[:top]:
+            print(f"  x{count:<4} {' '.join(text.split())[:90]}")
+            print(f"        {UNINDEXABLE_HINTS[kind]}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=settings.slow_query_log_path, help="Slow-query log (default: SLOW_QUERY_LOG_PATH)")
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--no-db", action="store_true", help="Skip existing-index checks and row estimates")
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_entries(args.file)
+    except FileNotFoundError:
+        print(f"No slow-query log at {args.file} (ENABLE_SLOW_QUERY_LOG / SLOW_QUERY_MS)")
+        return 1
+    db = None
+    if not args.no_db:
+        from services.slow_query_log import slow_query_log
+        from services.database_service import db_service
+        slow_query_log.path = ""  # The estimates' own COUNT(*) queries must not land in the log
+        db = db_service
+    groups = group_queries(entries)
+    print_report(groups, recommend(groups, db), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
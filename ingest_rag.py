@@ -0,0 +1,41 @@
+"""
+Incrementally sync the RAG vector store with the policy files in data/.
+
+Usage:
+    python ingest_rag.py [files ...]
+
+Without arguments every PDF/TXT file in data/ is synced, and chunks of files
+no longer in data/ are removed from the store. With files, only those files are
+added or updated (python ingest_rag.py data/new_policy.pdf); the rest of the
+store is left as it is. Files are parsed in parallel, unchanged chunks keep
+their stored vectors and only new or edited chunks are embedded, so adding one
+policy PDF takes seconds, not a full rebuild.
+"""
+import os
+import sys
+import time
+
+from services.rag_service import rag_service
+
+DATA_DIR = "./data"
+
+
+def main(file_paths):
+    only_these = bool(file_paths)
+    if not file_paths:
+        file_paths = [
+            os.path.join(DATA_DIR, f) for f in sorted(os.listdir(DATA_DIR))
+            if f.lower().endswith((".pdf", ".txt"))
+        ]
+    if not file_paths:
+        print(f"WARNING: No PDF or TXT files found in {DATA_DIR}")
+        return 1
+
+    start = time.perf_counter()
+    rag_service.prepare_rag_from_files(file_paths, only_these=only_these)
+    print(f"✅ Synced {len(file_paths)} files in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -10,9 +10,9 @@ if os.getenv("RENDER"):
         pass
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
@@ -33,6 +33,11 @@ if sys.platform == "win32":
 from config import settings
 from services.chat_service import chat_service
 from services.database_service import db_service
+from services.rag_service import rag_service
+from services.available_units import available_units
+from services.cache_service import response_cache, translation_cache
+from services.metrics_service import metrics
+from services.tracing_service import tracer
 
 
 # Create FastAPI app
@@ -52,6 +57,37 @@ app.add_middleware(
 )
 
 
+def _service_gauges():
+    """Cache hit ratios, DB connection use and open sessions, read at scrape time."""
+    caches = {
+        "response": response_cache,
+        "translation": translation_cache,
+        "query_embedding": rag_service.query_embedding_cache,
+        "sql_result": db_service.result_cache,
+    }
+    cache_stats = {name: cache.stats() for name, cache in caches.items()}
+    pool = db_service.pool_stats()
+    return [
+        ("cache_hit_ratio", "Hit ratio of each in-process cache.", "gauge",
+         [({"cache": name}, stats["hit_ratio"]) for name, stats in cache_stats.items()]),
+        ("cache_entries", "Entries held by each in-process cache.", "gauge",
+         [({"cache": name}, stats["size"]) for name, stats in cache_stats.items()]),
+        ("db_connections", "Database connections by state.", "gauge",
+         [({"backend": pool["backend"], "state": "open"}, pool["size"]),
+          ({"backend": pool["backend"], "state": "in_use"}, pool["in_use"]),
+          ({"backend": pool["backend"], "state": "waiting"}, pool.get("waiting", 0))]),
+        ("db_pool_max_connections", "Configured maximum pool size.", "gauge",
+         [({"backend": pool["backend"]}, pool.get("max_size", pool["size"]))]),
+        ("db_pool_timeouts_total", "Queries that gave up waiting for a pooled connection.", "counter",
+         [({"backend": pool["backend"]}, pool.get("timeouts_total", 0))]),
+        ("active_sessions", "Chat sessions held in memory.", "gauge",
+         [({}, len(chat_service.sessions))]),
+    ]
+
+
+metrics.register_collector(_service_gauges)
+
+
 # Request/Response models
 class ChatRequest(BaseModel):
     message: str
@@ -64,6 +100,8 @@ class ChatResponse(BaseModel):
     sql_logs: list = []
     response_time_ms: float = 0.0
     cache_hit: bool = False
+    trace_id: str = ""  # Also in the X-Trace-Id header; look it up with trace_report.py
+    llm_usage: dict = {}  # LLM calls and tokens of this turn, by call site
 
 
 # Routes
@@ -83,32 +121,47 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe (Render's health check): 503 only while RAG is warming up; degraded still routes."""
+    status = rag_service.readiness()
+    return JSONResponse(status_code=503 if status["status"] == "warming_up" else 200, content=status)
+
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response):
     """
     Process chat message and return response.
     """
-    try:
-        if not request.message or not request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
-        # Process message
-        result = chat_service.process_message(
-            session_id=request.session_id,
-            message=request.message.strip()
-        )
-        
-        return ChatResponse(
-            response=result["response"],
-            detected_language=result.get("detected_language", "en"),
-            sql_logs=result.get("sql_logs", []),
-            response_time_ms=result.get("response_time_ms", 0.0),
-            cache_hit=result.get("cache_hit", False)
-        )
-        
-    except Exception as e:
-        print(f"[ERROR] Chat endpoint error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    with tracer.start_trace("POST /api/chat", **{"http.route": "/api/chat", "session.id": request.session_id}) as root:
+        trace_headers = {"X-Trace-Id": root.trace_id}
+        response.headers.update(trace_headers)
+        try:
+            if not request.message or not request.message.strip():
+                raise HTTPException(status_code=400, detail="Message cannot be empty", headers=trace_headers)
+            
+            # Process message
+            result = chat_service.process_message(
+                session_id=request.session_id,
+                message=request.message.strip()
+            )
+            root.set_attribute("chat.detected_language", result.get("detected_language", "en"))
+            root.set_attribute("chat.cache_hit", result.get("cache_hit", False))
+            
+            return ChatResponse(
+                response=result["response"],
+                detected_language=result.get("detected_language", "en"),
+                sql_logs=result.get("sql_logs", []),
+                response_time_ms=result.get("response_time_ms", 0.0),
+                cache_hit=result.get("cache_hit", False),
+                trace_id=root.trace_id,
+                llm_usage=result.get("llm_usage", {})
+            )
+            
+        except Exception as e:
+            print(f"[ERROR] Chat endpoint error (trace {root.trace_id}): {e}")
+            root.set_error(e)
+            raise HTTPException(status_code=500, detail=str(e), headers=trace_headers)
 
 
 @app.post("/api/clear-session")
@@ -131,6 +184,12 @@ async def test_database():
         raise HTTPException(status_code=500, detail="Database connection failed")
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage latency histograms and service gauges in Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # Mount static files
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -157,7 +216,16 @@ async def startup_event():
     print("=" * 60)
     print(f"Database connection will be tested on first request...")
     # db_service.test_connection()  # Commented out to prevent blocking startup
-    print(f"RAG service initialized (Lazy Loading Enabled)")
+    if settings.enable_rag_warmup:
+        # Runs in a background thread so startup is not blocked; /ready reports when it is done
+        rag_service.start_warmup()
+        print(f"RAG warm-up started in background (check /ready)")
+    else:
+        print(f"RAG service initialized (Lazy Loading Enabled)")
+    if settings.enable_available_units:
+        # Searches use the database directly until the first refresh finishes
+        available_units.start()
+        print(f"Available-units projection loading in background (every {settings.available_units_refresh_interval:.0f}s)")
     print("=" * 60)
     print("Application ready!")
     print("=" * 60)
@@ -2,7 +2,8 @@
 import os
 import json
 import re
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import pytz
 
@@ -15,14 +16,22 @@ except ImportError:
 
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.tools import tool
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 
-from config import settings, COLUMNS, DB_CONFIG
+from config import settings, COLUMNS, PROJECTIONS
 from services.rag_service import rag_service
+from services.context_packer import chunks_for_budget
 from services.database_service import db_service, safe_serialize, DatabaseService
-from services.language_service import detect_language, get_language_instruction, translate_text_logic_func
-import mysql.connector
-from mysql.connector import Error
+from services.repositories import unit_repository
+from services.language_service import detect_language, get_language_instruction, translate_text_logic_func, translate_segments
+from services.result_types import PaymentPlanDetection, SqlResult
+from services.search_pagination import paginated_search, is_show_more_request
+from services.sql_validator import validate_search_sql
+from services.name_resolver import name_resolver
+from services.available_units import available_units, is_available_status, normalize_images
+from services.metrics_service import metrics
+from services.tracing_service import langchain_trace_handler
+from services.llm_usage_service import llm_usage_handler, LLMBudgetExceeded
 
 # Global LLM instance (lazy loaded)
 _llm_instance = None
@@ -36,7 +45,8 @@ def _get_llm():
         _llm_instance = ChatOpenAI(
             model=settings.llm_model, 
             temperature=settings.llm_temperature,
-            request_timeout=30  # 30 second timeout to prevent hanging
+            request_timeout=30,  # 30 second timeout to prevent hanging
+            callbacks=[llm_usage_handler(), langchain_trace_handler()]
         )
     return _llm_instance
 
@@ -122,6 +132,13 @@ class SessionMemory:
         self.language_confidence = None
         self.language_history = []
         self.current_query = None
+        # Speculative RAG retrieval started while the orchestrator routes (see stage_scheduler)
+        self.rag_prefetch = None
+        # Set by a tool whose output is the final answer, ending the agent loop early
+        self.allow_sql_final_result = False
+        self.final_result = None
+        # Filter and keyset position of the last unit search, for "show me more" (see search_pagination)
+        self.search_cursor = None
 
     
     def cleanup_old_sessions(self):
@@ -134,6 +151,58 @@ class SessionMemory:
         if len(self.agent_communications) > 20:
             self.agent_communications = self.agent_communications[-20:]
 
+def _found_units_message(count: int, detected_lang: str) -> str:
+    """Localized "I found N properties" line."""
+    if detected_lang in ['franco', 'franco_arabic']:
+        return f"La2eet {count} units ashanak."
+    elif detected_lang in ['ar', 'arabic']:
+        return f"لقيتلك {count} وحدات."
+    return f"I found {count} properties for you."
+
+
+def _no_more_units_message(detected_lang: str) -> str:
+    """Localized reply when a "show me more" follow-up has no further units."""
+    if detected_lang in ['franco', 'franco_arabic']:
+        return "Mafeesh units tanya b nafs el mowasafat. Gareb t8ayar el bahs?"
+    elif detected_lang in ['ar', 'arabic']:
+        return "مفيش وحدات تانية بنفس المواصفات. تحب تغير البحث؟"
+    return "There are no more properties matching this search. Would you like to change the criteria?"
+
+
+def _no_units_found_message(detected_lang: str) -> str:
+    """Localized reply when a search and its broadened retry both found no units."""
+    if detected_lang in ['franco', 'franco_arabic']:
+        return "Mala2etsh units b el mowasafat di, 7atta ba3d ma wasa3t el bahs. Gareb t8ayar el mante2a aw el mezaneya?"
+    elif detected_lang in ['ar', 'arabic']:
+        return "ملقتش وحدات بالمواصفات دي، حتى بعد ما وسعت البحث. تحب تغير المنطقة أو الميزانية؟"
+    return "I couldn't find any properties matching your criteria, even after checking similar options. Would you like to change the area or budget?"
+
+
+def _search_rejected_message(detected_lang: str) -> str:
+    """Localized reply when the generated search SQL failed the checks twice."""
+    if detected_lang in ['franco', 'franco_arabic']:
+        return "Ma2dertsh a3mel el bahs da. Momken tewsaf el unit b tare2a tanya (el mante2a, 3adad el owad, el se3r)?"
+    elif detected_lang in ['ar', 'arabic']:
+        return "معرفتش أعمل البحث ده. ممكن توصف الوحدة بطريقة تانية (المنطقة، عدد الغرف، السعر)؟"
+    return "I couldn't run that search. Could you describe the unit another way (area, bedrooms, budget)?"
+
+
+def _budget_exhausted_message(detected_lang: str) -> str:
+    """Localized reply when the turn ran out of LLM budget before an answer was ready."""
+    if detected_lang in ['franco', 'franco_arabic']:
+        return "Ma2darsh akamel el talab da delwa2ty. Momken tesa2al tany b soal ab2at?"
+    elif detected_lang in ['ar', 'arabic']:
+        return "لم أتمكن من إكمال هذا الطلب الآن. هل يمكنك إعادة صياغة سؤالك بشكل أبسط؟"
+    return "I couldn't finish this request right now. Could you ask again in a simpler way?"
+
+@metrics.timed("rag_retrieval")
+def rag_search(query: str, language: str, preprocess: bool = True) -> str:
+    """Policy retrieval as the RAG specialist runs it (speculative prefetch skips the LLM preprocessing)."""
+    return rag_service.search(
+        query, k=chunks_for_budget(settings.rag_context_token_budget), language=language,
+        token_budget=settings.rag_context_token_budget, preprocess=preprocess
+    )
+
 # ---------------------------------------------------------
 # TOOLS DEFINITION
 # ---------------------------------------------------------
@@ -213,12 +282,12 @@ Your response:"""
 
 
 
-def detect_payment_plan_request(user_query: str, session_memory: SessionMemory) -> str:
+def detect_payment_plan_request(user_query: str, session_memory: SessionMemory) -> PaymentPlanDetection:
 
 
     """
     Detect if user is asking specifically about payment plans for a unit.
-    Returns JSON with detection result and extracted unit_id if found.
+    Returns the detection result and the extracted unit_id if found.
     """
     
     # Payment plan keywords (comprehensive list for English, Arabic, and Franco-Arabic)
@@ -244,12 +313,12 @@ def detect_payment_plan_request(user_query: str, session_memory: SessionMemory)
     is_payment_query = any(keyword in query_lower for keyword in payment_keywords)
     
     if not is_payment_query:
-        return json.dumps({
-            "is_payment_query": False,
-            "unit_id": None,
-            "confidence": 0.0,
-            "reason": "No payment-related keywords detected"
-        })
+        return PaymentPlanDetection(
+            is_payment_query=False,
+            unit_id=None,
+            confidence=0.0,
+            reason="No payment-related keywords detected"
+        )
     
     # Extract unit_id
     unit_id = None
@@ -295,20 +364,20 @@ def detect_payment_plan_request(user_query: str, session_memory: SessionMemory)
     
     # Build response
     if unit_id:
-        return json.dumps({
-            "is_payment_query": True,
-            "unit_id": unit_id,
-            "confidence": 0.95,
-            "extraction_method": extraction_method,
-            "reason": f"Payment query detected, unit_id extracted via {extraction_method}"
-        })
+        return PaymentPlanDetection(
+            is_payment_query=True,
+            unit_id=unit_id,
+            confidence=0.95,
+            extraction_method=extraction_method,
+            reason=f"Payment query detected, unit_id extracted via {extraction_method}"
+        )
     else:
-        return json.dumps({
-            "is_payment_query": True,
-            "unit_id": None,
-            "confidence": 0.6,
-            "reason": "Payment query detected but couldn't identify specific unit"
-        })
+        return PaymentPlanDetection(
+            is_payment_query=True,
+            unit_id=None,
+            confidence=0.6,
+            reason="Payment query detected but couldn't identify specific unit"
+        )
 
 @tool
 def rag_search_tool(query: str) -> str:
@@ -317,6 +386,7 @@ def rag_search_tool(query: str) -> str:
     return rag_service.search(query, k=settings.rag_chunk_count)
 
 
+@metrics.timed("sql_generation")
 def generate_sql_tool(user_request: str, lang_id: int = 1) -> str:
     """Generate a SQL query (SELECT * with filters) from the user request."""
     
@@ -351,43 +421,69 @@ User request: {user_request}
     return sql
 
 
-def execute_sql_tool(sql: str) -> str:
-    """Execute a SQL query against the database and return rows as JSON string."""
+def run_sql(sql: str, lang_id: Optional[int] = None) -> SqlResult:
+    """Execute a SQL query against the database and return the available units."""
+    # Only bounded single-table searches reach the database (idempotent on already checked SQL)
+    check = validate_search_sql(sql, lang_id=lang_id, lookup=name_resolver)
+    if check.error:
+        return SqlResult(error=check.error)
+
+    # Served from the available-units projection: statuses resolved and images normalized at refresh
+    rows = available_units.search(check.sql)
+    if rows is not None:
+        return SqlResult(rows=rows[:5], fetched_rows=list(rows))
+
     # We use db_service which wraps the connection logic
-    rows, error = db_service.execute_query(sql)
+    rows, error = db_service.execute_query(check.sql)
+    if error:
+        return SqlResult(error=str(error))
+    # ✅ FAIL-SAFE: Python-side filter for unavailable units, then the image fix
+    results = [normalize_images(dict(row)) for row in rows if is_available_status(row.get("status_text"))]
+    # Hard cap to prevent TPM/Rate limit issues
+    return SqlResult(rows=results[:5], fetched_rows=list(rows))
+
+
+def show_more_results(session_memory: SessionMemory) -> Optional[str]:
+    """
+    Next page of the session's last unit search, straight from its keyset cursor
+    (no LLM call). Returns the reply line, or None if there is no search to page.
+    """
+    cursor = session_memory.search_cursor
+    if cursor is None:
+        return None
+    detected_lang = getattr(session_memory, 'detected_language', 'en') or 'en'
+    session_memory.sql_agent_used = True
+    if cursor.exhausted:
+        return _no_more_units_message(detected_lang)
     
-    # Fix image URLs in rows
-    results = []
-    if rows and isinstance(rows, list):
-        for row in rows:
-            # ✅ FAIL-SAFE: Aggressive Python-side filter for unavailable units
-            status = str(row.get("status_text", "")).lower().strip()
-            # Check for any unavailable keywords in status
-            unavailable_keywords = [
-                'reserved', 'sold', 'unavailable', 'locked', 'off market', 'not available',
-                'محجوزة', 'محجوزه', 'مباعة', 'غير متاحة', 'مغلقة', 'مؤقتا', 'محجوز'
-            ]
-            if any(term in status for term in unavailable_keywords):
-                continue
-                
-            # Fix unit_image
-            if row.get("unit_image") and not str(row["unit_image"]).lower().endswith(('.jpg', '.png', '.jpeg', '.webp')):
-                row["unit_image"] = f"{row['unit_image']}.jpg"
-            
-            # Fix compound_image
-            if row.get("compound_image") and not str(row["compound_image"]).lower().endswith(('.jpg', '.png', '.jpeg', '.webp')):
-                row["compound_image"] = f"{row['compound_image']}.jpg"
-            
-            results.append(row)
-        
-        # Hard cap to prevent TPM/Rate limit issues
-        results = results[:5]
-    else:
-        results = rows
+    with metrics.stage("sql_next_page"):
+        results = []
+        # A page the availability filter emptied entirely is skipped (up to 3 pages)
+        for _ in range(3):
+            sql = cursor.next_page_sql()
+            session_memory.last_sql = sql
+            sql_result = run_sql(sql)
+            if sql_result.error:
+                session_memory.search_cursor = None
+                return None
+            cursor.advance(sql_result.fetched_rows)
+            results = sql_result.rows
+            if results or cursor.exhausted:
+                break
+    cursor.page += 1
+    if not results:
+        return _no_more_units_message(detected_lang)
+    
+    session_memory.last_results = results
+    session_memory.new_results_fetched = True
+    if 'unit_id' in results[0]:
+        session_memory.last_unit_id = results[0]['unit_id']
+    return _found_units_message(len(results), detected_lang)
 
-    if error:
-        return json.dumps([{"error": str(error)}])
-    return json.dumps(results, default=safe_serialize)
+
+def execute_sql_tool(sql: str) -> str:
+    """Execute a SQL query against the database and return rows as JSON string."""
+    return run_sql(sql).to_json(columns=PROJECTIONS["llm_summary"])
 
 
 def recall_previous_result(index: int, session_memory: SessionMemory) -> dict:
@@ -727,15 +823,15 @@ def get_unit_price_with_discount(unit_id: int) -> str:
     return format_price_response(price_data)
 
 
-def _discover_discount_for_unit(unit_id: int, cursor, debug_log: list) -> dict:
+def _discover_discount_for_unit(unit_id: int, debug_log: list, all_unit_data: Optional[Dict[str, dict]] = None) -> dict:
     """
     Search ALL tables in the database for the unit_id, collect ALL data,
     and use LLM to intelligently analyze if there's any discount information.
     
     Args:
         unit_id: The unit ID to search for
-        cursor: Active database cursor
         debug_log: List to append debug messages to
+        all_unit_data: {table: row} already read for this unit (read from all tables if None)
         
     Returns:
         dict with keys:
@@ -749,49 +845,14 @@ def _discover_discount_for_unit(unit_id: int, cursor, debug_log: list) -> dict:
     debug_log.append("="*80)
     
     try:
-        # Step 1: Get all tables in the database
-        cursor.execute("SHOW TABLES")
-        all_tables = [list(row.values())[0] for row in cursor.fetchall()]
-        debug_log.append(f"   Total tables to search: {len(all_tables)}")
-        
-        # Step 2: Search ALL tables for unit_id or unt_id columns
-        all_unit_data = {}
-        tables_searched = 0
-        tables_with_data = 0
-        
-        for table in all_tables:
-            try:
-                # Get columns for this table
-                cursor.execute(f"SHOW COLUMNS FROM `{table}`")
-                columns = [col['Field'] for col in cursor.fetchall()]
-                
-                # Check if table has unit_id or unt_id
-                has_unit_id = 'unit_id' in columns
-                has_unt_id = 'unt_id' in columns
-                
-                if has_unit_id or has_unt_id:
-                    tables_searched += 1
-                    
-                    # Try to find the unit
-                    if has_unit_id:
-                        query = f"SELECT * FROM `{table}` WHERE unit_id = {unit_id} LIMIT 1"
-                    else:
-                        query = f"SELECT * FROM `{table}` WHERE unt_id = {unit_id} LIMIT 1"
-                    
-                    cursor.execute(query)
-                    result = cursor.fetchone()
-                    
-                    if result:
-                        tables_with_data += 1
-                        all_unit_data[table] = result
-                        debug_log.append(f"   ✓ Found data in '{table}' ({len(result)} fields)")
-                        
-            except Exception as e:
-                # Skip tables we can't query
-                continue
+        # Step 1-2: Rows for the unit from every table with a unit_id or unt_id column
+        if all_unit_data is None:
+            all_unit_data = unit_repository.rows_by_table(unit_id)
+        tables_with_data = len(all_unit_data)
+        for table, result in all_unit_data.items():
+            debug_log.append(f"   ✓ Found data in '{table}' ({len(result)} fields)")
         
         debug_log.append(f"\n   📊 Search Summary:")
-        debug_log.append(f"      Tables searched: {tables_searched}")
         debug_log.append(f"      Tables with unit data: {tables_with_data}")
         debug_log.append("")
         
@@ -926,204 +987,181 @@ def _get_payment_plan_impl(unit_id: int) -> str:
     debug_log.append(f"{'='*80}\n")
     
     try:
-        with mysql.connector.connect(**DB_CONFIG) as connection:
-            cursor = connection.cursor(dictionary=True)
-            
-            # STEP 1: DISCOVER ALL TABLES (RESTRICTED LIST)
-            # cursor.execute("SHOW TABLES")
-            # all_tables = [list(row.values())[0] for row in cursor.fetchall()]
-            all_tables = [
-                "bi_unit", "unit_details", "unit_search_engine", 
-                "unit_search_engine2", "unit_search_sorting", "unit_sorting"
-            ]
-            debug_log.append(f"📋 Tables to search: {', '.join(all_tables)}\n")
-            
-            # STEP 2: FIND TABLES WITH unit_id COLUMN
-            tables_with_unit_id = []
-            for table in all_tables:
-                try:
-                    cursor.execute(f"SHOW COLUMNS FROM `{table}`")
-                    columns = [col['Field'] for col in cursor.fetchall()]
-                    if 'unit_id' in columns:
-                        tables_with_unit_id.append({'table': table, 'columns': columns})
-                        debug_log.append(f"✓ Table '{table}' has unit_id column ({len(columns)} total columns)")
-                except Exception as e:
-                    debug_log.append(f"✗ Error checking table '{table}': {str(e)}")
-                    continue
-            
-            debug_log.append(f"\n📊 Found {len(tables_with_unit_id)} tables with unit_id column\n")
-            
-            # STEP 3: SEARCH FOR unit_id ACROSS RELEVANT TABLES
-            all_payment_data = {}
-            for table_info in tables_with_unit_id:
-                table_name = table_info['table']
-                try:
-                    query = f"SELECT * FROM `{table_name}` WHERE unit_id = {unit_id} LIMIT 1"
-                    cursor.execute(query)
-                    result = cursor.fetchone()
-                    if result:
-                        all_payment_data[table_name] = result
-                        debug_log.append(f"✓ Found data in '{table_name}' ({len(result)} fields)")
-                        
-                        # Log payment-related fields
-                        payment_fields = {k: v for k, v in result.items() if any(
-                            keyword in k.lower() for keyword in 
-                            ['price', 'payment', 'down', 'deposit', 'installment', 'plan', 'financing']
-                        )}
-                        if payment_fields:
-                            debug_log.append(f"  💰 Payment fields found:")
-                            for field, value in payment_fields.items():
-                                debug_log.append(f"     - {field}: {value}")
-                    else:
-                        debug_log.append(f"✗ No data in '{table_name}' for unit_id {unit_id}")
-                except Exception as e:
-                    debug_log.append(f"✗ Error querying '{table_name}': {str(e)}")
-                    continue
-            
-            debug_log.append("")
-            
-            # STEP 4: CHECK DATA
-            if not all_payment_data:
-                debug_log.append(f"❌ NO DATA FOUND for unit_id {unit_id}")
-                debug_log.append(f"   Searched {len(tables_with_unit_id)} tables\n")
-                
-                # Save debug log
-                with open("payment_plan_debug.log", "a", encoding="utf-8") as f:
-                    f.write("\n".join(debug_log))
+        # STEP 1-3: THE UNIT'S ROWS (RESTRICTED TABLE LIST FOR THE PLAN ITSELF)
+        # One read of every unit table serves both the payment plan and the discount discovery below
+        all_tables = [
+            "bi_unit", "unit_details", "unit_search_engine", 
+            "unit_search_engine2", "unit_search_sorting", "unit_sorting"
+        ]
+        debug_log.append(f"📋 Tables to search: {', '.join(all_tables)}\n")
+        
+        all_unit_data = unit_repository.rows_by_table(unit_id)
+        tables_with_unit_id = [table for table in all_tables if "unit_id" in unit_repository.columns(table)]
+        debug_log.append(f"📊 Found {len(tables_with_unit_id)} tables with unit_id column\n")
+        
+        all_payment_data = {}
+        for table_name in tables_with_unit_id:
+            result = all_unit_data.get(table_name)
+            if result:
+                all_payment_data[table_name] = result
+                debug_log.append(f"✓ Found data in '{table_name}' ({len(result)} fields)")
                 
-                return json.dumps({
-                    "error": True,
-                    "message": f"No payment plan found for unit ID {unit_id}.",
-                    "searched_tables": len(tables_with_unit_id)
-                })
-            
-            # STEP 5: AGGREGATE FIELDS
-            payment_keywords = [
-                'price', 'payment', 'down', 'deposit', 'installment', 'monthly',
-                'financing', 'plan', 'promo', 'discount', 'cost', 'fee', 'total',
-                'amount', 'financial', 'interest', 'rate', 'duration', 'period',
-                'years', 'months', 'schedule', 'delivery', 'handover'
-            ]
-            merged_data = {}
-            for table_name, data in all_payment_data.items():
-                for key, value in data.items():
-                    if key not in merged_data or (value is not None and merged_data[key].get('value') is None):
-                        merged_data[key] = {'value': value, 'source': table_name}
-            
-            # STEP 6: HELPER FUNCTIONS (define before use)
-            def get_value(field_name):
-                for key, info in merged_data.items():
-                    if key.lower() == field_name.lower():
-                        return info['value']
-                return None
-            
-            def format_currency(value):
-                try:
-                    val = float(value)
-                    if val <= 0: return "Not specified"
-                    return f"{val:,.0f} EGP"
-                except:
-                    return str(value) if value else "Not specified"
-            
-            
-            #  STEP 7: CHECK FOR DISCOUNTS/OFFERS - CROSS-TABLE DISCOVERY
-            original_price = get_value('price')
-            has_promo = None
-            promo_text = None
-            discount_percentage = None
-            discounted_price = None
-            discount_source = None
-            
-            # 7A: CALCULATE PAYMENT PLAN DISCOUNT
-            debug_log.append(f"🎁 PAYMENT PLAN DISCOUNT CHECK:")
-            from services.discount_service import calculate_payment_plan_discount
-            
-            payment_plan_data = {
-                'payment_plan': get_value('payment_plan'),
-                'down_payment': get_value('down_payment')
-            }
+                # Log payment-related fields
+                payment_fields = {k: v for k, v in result.items() if any(
+                    keyword in k.lower() for keyword in 
+                    ['price', 'payment', 'down', 'deposit', 'installment', 'plan', 'financing']
+                )}
+                if payment_fields:
+                    debug_log.append(f"  💰 Payment fields found:")
+                    for field, value in payment_fields.items():
+                        debug_log.append(f"     - {field}: {value}")
+            else:
+                debug_log.append(f"✗ No data in '{table_name}' for unit_id {unit_id}")
+        
+        debug_log.append("")
+        
+        # STEP 4: CHECK DATA
+        if not all_payment_data:
+            debug_log.append(f"❌ NO DATA FOUND for unit_id {unit_id}")
+            debug_log.append(f"   Searched {len(tables_with_unit_id)} tables\n")
             
-            payment_plan_discount = calculate_payment_plan_discount(
-                float(original_price) if original_price else 0,
-                payment_plan_data
-            )
+            # Save debug log
+            with open("payment_plan_debug.log", "a", encoding="utf-8") as f:
+                f.write("\n".join(debug_log))
             
-            if payment_plan_discount:
-                discount_source = "Payment Plan Discount"
-                discount_percentage = payment_plan_discount['discount_percentage']
-                discounted_price = payment_plan_discount['discounted_price']
-                promo_text = payment_plan_discount['description']
-                has_promo = 1
-                
-                debug_log.append(f"   ✓ Payment plan discount found!")
-                debug_log.append(f"   Source: {payment_plan_discount['description']}")
-                debug_log.append(f"   Discount: {discount_percentage}%")
-                debug_log.append(f"   Original price: {original_price:,.0f} EGP")
-                debug_log.append(f"   Discounted price: {discounted_price:,.0f} EGP")
-                debug_log.append(f"   You save: {payment_plan_discount['discount_amount']:,.0f} EGP")
-                debug_log.append("")
+            return json.dumps({
+                "error": True,
+                "message": f"No payment plan found for unit ID {unit_id}.",
+                "searched_tables": len(tables_with_unit_id)
+            })
+        
+        # STEP 5: AGGREGATE FIELDS
+        payment_keywords = [
+            'price', 'payment', 'down', 'deposit', 'installment', 'monthly',
+            'financing', 'plan', 'promo', 'discount', 'cost', 'fee', 'total',
+            'amount', 'financial', 'interest', 'rate', 'duration', 'period',
+            'years', 'months', 'schedule', 'delivery', 'handover'
+        ]
+        merged_data = {}
+        for table_name, data in all_payment_data.items():
+            for key, value in data.items():
+                if key not in merged_data or (value is not None and merged_data[key].get('value') is None):
+                    merged_data[key] = {'value': value, 'source': table_name}
+        
+        # STEP 6: HELPER FUNCTIONS (define before use)
+        def get_value(field_name):
+            for key, info in merged_data.items():
+                if key.lower() == field_name.lower():
+                    return info['value']
+            return None
+        
+        def format_currency(value):
+            try:
+                val = float(value)
+                if val <= 0: return "Not specified"
+                return f"{val:,.0f} EGP"
+            except:
+                return str(value) if value else "Not specified"
+        
+        
+        #  STEP 7: CHECK FOR DISCOUNTS/OFFERS - CROSS-TABLE DISCOVERY
+        original_price = get_value('price')
+        has_promo = None
+        promo_text = None
+        discount_percentage = None
+        discounted_price = None
+        discount_source = None
+        
+        # 7A: CALCULATE PAYMENT PLAN DISCOUNT
+        debug_log.append(f"🎁 PAYMENT PLAN DISCOUNT CHECK:")
+        from services.discount_service import calculate_payment_plan_discount
+        
+        payment_plan_data = {
+            'payment_plan': get_value('payment_plan'),
+            'down_payment': get_value('down_payment')
+        }
+        
+        payment_plan_discount = calculate_payment_plan_discount(
+            float(original_price) if original_price else 0,
+            payment_plan_data
+        )
+        
+        if payment_plan_discount:
+            discount_source = "Payment Plan Discount"
+            discount_percentage = payment_plan_discount['discount_percentage']
+            discounted_price = payment_plan_discount['discounted_price']
+            promo_text = payment_plan_discount['description']
+            has_promo = 1
             
-            # 7B: CHECK FOR PROMOTIONAL DISCOUNT (might stack or override)
-            # FIRST - Search dedicated discount tables (PRIORITY)
-            discount_discovery = _discover_discount_for_unit(unit_id, cursor, debug_log)
+            debug_log.append(f"   ✓ Payment plan discount found!")
+            debug_log.append(f"   Source: {payment_plan_discount['description']}")
+            debug_log.append(f"   Discount: {discount_percentage}%")
+            debug_log.append(f"   Original price: {original_price:,.0f} EGP")
+            debug_log.append(f"   Discounted price: {discounted_price:,.0f} EGP")
+            debug_log.append(f"   You save: {payment_plan_discount['discount_amount']:,.0f} EGP")
+            debug_log.append("")
+        
+        # 7B: CHECK FOR PROMOTIONAL DISCOUNT (might stack or override)
+        # FIRST - Search dedicated discount tables (PRIORITY)
+        discount_discovery = _discover_discount_for_unit(unit_id, debug_log, all_unit_data)
+        
+        if discount_discovery.get('found'):
+            # Use discount from dedicated discount table
+            promo_discount_source = f"Discount Table: {discount_discovery['source_table']}"
+            promo_has_promo = discount_discovery.get('has_promo', 1)
+            promo_promo_text = discount_discovery.get('promo_text')
             
-            if discount_discovery.get('found'):
-                # Use discount from dedicated discount table
-                promo_discount_source = f"Discount Table: {discount_discovery['source_table']}"
-                promo_has_promo = discount_discovery.get('has_promo', 1)
-                promo_promo_text = discount_discovery.get('promo_text')
+            # Check if discount_percentage is directly provided
+            if discount_discovery.get('discount_percentage'):
+                promo_discount_percentage = float(discount_discovery['discount_percentage'])
+                debug_log.append(f"🎁 PROMOTIONAL DISCOUNT FROM DEDICATED TABLE:")
+                debug_log.append(f"   Source: {discount_discovery['source_table']}")
+                debug_log.append(f"   Direct percentage: {promo_discount_percentage}%")
                 
-                # Check if discount_percentage is directly provided
-                if discount_discovery.get('discount_percentage'):
-                    promo_discount_percentage = float(discount_discovery['discount_percentage'])
-                    debug_log.append(f"🎁 PROMOTIONAL DISCOUNT FROM DEDICATED TABLE:")
-                    debug_log.append(f"   Source: {discount_discovery['source_table']}")
-                    debug_log.append(f"   Direct percentage: {promo_discount_percentage}%")
-                    
-                    # Compare promotional vs payment plan discount
-                    if payment_plan_discount:
-                        if promo_discount_percentage > discount_percentage:
-                            debug_log.append(f"   ✓ Promotional discount ({promo_discount_percentage}%) is better than payment plan ({discount_percentage}%)")
-                            discount_source = promo_discount_source
-                            discount_percentage = promo_discount_percentage
-                            discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
-                            promo_text = promo_promo_text
-                            has_promo = promo_has_promo
-                        else:
-                            debug_log.append(f"   ℹ️ Payment plan discount ({discount_percentage}%) is better, keeping it")
-                    else:
-                        # No payment plan discount, use promotional
+                # Compare promotional vs payment plan discount
+                if payment_plan_discount:
+                    if promo_discount_percentage > discount_percentage:
+                        debug_log.append(f"   ✓ Promotional discount ({promo_discount_percentage}%) is better than payment plan ({discount_percentage}%)")
                         discount_source = promo_discount_source
                         discount_percentage = promo_discount_percentage
                         discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
                         promo_text = promo_promo_text
                         has_promo = promo_has_promo
-                
-                # Otherwise try to extract from promo_text
-                elif promo_promo_text and original_price:
-                    try:
-                        discount_match = re.search(r'(\d+)\s*%', str(promo_promo_text))
-                        if discount_match:
-                            promo_discount_percentage = float(discount_match.group(1))
-                            debug_log.append(f"🎁 PROMOTIONAL DISCOUNT FROM DEDICATED TABLE:")
-                            debug_log.append(f"   Source: {discount_discovery['source_table']}")
-                            debug_log.append(f"   Extracted from promo_text: {promo_discount_percentage}%")
-                            
-                            # Compare
-                            if payment_plan_discount:
-                                if promo_discount_percentage > discount_percentage:
-                                    discount_source = promo_discount_source
-                                    discount_percentage = promo_discount_percentage
-                                    discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
-                                    promo_text = promo_promo_text
-                                    has_promo = promo_has_promo
-                            else:
+                    else:
+                        debug_log.append(f"   ℹ️ Payment plan discount ({discount_percentage}%) is better, keeping it")
+                else:
+                    # No payment plan discount, use promotional
+                    discount_source = promo_discount_source
+                    discount_percentage = promo_discount_percentage
+                    discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
+                    promo_text = promo_promo_text
+                    has_promo = promo_has_promo
+            
+            # Otherwise try to extract from promo_text
+            elif promo_promo_text and original_price:
+                try:
+                    discount_match = re.search(r'(\d+)\s*%', str(promo_promo_text))
+                    if discount_match:
+                        promo_discount_percentage = float(discount_match.group(1))
+                        debug_log.append(f"🎁 PROMOTIONAL DISCOUNT FROM DEDICATED TABLE:")
+                        debug_log.append(f"   Source: {discount_discovery['source_table']}")
+                        debug_log.append(f"   Extracted from promo_text: {promo_discount_percentage}%")
+                        
+                        # Compare
+                        if payment_plan_discount:
+                            if promo_discount_percentage > discount_percentage:
                                 discount_source = promo_discount_source
                                 discount_percentage = promo_discount_percentage
                                 discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
                                 promo_text = promo_promo_text
                                 has_promo = promo_has_promo
-                    except Exception as e:
+                        else:
+                            discount_source = promo_discount_source
+                            discount_percentage = promo_discount_percentage
+                            discounted_price = float(original_price) * (1 - promo_discount_percentage / 100)
+                            promo_text = promo_promo_text
+                            has_promo = promo_has_promo
+                except Exception as e:
                         debug_log.append(f"   ⚠️ Error extracting from promo_text: {str(e)}")
                 
                 # Calculate discounted price
@@ -1479,12 +1517,40 @@ IF THE SPECIALIST AGENT RETURNS PROPERTY DATA:
         
         messages.append(HumanMessage(content=enhanced_input))
         
-        # Invoke agent
-        final_state = self.agent.invoke({"messages": messages})
+        # Invoke agent step by step so a tool can end the loop early
+        self.session_memory.final_result = None
+        final_state = {}
+        node_start = time.perf_counter()
+        # The handlers attribute tool calls (LLM usage, trace spans) and enforce the turn's LLM budget
+        config = {"callbacks": [llm_usage_handler(), langchain_trace_handler()]}
+        budget_exceeded = False
+        try:
+            for final_state in self.agent.stream({"messages": messages}, config=config, stream_mode="values"):
+                # Each state follows one graph step; steps ending in an AIMessage are orchestrator LLM calls
+                now = time.perf_counter()
+                state_messages = final_state.get("messages", [])
+                if state_messages and isinstance(state_messages[-1], AIMessage):
+                    metrics.observe("orchestrator_llm", now - node_start)
+                node_start = now
+                if self.session_memory.final_result is not None:
+                    # ⚡ PERFORMANCE: The tool already produced the final answer (e.g. SQL results shown
+                    # in the carousel); stop before the orchestrator's last LLM turn
+                    print(f"[AGENT] Final result from {self.session_memory.final_result['tool']}, skipping final orchestrator turn")
+                    break
+        except LLMBudgetExceeded as e:
+            # Runaway loop or an expensive turn: answer with what the agent has so far
+            print(f"[LLM BUDGET] Ending the agent loop: {e}")
+            budget_exceeded = True
         
         final_messages = final_state.get("messages", [])
-        if final_messages and isinstance(final_messages[-1], AIMessage):
+        if self.session_memory.final_result is not None:
+            output = self.session_memory.final_result["output"]
+        elif final_messages and isinstance(final_messages[-1], AIMessage) and final_messages[-1].content:
             output = final_messages[-1].content
+        elif budget_exceeded:
+            # The last specialist answer, if a tool finished before the budget ran out
+            tool_outputs = [m.content for m in final_messages if isinstance(m, ToolMessage) and getattr(m, "status", "success") != "error"]
+            output = tool_outputs[-1] if tool_outputs else _budget_exhausted_message(detected_lang)
         else:
             output = "I apologize, but I couldn't generate a response."
         
@@ -1498,62 +1564,42 @@ IF THE SPECIALIST AGENT RETURNS PROPERTY DATA:
             arabic_pattern = re.compile(r'[\u0600-\u06FF]+')
             
             if arabic_pattern.search(output):
-                # Extract Arabic portions and translate them
                 # Split response into parts: preserve markers/JSON, translate text
-                parts = []
-                current_pos = 0
-                
-                # Find all special markers to preserve
                 marker_patterns = [
-                    (r'<<PROPERTY_CAROUSEL_DATA>>.*?(?=\n\n|\Z)', 'PRESERVE'),
-                    (r'###UNIT_DETAIL###.*?###END_DETAIL###', 'PRESERVE'),
-                    (r'<<PAYMENT_PLAN_DATA>>.*', 'PRESERVE')
+                    r'<<PROPERTY_CAROUSEL_DATA>>.*?(?=\n\n|\Z)',
+                    r'###UNIT_DETAIL###.*?###END_DETAIL###',
+                    r'<<PAYMENT_PLAN_DATA>>.*'
                 ]
                 
                 # Find positions of all markers
                 marker_positions = []
-                for pattern, preserve_type in marker_patterns:
+                for pattern in marker_patterns:
                     for match in re.finditer(pattern, output, re.DOTALL):
-                        marker_positions.append((match.start(), match.end(), preserve_type))
-                
-                # Sort by position
+                        marker_positions.append((match.start(), match.end()))
                 marker_positions.sort()
                 
-                # Process text between markers
-                for start, end, preserve_type in marker_positions:
-                    # Translate text before this marker
+                # Text between markers, split into paragraphs so identical and
+                # already-Latin paragraphs are not sent to the LLM
+                parts = []
+                translatable = []
+                current_pos = 0
+                for start, end in marker_positions + [(len(output), len(output))]:
                     if current_pos < start:
-                        text_chunk = output[current_pos:start]
-                        if arabic_pattern.search(text_chunk):
-                            try:
-                                text_chunk = translate_text_logic_func(text_chunk, 'ar', 'franco')
-                            except Exception as e:
-                                print(f"[WARNING] Franco translation failed: {e}")
-                        parts.append(text_chunk)
-                    
-                    # Preserve the marker as-is
-                    parts.append(output[start:end])
-                    current_pos = end
+                        for paragraph in re.split(r'(\n{2,})', output[current_pos:start]):
+                            translatable.append(len(parts))
+                            parts.append(paragraph)
+                    if end > current_pos:
+                        parts.append(output[max(start, current_pos):end])
+                    current_pos = max(current_pos, end)
                 
-                # Handle remaining text after last marker
-                if current_pos < len(output):
-                    text_chunk = output[current_pos:]
-                    if arabic_pattern.search(text_chunk):
-                        try:
-                            text_chunk = translate_text_logic_func(text_chunk, 'ar', 'franco')
-                        except Exception as e:
-                            print(f"[WARNING] Franco translation failed: {e}")
-                    parts.append(text_chunk)
+                try:
+                    translated = translate_segments([parts[i] for i in translatable], 'ar', 'franco')
+                    for i, text_chunk in zip(translatable, translated):
+                        parts[i] = text_chunk
+                except Exception as e:
+                    print(f"[WARNING] Franco translation failed: {e}")
                 
-                # Rebuild output
-                if parts:
-                    output = ''.join(parts)
-                else:
-                    # Fallback: translate entire output if no markers found
-                    try:
-                        output = translate_text_logic_func(output, 'ar', 'franco')
-                    except Exception as  e:
-                        print(f"[WARNING] Franco translation failed: {e}")
+                output = ''.join(parts)
         
         return {"output": output}
 
@@ -1581,12 +1627,11 @@ def create_agent(session_memory: SessionMemory):
         detected_lang = getattr(session_memory, 'detected_language', 'en')
         
         # 1. Check Payment Plan
-        pp_check_json = detect_payment_plan_request(query, session_memory)
-        pp_check = json.loads(pp_check_json)  # Parse JSON string to dict
-        if pp_check.get('is_payment_query') and pp_check.get('unit_id'):
+        pp_check = detect_payment_plan_request(query, session_memory)
+        if pp_check.is_payment_query and pp_check.unit_id:
              session_memory.payment_plan_used = True
              session_memory.sql_agent_used = True
-             payment_plan_result = _get_payment_plan_impl(pp_check['unit_id'])
+             payment_plan_result = _get_payment_plan_impl(pp_check.unit_id)
              
              # Translate payment plan if needed
              if detected_lang in ['franco', 'franco_arabic']:
@@ -1598,9 +1643,18 @@ def create_agent(session_memory: SessionMemory):
              
              return payment_plan_result
         
-        # 2. General SQL Search
+        # 2. "Show me more": next page of the last search without generating SQL
+        if session_memory.search_cursor is not None and is_show_more_request(query):
+            page_message = show_more_results(session_memory)
+            if page_message is not None:
+                if session_memory.allow_sql_final_result:
+                    session_memory.final_result = {"tool": "call_sql_agent", "output": page_message}
+                return page_message
+        
+        # 3. General SQL Search
         # Mark SQL agent as used
         session_memory.sql_agent_used = True
+        session_memory.search_cursor = None
         
         # Generate SQL with correct language ID
         # Generate SQL with correct language ID
@@ -1608,22 +1662,46 @@ def create_agent(session_memory: SessionMemory):
         lang_id = 2 if detected_lang in ['ar', 'arabic', 'franco', 'franco_arabic'] else 1
         
         sql = generate_sql_tool(query, lang_id=lang_id)
+        # SELECT-only, LIMIT and lang_id enforced, search columns instead of *, name filters -> indexed IDs
+        check = validate_search_sql(sql, lang_id=lang_id, lookup=name_resolver)
+        if check.error:
+            # Regenerate once with the reason; a second rejection is reported, not searched or broadened
+            print(f"[SQL GUARD] {check.error}; regenerating once")
+            try:
+                sql = generate_sql_tool(f"{query}\n(Your previous query was rejected: {check.error})", lang_id=lang_id)
+                check = validate_search_sql(sql, lang_id=lang_id, lookup=name_resolver)
+            except LLMBudgetExceeded as e:
+                print(f"[LLM BUDGET] Skipping SQL regeneration: {e}")
+            if check.error:
+                return _search_rejected_message(detected_lang)
+        sql = check.sql
+        # Deterministic keyset order, so "show me more" can continue from the last unit shown
+        sql, search_cursor = paginated_search(sql)
         session_memory.last_sql = sql
         
         # Execute
-        result_json = execute_sql_tool(sql)
-        results = json.loads(result_json)
+        sql_result = run_sql(sql, lang_id=lang_id)
+        results = sql_result.to_records()
         
         # Check results
         if not results or (isinstance(results, list) and not results):
              # Fuzzy Search Logic
              # We will try to make the query broader.
-             fuzzy_prompt = f"The previous SQL query returned 0 results. SQL: {sql}. User Query: {query}. Please generate a NEW SQL query that is slightly broader. If there are numeric filters (price, rooms, etc), allow a range of +/- 1 or +/- 10%. Return ONLY the SQL."
-             fuzzy_sql = llm.invoke(fuzzy_prompt).content.strip().replace("```sql", "").replace("```", "").strip()
-             
-             # Execute Fuzzy
-             result_json = execute_sql_tool(fuzzy_sql)
-             results = json.loads(result_json)
+             with metrics.stage("sql_fuzzy_retry"):
+                 fuzzy_prompt = f"The previous SQL query returned 0 results. SQL: {sql}. User Query: {query}. Please generate a NEW SQL query that is slightly broader. If there are numeric filters (price, rooms, etc), allow a range of +/- 1 or +/- 10%. Return ONLY the SQL."
+                 try:
+                     fuzzy_sql = llm.invoke(fuzzy_prompt).content.strip().replace("```sql", "").replace("```", "").strip()
+                     
+                     # Execute Fuzzy
+                     fuzzy_check = validate_search_sql(fuzzy_sql, lang_id=lang_id, lookup=name_resolver)
+                     if fuzzy_check.error:
+                         print(f"[SQL GUARD] Fuzzy retry {fuzzy_check.error}")
+                     else:
+                         fuzzy_sql, search_cursor = paginated_search(fuzzy_check.sql)
+                         sql_result = run_sql(fuzzy_sql, lang_id=lang_id)
+                         results = sql_result.to_records()
+                 except LLMBudgetExceeded as e:
+                     print(f"[LLM BUDGET] Skipping fuzzy retry: {e}")
              
              if results and isinstance(results, list) and len(results) > 0:
                  # Mark this as alternative search result
@@ -1632,6 +1710,9 @@ def create_agent(session_memory: SessionMemory):
                  session_memory.last_results = results
                  if 'unit_id' in results[0]:
                      session_memory.last_unit_id = results[0]['unit_id']
+                 if search_cursor is not None and not sql_result.error:
+                     search_cursor.advance(sql_result.fetched_rows)
+                     session_memory.search_cursor = search_cursor
                  
                  # Try to extract what field was broadened (basic heuristic)
                  # This is a simple check - could be enhanced
@@ -1648,8 +1729,14 @@ def create_agent(session_memory: SessionMemory):
                      if bath_match:
                          session_memory.original_value = bath_match.group(1)
                  
-                 # Return JSON directly - frontend handles display
-                 return result_json
+                 if session_memory.allow_sql_final_result and 'unit_id' in results[0]:
+                     session_memory.final_result = {
+                         "tool": "call_sql_agent",
+                         "output": _found_units_message(len(results), detected_lang)
+                     }
+                 
+                 # Return JSON directly - frontend handles display (carousel from last_results)
+                 return sql_result.to_json(columns=PROJECTIONS["llm_summary"])
              else:
                  # Get language instruction for "no results" message
                  language_instruction = ""
@@ -1664,7 +1751,12 @@ You MUST respond in the EXACT SAME language the user used.
 Tell the user that no properties were found matching their criteria, even after checking for similar options.
 Be apologetic and helpful."""
                  
-                 response = llm.invoke(no_results_prompt).content.strip()
+                 try:
+                     with metrics.stage("sql_no_results"):
+                         response = llm.invoke(no_results_prompt).content.strip()
+                 except LLMBudgetExceeded as e:
+                     print(f"[LLM BUDGET] Using the fixed no-results message: {e}")
+                     response = _no_units_found_message(detected_lang)
                  return response
         
         # Store results in memory for context
@@ -1673,10 +1765,13 @@ Be apologetic and helpful."""
              session_memory.new_results_fetched = True
              if 'unit_id' in results[0]:
                  session_memory.last_unit_id = results[0]['unit_id']
+             if search_cursor is not None and not sql_result.error:
+                 search_cursor.advance(sql_result.fetched_rows)
+                 session_memory.search_cursor = search_cursor
         
-        # Format all zero/null values in results before returning
+        # Format all zero/null values in results before returning (the LLM's columns only)
         formatted_results = []
-        for result in results:
+        for result in sql_result.to_records(columns=PROJECTIONS["llm_summary"]):
             formatted_result = {}
             for key, value in result.items():
                 # Format common fields that might have 0 values (including price)
@@ -1687,11 +1782,12 @@ Be apologetic and helpful."""
             formatted_results.append(formatted_result)
         
         # Return BOTH message AND data to prevent LLM hallucination
-        found_msg = f"I found {len(formatted_results)} properties for you."
-        if detected_lang in ['franco', 'franco_arabic']:
-            found_msg = f"La2eet {len(formatted_results)} units ashanak."
-        elif detected_lang in ['ar', 'arabic']:
-            found_msg = f"لقيتلك {len(formatted_results)} وحدات."
+        found_msg = _found_units_message(len(formatted_results), detected_lang)
+        
+        # The units go to the carousel and the orchestrator's text would be discarded,
+        # so end the agent loop here instead of waiting for its summary
+        if session_memory.allow_sql_final_result and formatted_results and 'unit_id' in formatted_results[0]:
+            session_memory.final_result = {"tool": "call_sql_agent", "output": found_msg}
         
         # Return structured data with clear instructions
         return f"""{found_msg}
@@ -1732,7 +1828,14 @@ CRITICAL: Use ONLY the data above. Do NOT invent or hallucinate any values. Extr
             
         # 4. EXECUTE SEARCH
         try:
-            chunks = rag_service.search(search_query, k=35, language=detected_lang)
+            chunks = None
+            prefetch = session_memory.rag_prefetch
+            if prefetch is not None:
+                session_memory.rag_prefetch = None
+                # None when the speculation could not reproduce the preprocessed search
+                chunks = prefetch.take(f"{detected_lang}:{search_query}")
+            if chunks is None:
+                chunks = rag_search(search_query, detected_lang)
         except Exception as e:
             print(f"[RAG] Search failed: {e}")
             chunks = "Error retrieving documents."
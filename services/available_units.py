@@ -0,0 +1,206 @@
+"""
+Materialized projection of the unit search table for the request path.
+
+A background thread copies unit_search_sorting into a private in-memory SQLite
+table (available_units) every available_units_refresh_interval seconds, and
+sooner when the inventory version changes. Each row is prepared once at refresh:
+
+- only config.SEARCH_COLUMNS are kept (what the carousel, detail view, keyset
+  paging and the LLM reply read), typed and collated like the database
+  (local_db.column_definition) so filters compare the same way;
+- status_text is resolved to is_available (1/0) with UNAVAILABLE_STATUS_TERMS;
+- image URLs get their file extension (normalize_image_url).
+
+run_sql moves checked searches onto the table (sql_validator.rewrite_for_projection
+turns the LOWER(status_text) NOT IN (...) filters into is_available = 1), so
+neither the status filter nor the image fix runs per request. Until the first
+refresh completes, or for searches on columns the projection lacks, run_sql
+queries the database and applies the same functions to each row.
+"""
+import datetime
+import decimal
+import functools
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings, SEARCH_COLUMNS
+from services import local_db
+from services.metrics_service import metrics
+
+AVAILABLE_UNITS_TABLE = "available_units"
+AVAILABLE_COLUMN = "is_available"
+IMAGE_COLUMNS = ("unit_image", "unit_image2", "sm_unit_image", "compound_image",
+                 "developer_logo", "sm_developer_logo", "md_developer_logo")
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg", ".webp")
+# A status containing any of these is not offered to users
+UNAVAILABLE_STATUS_TERMS = (
+    'reserved', 'sold', 'unavailable', 'locked', 'off market', 'not available',
+    'محجوزة', 'محجوزه', 'مباعة', 'غير متاحة', 'مغلقة', 'مؤقتا', 'محجوز',
+)
+INDEXES = (
+    ("lang_id", AVAILABLE_COLUMN, "sorting_id", "unit_id"),
+    ("lang_id", "reg_id"),
+    ("lang_id", "comp_id"),
+    ("lang_id", "room", "price"),
+    ("unit_id",),
+)
+
+
+def is_available_status(status: Any) -> bool:
+    status = str(status or "").lower().strip()
+    return not any(term in status for term in UNAVAILABLE_STATUS_TERMS)
+
+
+def normalize_image_url(url: Any) -> Any:
+    """Image paths are stored without an extension; the CDN serves them as .jpg."""
+    if url and not str(url).lower().endswith(IMAGE_EXTENSIONS):
+        return f"{url}.jpg"
+    return url
+
+
+def normalize_images(row: Dict[str, Any]) -> Dict[str, Any]:
+    for column in IMAGE_COLUMNS:
+        if column in row:
+            row[column] = normalize_image_url(row[column])
+    return row
+
+
+def _sqlite_value(value: Any) -> Any:
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+@functools.lru_cache(maxsize=1024)
+def _projected_sql(sql: str, columns: tuple) -> Optional[str]:
+    """Memoized: parsing costs more than running the query on the projection."""
+    from services.sql_validator import rewrite_for_projection
+    return rewrite_for_projection(sql, AVAILABLE_UNITS_TABLE, columns, AVAILABLE_COLUMN)
+
+
+class AvailableUnitsSnapshot:
+    """In-memory copy of the search columns of every unit, swapped in whole at each refresh."""
+
+    def __init__(self, db, columns: List[str] = SEARCH_COLUMNS, refresh_interval: float = 300.0):
+        self.db = db
+        self.columns = list(columns)
+        self.refresh_interval = refresh_interval
+        self._connection = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._version = None
+        self.rows = 0
+        self.available_rows = 0
+        self.refreshed_at: Optional[float] = None  # time.time() of the last successful refresh
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._connection is not None
+
+    def refresh(self) -> bool:
+        """Rebuild the table from the database; the previous copy keeps serving on failure."""
+        with self._refresh_lock:
+            version = getattr(self.db, "inventory_version", None)
+            start = time.perf_counter()
+            rows, error = self.db.execute_query(
+                f"SELECT {', '.join(self.columns)} FROM unit_search_sorting", use_cache=False)
+            if error:
+                self.failures += 1
+                print(f"[AVAILABLE UNITS] Refresh failed: {error}")
+                return False
+
+            stored = self.columns + [AVAILABLE_COLUMN]
+            records = []
+            for row in rows:
+                normalize_images(row)
+                row[AVAILABLE_COLUMN] = int(is_available_status(row.get("status_text")))
+                records.append(tuple(_sqlite_value(row.get(column)) for column in stored))
+            connection = local_db.connect_memory()
+            definitions = [local_db.column_definition(column) for column in self.columns] + [f"{AVAILABLE_COLUMN} INTEGER"]
+            connection.execute(f"CREATE TABLE {AVAILABLE_UNITS_TABLE} ({', '.join(definitions)})")
+            connection.executemany(
+                f"INSERT INTO {AVAILABLE_UNITS_TABLE} VALUES ({', '.join('?' for _ in stored)})", records)
+            for index in INDEXES:
+                if set(index) <= set(stored):
+                    connection.execute(f"CREATE INDEX idx_{'_'.join(index)} ON {AVAILABLE_UNITS_TABLE} ({', '.join(index)})")
+            connection.execute("ANALYZE")
+
+            with self._lock:
+                previous, self._connection = self._connection, connection
+            if previous is not None:
+                previous.close()
+            self.rows = len(records)
+            self.available_rows = sum(record[-1] for record in records)
+            self.refreshed_at = time.time()
+            self.refreshes += 1
+            self._version = version
+            print(f"[AVAILABLE UNITS] {self.available_rows}/{self.rows} rows available "
+                  f"({(time.perf_counter() - start) * 1000:.0f} ms)")
+            return True
+
+    def search(self, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Rows of a checked search run on the projection, or None if the projection
+        cannot serve it (not loaded yet, a column it lacks, or an error).
+        """
+        if self._connection is None:
+            return None
+        projected = _projected_sql(sql, tuple(self.columns))
+        if projected is None:
+            return None
+        try:
+            with self._lock:
+                return local_db.execute(self._connection, projected)
+        except Exception as e:
+            print(f"[AVAILABLE UNITS] Falling back to the database: {e}")
+            return None
+
+    def start(self):
+        """Refresh now and then periodically in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresh_loop, name="available-units-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            # Searches served here no longer run the probe inside execute_query
+            self.db.check_inventory_version()
+            due = self.refreshed_at is None or time.time() - self.refreshed_at >= self.refresh_interval
+            changed = getattr(self.db, "inventory_version", None) != self._version
+            if due or changed:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.failures += 1
+                    print(f"[AVAILABLE UNITS] Refresh error: {e}")
+            self._stop.wait(min(self.refresh_interval, settings.sql_cache_version_interval))
+
+    def collect(self):
+        """Gauges for metrics.register_collector."""
+        age = time.time() - self.refreshed_at if self.refreshed_at else 0.0
+        return [
+            ("available_units_rows", "Rows in the available-units projection, by availability.", "gauge",
+             [({"available": "true"}, self.available_rows), ({"available": "false"}, self.rows - self.available_rows)]),
+            ("available_units_age_seconds", "Seconds since the projection was last refreshed.", "gauge", [({}, age)]),
+            ("available_units_refresh_failures_total", "Failed projection refreshes.", "counter", [({}, self.failures)]),
+        ]
+
+
+def _default_snapshot() -> AvailableUnitsSnapshot:
+    from services.database_service import db_service
+    return AvailableUnitsSnapshot(db_service, refresh_interval=settings.available_units_refresh_interval)
+
+
+# Global projection (started by main.py when enable_available_units)
+available_units = _default_snapshot()
+metrics.register_collector(available_units.collect)
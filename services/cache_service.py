@@ -1,6 +1,10 @@
 """Response caching service for faster query responses."""
 import hashlib
-from typing import Optional, Dict
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable
 import time
 
 class ResponseCache:
@@ -17,6 +21,8 @@ class ResponseCache:
         self.cache: Dict[str, dict] = {}
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
     
     def _get_key(self, query: str, language: str) -> str:
         """Generate cache key from query + language."""
@@ -44,6 +50,7 @@ class ResponseCache:
             # Check if expired
             age = time.time() - cached_item['timestamp']
             if age < self.ttl_seconds:
+                self.hits += 1
                 print(f"[CACHE] HIT - Query: '{query[:50]}...'")
                 return cached_item['response']
             else:
@@ -51,6 +58,7 @@ class ResponseCache:
                 del self.cache[key]
                 print(f"[CACHE] EXPIRED - Removed stale entry")
         
+        self.misses += 1
         print(f"[CACHE] MISS - Query: '{query[:50]}...'")
         return None
     
@@ -94,12 +102,276 @@ class ResponseCache:
     
     def stats(self) -> dict:
         """Get cache statistics."""
+        lookups = self.hits + self.misses
         return {
             'size': len(self.cache),
             'max_size': self.max_size,
-            'ttl_seconds': self.ttl_seconds
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
         }
 
 
-# Global cache instance
+
+class EmbeddingCache:
+    """
+    LRU cache of query embedding vectors, bounded by memory rather than entry count.
+    
+    Vectors are stored as float32 numpy arrays, so the byte budget is exact.
+    Thread-safe: the RAG warm-up and request threads may embed concurrently.
+    """
+    
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize cache.
+        
+        Args:
+            max_bytes: Memory budget for stored vectors (default: 16 MB)
+        """
+        self.cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query for use as a cache key (Unicode form + whitespace)."""
+        return ' '.join(unicodedata.normalize('NFKC', query).split())
+    
+    def get(self, query: str):
+        """Return the cached vector for a query (and mark it recently used), or None."""
+        key = self.normalize(query)
+        with self._lock:
+            vector = self.cache.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return vector
+    
+    def set(self, query: str, vector) -> Any:
+        """Store a vector, evicting least recently used entries to stay within budget."""
+        import numpy as np
+        
+        array = np.asarray(vector, dtype=np.float32)
+        array.setflags(write=False)  # Shared between requests; never mutate in place
+        key = self.normalize(query)
+        
+        with self._lock:
+            old = self.cache.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old.nbytes
+            if array.nbytes > self.max_bytes:
+                return array
+            
+            while self.cache and self.current_bytes + array.nbytes > self.max_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+            
+            self.cache[key] = array
+            self.current_bytes += array.nbytes
+        return array
+    
+    def get_or_compute(self, query: str, compute: Callable[[str], Any]):
+        """Return the cached vector for a query, computing and storing it on a miss."""
+        vector = self.get(query)
+        if vector is None:
+            vector = self.set(query, compute(self.normalize(query)))
+        return vector
+    
+    def clear(self):
+        """Clear all cached vectors (e.g. after switching embedding models)."""
+        with self._lock:
+            self.cache.clear()
+            self.current_bytes = 0
+    
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class TranslationCache:
+    """
+    LRU cache of LLM translations keyed by (source, target, text).
+    
+    Thread-safe: segments of one response are translated concurrently.
+    """
+    
+    def __init__(self, max_size: int = 2000, ttl_seconds: int = 24 * 3600):
+        """
+        Initialize cache.
+        
+        Args:
+            max_size: Maximum number of cached translations
+            ttl_seconds: Time-to-live for cached translations (default: 1 day)
+        """
+        self.cache: "OrderedDict[str, dict]" = OrderedDict()
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _get_key(text: str, source_lang: str, target_lang: str) -> str:
+        normalized = unicodedata.normalize('NFKC', text).strip()
+        return f"{source_lang}>{target_lang}:{normalized}"
+    
+    def get(self, text: str, source_lang: str, target_lang: str) -> Optional[str]:
+        """Return the cached translation, or None."""
+        key = self._get_key(text, source_lang, target_lang)
+        with self._lock:
+            item = self.cache.get(key)
+            if item is None or time.time() - item['timestamp'] >= self.ttl_seconds:
+                if item is not None:
+                    del self.cache[key]
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return item['translation']
+    
+    def set(self, text: str, source_lang: str, target_lang: str, translation: str):
+        """Store a translation, evicting the least recently used entry when full."""
+        key = self._get_key(text, source_lang, target_lang)
+        with self._lock:
+            self.cache.pop(key, None)
+            while len(self.cache) >= self.max_size:
+                self.cache.popitem(last=False)
+            self.cache[key] = {'translation': translation, 'timestamp': time.time()}
+    
+    def clear(self):
+        """Clear all cached translations."""
+        with self._lock:
+            self.cache.clear()
+    
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class QueryResultCache:
+    """
+    LRU cache of SQL result rows keyed by canonicalized SQL plus parameters.
+    
+    Only plain SELECTs are cached. The owner (DatabaseService) clears it when
+    its inventory version probe changes; the TTL bounds staleness for changes
+    the probe cannot see. Thread-safe.
+    """
+    
+    # String literals and quoted identifiers are kept verbatim when canonicalizing
+    _QUOTED = re.compile(r"('(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)")
+    # Results that depend on the clock, randomness or locks are never cached
+    _VOLATILE = re.compile(r"\b(?:rand|now|curdate|curtime|sysdate|uuid|current_timestamp)\b|\bfor\s+update\b")
+    
+    def __init__(self, max_size: int = 2000, ttl_seconds: int = 300, max_rows: int = 1000):
+        """
+        Initialize cache.
+        
+        Args:
+            max_size: Maximum number of cached result sets
+            ttl_seconds: Time-to-live for a result set (default: 5 minutes)
+            max_rows: Larger result sets are not cached
+        """
+        self.cache: "OrderedDict[str, dict]" = OrderedDict()
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def canonicalize(cls, sql: str) -> str:
+        """Lower-case keywords/identifiers and collapse whitespace outside quotes; drop the trailing ';'."""
+        parts = cls._QUOTED.split(sql.strip().rstrip(';').strip())
+        return ''.join(part if i % 2 else re.sub(r'\s+', ' ', part.lower())
+                       for i, part in enumerate(parts)).strip()
+    
+    def cacheable(self, canonical_sql: str) -> bool:
+        return canonical_sql.startswith('select ') and not self._VOLATILE.search(
+            ''.join(self._QUOTED.split(canonical_sql)[::2]))
+    
+    @staticmethod
+    def _get_key(canonical_sql: str, params) -> str:
+        return f"{canonical_sql}\x00{params!r}" if params else canonical_sql
+    
+    def get(self, sql: str, params=None) -> Optional[list]:
+        """Return a copy of the cached rows, or None (also for uncacheable statements)."""
+        canonical = self.canonicalize(sql)
+        if not self.cacheable(canonical):
+            return None
+        key = self._get_key(canonical, params)
+        with self._lock:
+            item = self.cache.get(key)
+            if item is None or time.time() - item['timestamp'] >= self.ttl_seconds:
+                if item is not None:
+                    del self.cache[key]
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            rows = item['rows']
+        # Callers post-process rows in place (e.g. image URLs); never hand out the cached dicts
+        return [dict(row) for row in rows]
+    
+    def set(self, sql: str, params, rows: list):
+        """Store a result set, evicting the least recently used entry when full."""
+        canonical = self.canonicalize(sql)
+        if not self.cacheable(canonical) or len(rows) > self.max_rows:
+            return
+        key = self._get_key(canonical, params)
+        rows = [dict(row) for row in rows]
+        with self._lock:
+            self.cache.pop(key, None)
+            while len(self.cache) >= self.max_size:
+                self.cache.popitem(last=False)
+            self.cache[key] = {'rows': rows, 'timestamp': time.time()}
+    
+    def clear(self):
+        """Drop every cached result (the inventory changed)."""
+        with self._lock:
+            if self.cache:
+                self.invalidations += 1
+            self.cache.clear()
+    
+    def stats(self) -> dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.cache),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global cache instances
 response_cache = ResponseCache(max_size=1000, ttl_seconds=3600)
+translation_cache = TranslationCache(max_size=2000, ttl_seconds=24 * 3600)
@@ -8,11 +8,35 @@ import uuid
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
-from services.agent_service import SessionMemory, create_agent, now_ts, guard_agent
+from services.agent_service import SessionMemory, create_agent, now_ts, guard_agent, rag_search, show_more_results
+from services.search_pagination import is_show_more_request
 from services.language_service import detect_language, translate_text_logic_func
+from services.result_types import LanguageDetection
 from services.database_service import safe_serialize
+from services.stage_scheduler import stage_scheduler
+from services.response_sanitizer import sanitize_response
+from services.metrics_service import metrics
+from services.llm_usage_service import llm_usage
 from config import settings
 
+# Phrase detection for detail requests (English, Arabic, Franco)
+DETAIL_PHRASES = [
+    'retrieve full details', 'tell me more about', 'details for unit', # EN
+    'تفاصيل أكتر عن', 'قولي تفاصيل', 'اسأل عن التفاصيل', 'عايز تفاصيل', # AR
+    'tafaseel aktr', '2oly tafaseel', 'esa2al 3an el tafaseel', '3ayez tafaseel', # Franco
+    'وريني التفاصيل', 'شوفت التفاصيل', 'اعرف اكتر', 'عايز اعرف', 'هات التفاصيل' # Additional Arabic
+]
+
+# Cheap hint that a message is a policy/company question worth prefetching RAG context for
+RAG_HINT_TERMS = [
+    'policy', 'policies', 'process', 'procedure', 'document', 'deadline', 'shareholder', 'company', 'rule',
+    'refund', 'cancel', 'contract', 'how do', 'how does', 'how can', 'how long', 'how many hours',
+    'which project', 'what project', 'about the project', # EN
+    'سياس', 'إجراء', 'اجراء', 'مستند', 'ورق', 'المساهمين', 'الشركة', 'الشركه', 'شروط', 'استرداد', 'الغاء',
+    'إلغاء', 'عقد', 'ازاي', 'إزاي', 'المشاريع', 'مشروع', # AR
+    'ezay', 'ezzay', 'el sherka', 'wara2', 'mostanadat', 'shorot', 'el 3a2d', 'projects', 'mashare3', # Franco
+]
+
 LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chat_log.txt")
 
 def safe_print(message):
@@ -117,13 +141,22 @@ class ChatService:
             self.sessions[session_id] = SessionMemory()
         return self.sessions[session_id]
 
+    @metrics.timed("process_message")
     def process_message(self, session_id: str, message: str) -> Dict[str, Any]:
         """
         Process user message and return response.
         
         Returns:
-            Dict with keys: response, sql_logs
+            Dict with keys: response, sql_logs, llm_usage (LLM calls and tokens of this turn)
         """
+        # Every LLM call of the turn, including concurrent stages, is counted against its budget
+        with llm_usage.turn(session_id) as usage:
+            result = self._process_turn(session_id, message)
+        result["llm_usage"] = usage.summary()
+        return result
+    
+    def _process_turn(self, session_id: str, message: str) -> Dict[str, Any]:
+        """Run one chat turn (see process_message)."""
         session_memory = self.get_or_create_session(session_id)
         
         # 🚀 PERFORMANCE: Check cache first (before any processing)
@@ -131,7 +164,10 @@ class ChatService:
         
         # Try to get language from session, default to 'en' for first query
         cache_language = getattr(session_memory, 'detected_language', 'en') or 'en'
-        cached_response = response_cache.get(message, cache_language)
+        # "Show me more" depends on this session's last search, never on the cache
+        show_more = is_show_more_request(message)
+        with metrics.stage("cache_lookup"):
+            cached_response = None if show_more else response_cache.get(message, cache_language)
         
         if cached_response:
             # Return cached response immediately with timing metadata
@@ -140,77 +176,17 @@ class ChatService:
             cached_result["cache_hit"] = True
             return cached_result
         
-        # 🛡️ SECURITY CHECK (optional for speed)
-        if settings.enable_safety_guard:
-            guard_start_time = time.time()
-            security_check = guard_agent(message)
-            guard_execution_time = time.time() - guard_start_time
-            
-            if not security_check.get("safe", True):
-                refusal_msg = "I cannot process this request due to safety guidelines."
-                if "reason" in security_check:
-                     safe_print(f"WARNING: Security Violation Blocked: {security_check['reason']}")
-                
-                # Log violation with execution time (optional for speed)
-                if settings.enable_file_logging:
-                    log_full_action(message, refusal_msg, session_memory, agent_name="Guard Agent", execution_time=guard_execution_time)
-                
-                return {
-                    "response": refusal_msg,
-                    "sql_logs": []
-                }
-        
         # Reset new_results check for this turn
         session_memory.new_results_fetched = False
         session_memory.rag_used = False
         session_memory.payment_plan_used = False
         
-        # 🌍 LANGUAGE DETECTION
-        try:
-            language_result_json = detect_language(message)
-            # Parse JSON if needed (the new service returns a JSON string or dict depending on how it's called, 
-            # but detect_language_logic returns a JSON string or Dict? Let's check language_service.py again.
-            # In step 193, detect_language_logic returns json.dumps(...) -> string.
-            if isinstance(language_result_json, str):
-                try:
-                    language_result = json.loads(language_result_json)
-                except:
-                    language_result = {"language": "en"}
-            else:
-                 language_result = language_result_json
-            
-            # DEBUG PRINT (optional for speed)
-            if settings.enable_debug_logging:
-                safe_print(f"[DEBUG] Language Raw JSON: {str(language_result)[:100]}")
-            
-            detected_lang = language_result.get("language", "en")
-            session_memory.detected_language = detected_lang
-            session_memory.language_confidence = language_result.get("confidence", "medium")
-            
-            if settings.enable_debug_logging:
-                safe_print(f"Language detected: {detected_lang}")
-            
-        except Exception as e:
-            safe_print(f"Language detection error: {e}, defaulting to English")
-            session_memory.detected_language = "en"
-            session_memory.language_confidence = "low"
-        
-        # Add to chat history
-        session_memory.chat_history.append({
-            "role": "user",
-            "content": message,
-            "timestamp": now_ts()
-        })
-        
-        # Store current query for context access
-        session_memory.current_query = message
-        
-        
         # ═══════════════════════════════════════════════════════════════
         # PRE-PROCESSING: Semantic Intent Classification for Project Queries
         # ═══════════════════════════════════════════════════════════════
         # This uses LLM to semantically classify intent, not keyword matching
         
+        @metrics.timed("intent_classification")
         def classify_query_intent(query: str) -> dict:
             """
             Use LLM to semantically classify the user's intent.
@@ -323,9 +299,84 @@ Respond with ONLY valid JSON:
                     'reasoning': 'Validation failed, using initial decision'
                 }
         
+        # 🌍 LANGUAGE DETECTION
+        @metrics.timed("language_detection")
+        def run_language_detection() -> LanguageDetection:
+            try:
+                language_result = detect_language(message)
+                
+                # DEBUG PRINT (optional for speed)
+                if settings.enable_debug_logging:
+                    safe_print(f"[DEBUG] Language Result: {str(language_result)[:100]}")
+                return language_result
+            except Exception as e:
+                safe_print(f"Language detection error: {e}, defaulting to English")
+                return LanguageDetection(language="en", confidence=0.0, reasoning="Detection failed")
+        
+        # 🛡️ SECURITY CHECK (optional for speed)
+        def run_guard():
+            guard_start_time = time.time()
+            security_check = guard_agent(message)
+            guard_execution_time = time.time() - guard_start_time
+            metrics.observe("guard", guard_execution_time)
+            return security_check, guard_execution_time
+        
+        # ⚡ PERFORMANCE: The stages below don't depend on each other, so they run
+        # concurrently and the turn costs max() of them instead of sum().
+        # The agent reads the detected language at invoke time, so it can be built meanwhile.
+        stages = {
+            "language": run_language_detection,
+            "agent": metrics.timed("agent_creation")(lambda: create_agent(session_memory)),
+        }
+        if settings.enable_safety_guard:
+            stages["guard"] = run_guard
+        if settings.enable_intent_classifier:
+            stages["intent"] = lambda: classify_query_intent(message)
+        
+        stage_results = stage_scheduler.run(
+            stages,
+            # A blocked message ends the turn, don't wait for the other stages
+            abort_if=lambda name, result: name == "guard" and not result[0].get("safe", True)
+        )
+        
+        if "guard" in stage_results:
+            security_check, guard_execution_time = stage_results["guard"]
+            
+            if not security_check.get("safe", True):
+                refusal_msg = "I cannot process this request due to safety guidelines."
+                if "reason" in security_check:
+                     safe_print(f"WARNING: Security Violation Blocked: {security_check['reason']}")
+                
+                # Log violation with execution time (optional for speed)
+                if settings.enable_file_logging:
+                    log_full_action(message, refusal_msg, session_memory, agent_name="Guard Agent", execution_time=guard_execution_time)
+                
+                return {
+                    "response": refusal_msg,
+                    "sql_logs": []
+                }
+        
+        language_result = stage_results["language"]
+        detected_lang = language_result.language
+        session_memory.detected_language = detected_lang
+        session_memory.language_confidence = language_result.confidence
+        
+        if settings.enable_debug_logging:
+            safe_print(f"Language detected: {detected_lang}")
+        
+        # Add to chat history
+        session_memory.chat_history.append({
+            "role": "user",
+            "content": message,
+            "timestamp": now_ts()
+        })
+        
+        # Store current query for context access
+        session_memory.current_query = message
+        
         # Classify the query intent with confidence (for logging purposes only)
         if settings.enable_intent_classifier:
-            classification_result = classify_query_intent(message)
+            classification_result = stage_results["intent"]
             intent = classification_result['intent']
             confidence = classification_result['confidence']
             
@@ -340,8 +391,23 @@ Respond with ONLY valid JSON:
             safe_print(f"[INFO] Sending directly to orchestrator...")
         
         # Continue with normal orchestrator flow
-        # Create agent
-        agent_executor = create_agent(session_memory)
+        agent_executor = stage_results["agent"]
+        
+        # ⚡ PERFORMANCE: "Show me more" after a search is answered from the session's
+        # keyset cursor without the orchestrator or SQL generation
+        page_message = show_more_results(session_memory) if show_more else None
+        
+        # ⚡ PERFORMANCE: Speculatively retrieve policy context while the orchestrator routes,
+        # only for messages that look like policy questions and whose query normalization is
+        # already known (no LLM call), so a hit returns exactly what the full search would.
+        # call_rag_agent takes it if it searches for the same query and language; otherwise it is cancelled.
+        if (settings.enable_speculative_rag_prefetch and page_message is None
+                and self._looks_like_rag_question(message.lower())
+                and rag_service.known_preprocessing(message, detected_lang) is not None):
+            session_memory.rag_prefetch = stage_scheduler.speculate(
+                "RAG retrieval", f"{detected_lang}:{message}",
+                lambda: rag_search(message, detected_lang, preprocess=False), exact=True
+            )
 
         
         # Prepare chat history for agent
@@ -353,15 +419,31 @@ Respond with ONLY valid JSON:
             else:
                 chat_history.append(("assistant", msg["content"]))
         
+        # Plain unit searches end at the SQL tool (its results replace the orchestrator's text
+        # with the carousel). Detail follow-ups still need the orchestrator's description.
+        session_memory.allow_sql_final_result = (
+            settings.enable_sql_short_circuit and not self._looks_like_detail_request(message.lower())
+        )
+        
         try:
             # ⏱️ Start timing
             start_time = time.time()
             
             # Invoke agent
-            result = agent_executor.invoke({
-                "input": message,
-                "chat_history": chat_history
-            })
+            try:
+                if page_message is not None:
+                    result = {"output": page_message}
+                else:
+                    with metrics.stage("agent_invoke"):
+                        result = agent_executor.invoke({
+                            "input": message,
+                            "chat_history": chat_history
+                        })
+            finally:
+                # The orchestrator routed elsewhere: drop the unused speculative retrieval
+                if session_memory.rag_prefetch is not None:
+                    session_memory.rag_prefetch.cancel()
+                    session_memory.rag_prefetch = None
             
             # ⏱️ Calculate execution time
             execution_time = time.time() - start_time
@@ -402,7 +484,7 @@ Respond with ONLY valid JSON:
             expected_route = intent_to_route.get(intent, 'chat')
             
             # Check if cross-validation is enabled (disabled by default for performance)
-            if settings.enable_cross_validation:
+            if settings.enable_cross_validation and page_message is None:
                 # Determine if we need to re-invoke orchestrator
                 is_mismatch = (expected_route != orchestrator_route)
                 is_low_confidence = (confidence < 0.70)
@@ -518,20 +600,13 @@ Then respond to the original user query."""
             # ---------------------------------------------------------
             # Only show carousel if NEW results were fetched this turn
             # AND it's not a detail request for a single unit already shown
+            carousel_start = time.perf_counter()
             
             # Detect if this is a detail request (user clicked "Ask Details" or similar)
             is_detail_request = False
             message_lower = message.lower()
             
-            # Phrase detection for detail requests (English, Arabic, Franco)
-            detail_phrases = [
-                'retrieve full details', 'tell me more about', 'details for unit', # EN
-                'تفاصيل أكتر عن', 'قولي تفاصيل', 'اسأل عن التفاصيل', 'عايز تفاصيل', # AR
-                'tafaseel aktr', '2oly tafaseel', 'esa2al 3an el tafaseel', '3ayez tafaseel', # Franco
-                'وريني التفاصيل', 'شوفت التفاصيل', 'اعرف اكتر', 'عايز اعرف', 'هات التفاصيل' # Additional Arabic
-            ]
-            
-            if any(phrase in message_lower for phrase in detail_phrases) or re.search(r'(?:unit|الوحدة|unit ra2am|unit #|رقم)\s*(?:number|رقم)?\s*#?(\d+)', message_lower):
+            if self._looks_like_detail_request(message_lower):
                 # Check if asking about a single unit that was recently shown
                 if session_memory.last_results and len(session_memory.last_results) >= 1:
                     # If we have previous results and this looks like a detail query, suppress carousel
@@ -558,21 +633,14 @@ Then respond to the original user query."""
                         if video_url and not video_url.startswith('http'):
                             video_url = f"https://www.youtube.com/watch?v={video_url}"
                         
-                        # Collect ALL available images from the database
-                        def add_jpg_if_needed(img_url):
-                            """Helper to add .jpg extension if needed"""
-                            if img_url and not str(img_url).endswith(('.jpg', '.png', '.jpeg', '.webp')):
-                                return img_url + '.jpg'
-                            return img_url
-                        
-                        # Get all image fields
-                        unit_image = add_jpg_if_needed(unit_data.get('unit_image', ''))
-                        unit_image2 = add_jpg_if_needed(unit_data.get('unit_image2', ''))
-                        sm_unit_image = add_jpg_if_needed(unit_data.get('sm_unit_image', ''))
-                        compound_image = add_jpg_if_needed(unit_data.get('compound_image', ''))
-                        developer_logo = add_jpg_if_needed(unit_data.get('developer_logo', ''))
-                        sm_developer_logo = add_jpg_if_needed(unit_data.get('sm_developer_logo', ''))
-                        md_developer_logo = add_jpg_if_needed(unit_data.get('md_developer_logo', ''))
+                        # Get all image fields (run_sql already normalized the URLs)
+                        unit_image = unit_data.get('unit_image', '')
+                        unit_image2 = unit_data.get('unit_image2', '')
+                        sm_unit_image = unit_data.get('sm_unit_image', '')
+                        compound_image = unit_data.get('compound_image', '')
+                        developer_logo = unit_data.get('developer_logo', '')
+                        sm_developer_logo = unit_data.get('sm_developer_logo', '')
+                        md_developer_logo = unit_data.get('md_developer_logo', '')
                         
                         # Create unit detail structure with ALL images
                         detail_data = {
@@ -707,9 +775,9 @@ Then respond to the original user query."""
                             "option": i,
                             "unit_id": prop.get('unit_id', 'N/A'),
                             "code": prop.get('unt_code', 'N/A'),
-                            "image": (prop.get('compound_image', '') or prop.get('unit_image', '')) + ('.jpg' if (prop.get('compound_image') or prop.get('unit_image')) and not str(prop.get('compound_image', '') or prop.get('unit_image', '')).endswith(('.jpg', '.png')) else ''),
-                            "unit_image": prop.get('unit_image', '') + ('.jpg' if prop.get('unit_image') and not str(prop.get('unit_image', '')).endswith(('.jpg', '.png')) else ''),
-                            "compound_image": prop.get('compound_image', '') + ('.jpg' if prop.get('compound_image') and not str(prop.get('compound_image', '')).endswith(('.jpg', '.png')) else ''),
+                            "image": prop.get('compound_image') or prop.get('unit_image') or '',
+                            "unit_image": prop.get('unit_image') or '',
+                            "compound_image": prop.get('compound_image') or '',
                             "title": title,
                             "price": (f"{float(prop.get('price', 0) or 0):,.0f} جنيه" if detected_lang in ['ar', 'arabic'] else f"{float(prop.get('price', 0) or 0):,.0f} EGP") if prop.get('price') else ("السعر عند الطلب" if detected_lang in ['ar', 'arabic'] else ("Se3r 3and el talab" if detected_lang in ['franco', 'franco_arabic'] else "Price on request")),
                             "has_promo": prop.get('has_promo', 0) == 1,
@@ -775,6 +843,8 @@ Then respond to the original user query."""
                         # Reset the flag after displaying
                         session_memory.alternative_search = False
 
+            metrics.observe("carousel_build", time.perf_counter() - carousel_start)
+
             # Extract SQL logs if available
             sql_logs = self._extract_sql_logs(session_memory)
             
@@ -820,7 +890,8 @@ Then respond to the original user query."""
             }
             
             # Store in cache
-            response_cache.set(message, detected_lang, result)
+            if not show_more:
+                response_cache.set(message, detected_lang, result)
             
             return result
             
@@ -839,156 +910,26 @@ Then respond to the original user query."""
                 "sql_logs": []
             }
     
+    @staticmethod
+    def _looks_like_detail_request(message_lower: str) -> bool:
+        """Phrase detection for "tell me more about unit X" follow-ups (English, Arabic, Franco)."""
+        return (
+            any(phrase in message_lower for phrase in DETAIL_PHRASES)
+            or re.search(r'(?:unit|الوحدة|unit ra2am|unit #|رقم)\s*(?:number|رقم)?\s*#?(\d+)', message_lower) is not None
+        )
+    
+    @staticmethod
+    def _looks_like_rag_question(message_lower: str) -> bool:
+        """Keyword hint for policy/company/project questions (English, Arabic, Franco)."""
+        return any(term in message_lower for term in RAG_HINT_TERMS)
+    
     def _clean_image_sections(self, text: str) -> str:
         """
         Remove unwanted image sections and markdown from agent responses.
         This ensures no image links or labels appear in the text.
         """
-        import re
-        
-        # Remove "#### Images:" or "## Images:" headers
-        text = re.sub(
-            r'(?:^|\n)\s*#{1,4}\s*Images?:\s*(?:\n|$)',
-            '\n',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove "Images:" section with all its content
-        # Matches patterns like:
-        # Images:
-        # ![Unit Image](url)
-        # ![Compound Image](url)
-        text = re.sub(
-            r'(?:^|\n)\s*Images?:\s*\n(?:\s*!\[.*?\]\(.*?\)\s*\n?)*',
-            '',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove patterns like "Unit Image: !View Unit Image" or "Compound Image: !View Compound Image"
-        text = re.sub(
-            r'(?:^|\n)\s*(?:Unit|Compound|Developer|Property)\s*(?:Image|Logo):\s*!\[?(?:View\s*)?.*?(?:Image|Logo)\]?.*?(?:\n|$)',
-            '\n',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove standalone image markdown that might have been missed
-        # Matches: ![Unit Image](url) or ![Compound Image](url) or similar
-        text = re.sub(
-            r'!\[(?:Unit|Compound|Developer|Property)?\s*(?:Image|Logo|Photo).*?\]\(.*?\)',
-            '',
-            text,
-            flags=re.IGNORECASE
-        )
-        
-        # Remove "Unit Image:" and "Compound Image:" labels (with or without URLs)
-        # Matches patterns like:
-        # Unit Image: https://...
-        # Compound Image: https://...
-        text = re.sub(
-            r'(?:^|\n)\s*(?:Unit|Compound|Developer)\s*(?:Image|Logo):\s*(?:https?://\S+)?\s*',
-            '',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove any remaining orphaned "Images:" headers
-        text = re.sub(r'(?:^|\n)\s*Images?:\s*(?:\n|$)', '\n', text, flags=re.IGNORECASE | re.MULTILINE)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # VIDEO CONTENT REMOVAL
-        # ═══════════════════════════════════════════════════════════════
-        
-        # Remove "Video Tour:" section with all its content
-        # Matches patterns like:
-        # Video Tour: https://...
-        # Video Tour: [Watch Video](url)
-        # Watch Video: url
-        text = re.sub(
-            r'(?:^|\n)\s*(?:Video\s*Tour|Watch\s*Video):\s*(?:\[.*?\]\(.*?\)|https?://\S+)?\s*',
-            '',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove standalone video links (markdown or plain URLs)
-        # Matches: [Watch Video](url) or [Video Tour](url)
-        text = re.sub(
-            r'\[(?:Watch\s*Video|Video\s*Tour|View\s*Video).*?\]\(.*?\)',
-            '',
-            text,
-            flags=re.IGNORECASE
-        )
-        
-        # Remove any standalone video URLs (youtube, vimeo, etc.)
-        # This will catch URLs that might be displayed as plain text
-        text = re.sub(
-            r'(?:^|\n|\s)(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be|vimeo\.com|dailymotion\.com)/\S+',
-            '',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Remove any text mentioning "video tour" or "watch video" followed by any content
-        text = re.sub(
-            r'(?:^|\n)\s*(?:video\s*tour|watch\s*video).*?(?:\n|$)',
-            '\n',
-            text,
-            flags=re.IGNORECASE | re.MULTILINE
-        )
-        
-        # Clean up excessive newlines (more than 2)
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        
-        # ═══════════════════════════════════════════════════════════════
-        # REMOVE DEBUG MARKERS AND JSON DATA
-        # ═══════════════════════════════════════════════════════════════
-        
-        # 1. Remove ###UNIT_DETAIL###...###END_DETAIL###
-        text = re.sub(
-            r'###UNIT_DETAIL###.*?###END_DETAIL###',
-            '',
-            text,
-            flags=re.DOTALL
-        )
-
-        # 2. Remove <<PROPERTY_CAROUSEL_DATA>> and trailing content
-        text = re.sub(
-            r'<<PROPERTY_CAROUSEL_DATA>>.*$',
-            '',
-            text,
-            flags=re.DOTALL | re.MULTILINE
-        )
-
-        # 3. Remove <<PAYMENT_PLAN_DATA>> and trailing content
-        text = re.sub(
-            r'<<PAYMENT_PLAN_DATA>>.*$',
-            '',
-            text,
-            flags=re.DOTALL | re.MULTILINE
-        )
-
-        # 4. Remove leftover JSON arrays (if any)
-        text = re.sub(
-            r'\[\s*{\s*"unit_id".*?\}\s*\]',
-            '',
-            text,
-            flags=re.DOTALL
-        )
-        
-        text = re.sub(
-            r'\[\s*\{\s*".*?".*?\}\s*\]',
-            '',
-            text,
-            flags=re.DOTALL
-        )
-
-        # Clean up leading/trailing whitespace
-        text = text.strip()
-        
-        return text
+        with metrics.stage("sanitize"):
+            return sanitize_response(text)
 
     
     def _extract_sql_logs(self, session_memory: SessionMemory) -> List[Dict[str, Any]]:
@@ -1047,6 +988,7 @@ Then respond to the original user query."""
         """Clear session memory."""
         if session_id in self.sessions:
             self.sessions[session_id].reset()
+        llm_usage.forget_session(session_id)
 
 
 # Global chat service instance
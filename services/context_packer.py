@@ -0,0 +1,130 @@
+"""Token-budgeted packing of retrieved RAG chunks into prompt context."""
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config import settings
+
+# The splitter uses chunk_overlap=200; allow some slack for whitespace differences
+MAX_OVERLAP_CHARS = 300
+MIN_OVERLAP_CHARS = 30
+# Splitter chunk_size (characters) and the most chunks one search retrieves
+CHUNK_SIZE_CHARS = 900
+MAX_RETRIEVED_CHUNKS = 35
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Load the tokenizer of the configured LLM once (None if tiktoken is unavailable)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model(settings.llm_model)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            print("WARNING: tiktoken not installed, estimating tokens as chars/4. Run: pip install tiktoken")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of LLM tokens in text."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _overlap_length(previous: str, current: str) -> int:
+    """Length of the longest suffix of previous that is a prefix of current."""
+    longest = min(len(previous), len(current), MAX_OVERLAP_CHARS)
+    for n in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(current[:n]):
+            return n
+    return 0
+
+
+def _strip_overlap(text: str, selected: List[str]) -> Optional[str]:
+    """
+    Remove text already present in the selected chunks.
+
+    Returns None when the chunk adds nothing new, otherwise the chunk with the
+    splitter overlap shared with a neighbouring selected chunk trimmed off.
+    """
+    stripped = text.strip()
+    for other in selected:
+        if stripped in other:
+            return None
+    for other in selected:
+        # Neighbour before this chunk: drop our leading overlap
+        n = _overlap_length(other, stripped)
+        if n:
+            stripped = stripped[n:].strip()
+        # Neighbour after this chunk: drop our trailing overlap
+        n = _overlap_length(stripped, other)
+        if n:
+            stripped = stripped[:-n].strip()
+        if not stripped:
+            return None
+    return stripped
+
+
+def chunks_for_budget(token_budget: int) -> int:
+    """
+    How many chunks to retrieve so the packer can fill token_budget: twice what
+    fits at ~4 characters per token, as duplicates and overlap are trimmed away.
+    """
+    if not token_budget:
+        return MAX_RETRIEVED_CHUNKS
+    chunk_tokens = CHUNK_SIZE_CHARS // 4
+    return max(1, min(MAX_RETRIEVED_CHUNKS, 2 * -(-token_budget // chunk_tokens)))
+
+
+def format_chunks(texts: List[str]) -> str:
+    """Same layout the RAG prompt has always received."""
+    return "\n\n".join([f"Chunk {i+1}:\n{text}" for i, text in enumerate(texts)])
+
+
+def pack_context(docs: List[Tuple[Document, float]], token_budget: int) -> Tuple[str, dict]:
+    """
+    Pack (document, score) pairs into at most token_budget tokens of context.
+
+    Chunks are taken best score first (stable, so retrieval order breaks ties),
+    duplicated and overlapping text is removed, and packing stops at the first
+    chunk that no longer fits. Returns the context text and packing stats.
+    """
+    ranked = sorted(docs, key=lambda pair: pair[1], reverse=True)
+    unpacked_tokens = count_tokens(format_chunks([doc.page_content for doc, _ in docs]))
+
+    selected = []
+    used_tokens = 0
+    duplicates = 0
+    for doc, _ in ranked:
+        text = _strip_overlap(doc.page_content, selected)
+        if text is None:
+            duplicates += 1
+            continue
+        # Per-chunk cost including the "Chunk N:" header and separator
+        cost = count_tokens(f"Chunk {len(selected) + 1}:\n{text}\n\n")
+        if used_tokens + cost > token_budget:
+            break
+        selected.append(text)
+        used_tokens += cost
+
+    context = format_chunks(selected)
+    packed_tokens = count_tokens(context)
+    stats = {
+        "chunks_retrieved": len(docs),
+        "chunks_packed": len(selected),
+        "duplicates_removed": duplicates,
+        "tokens_unpacked": unpacked_tokens,
+        "tokens_packed": packed_tokens,
+        "tokens_saved": max(unpacked_tokens - packed_tokens, 0),
+        "token_budget": token_budget,
+    }
+    return context, stats
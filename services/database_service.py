@@ -1,11 +1,23 @@
-"""Database service for MySQL operations."""
+"""Database service for MySQL operations (or the local SQLite stand-in)."""
 import json
 import decimal
-import mysql.connector
-from mysql.connector import Error
+import threading
+import time
 from typing import List, Dict, Any, Optional, Tuple
 
 from config import settings
+from services.metrics_service import metrics
+from services.tracing_service import tracer
+from services.db_pool import ConnectionPool, PoolTimeout, is_connection_error
+from services.cache_service import QueryResultCache
+from services.slow_query_log import slow_query_log
+
+try:
+    import mysql.connector
+    from mysql.connector import Error
+except ImportError:  # Only required for DB_BACKEND=mysql
+    mysql = None
+    Error = Exception
 
 
 def safe_serialize(obj):
@@ -21,90 +33,224 @@ class DatabaseService:
     def __init__(self):
         """Initialize database service with connection pool."""
         self.config = settings.db_config
+        self.backend = settings.db_backend.lower()
         self.pool = None
-        self._initialize_pool()
+        self._local = threading.local()
+        self._sqlite_connections = 0
+        self._busy = 0  # Queries running right now
+        self._busy_lock = threading.Lock()
+        self.result_cache = QueryResultCache(max_size=settings.sql_cache_max_entries,
+                                             ttl_seconds=settings.sql_cache_ttl_seconds)
+        self.inventory_version = None
+        self._version_checked_at = 0.0
+        self._version_lock = threading.Lock()
+        if self.backend != "sqlite":
+            self._initialize_pool()
         
     def _initialize_pool(self):
-        """Initialize or re-initialize the connection pool."""
-        try:
-            # Create a connection pool to reuse connections
-            # This saves ~0.1-0.3s per query by avoiding handshake overhead
-            if not self.pool:
-                self.pool = mysql.connector.pooling.MySQLConnectionPool(
-                    pool_name="eshtri_pool",
-                    pool_size=5,  # Keep 5 connections ready
-                    pool_reset_session=True,
-                    **self.config
-                )
-                print("Database connection pool initialized")
-        except Error as e:
-            print(f"Error initializing connection pool: {e}")
-            self.pool = None
+        """Create the connection pool; its keepalive thread opens the first connections."""
+        if mysql is None:
+            print("Error initializing connection pool: mysql-connector-python is not installed")
+            return
+        # Reusing connections saves ~0.1-0.3s per query (no TCP/auth handshake). Bursts beyond
+        # db_pool_max_size wait for a free connection instead of failing.
+        self.pool = ConnectionPool(
+            connect=self._new_mysql_connection,
+            ping=lambda connection: connection.ping(reconnect=False),
+            min_size=settings.db_pool_min_size,
+            max_size=settings.db_pool_max_size,
+            wait_timeout=settings.db_pool_wait_timeout,
+            max_waiters=settings.db_pool_max_waiters,
+            validate_after=settings.db_pool_validate_after,
+            keepalive_interval=settings.db_pool_keepalive_interval,
+            max_lifetime=settings.db_pool_max_lifetime,
+            name="eshtri",
+        )
+        self.pool.start_keepalive()
+        print(f"Database connection pool initialized ({settings.db_pool_min_size}-{settings.db_pool_max_size} connections)")
+    
+    def _new_mysql_connection(self):
+        # Autocommit: a pooled connection must not keep an old REPEATABLE READ snapshot between queries
+        return mysql.connector.connect(autocommit=True, **self.config)
 
-    def execute_query(self, sql: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    def execute_query(self, sql: str, params: Optional[tuple] = None,
+                      use_cache: bool = True) -> Tuple[List[Dict[str, Any]], Optional[str]]:
         """
         Execute SQL query using a pooled connection.
         
+        Repeated SELECTs are answered from the result cache until the inventory
+        version probe changes (see check_inventory_version).
+        
         Returns:
             Tuple of (results, error_message)
         """
+        use_cache = use_cache and settings.enable_sql_cache
+        if use_cache:
+            self.check_inventory_version()
+            rows = self.result_cache.get(sql, params)
+            if rows is not None:
+                tracer.set_attribute("db.cache_hit", True)
+                return rows, None
+        rows, error = self._execute(sql, params)
+        if use_cache and error is None:
+            self.result_cache.set(sql, params, rows)
+        return rows, error
+    
+    @metrics.timed("db_execute")
+    def _execute(self, sql: str, params: Optional[tuple] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        tracer.set_attribute("db.system", self.backend)
+        tracer.set_attribute("db.statement", sql)
+        with self._busy_lock:
+            self._busy += 1
+        start = time.perf_counter()
+        try:
+            if self.backend == "sqlite":
+                rows, error = self._execute_sqlite(sql, params)
+            else:
+                rows, error = self._execute_mysql(sql, params)
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+        if error is None:
+            slow_query_log.observe(sql, params, time.perf_counter() - start, len(rows), self.explain, self.backend)
+        return rows, error
+    
+    def explain(self, sql: str, params: Optional[tuple] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """The optimizer's plan for sql (MySQL EXPLAIN rows, or SQLite EXPLAIN QUERY PLAN rows)."""
+        if self.backend == "sqlite":
+            return self._execute_sqlite(f"EXPLAIN QUERY PLAN {sql}", params)
+        return self._execute_mysql(f"EXPLAIN {sql}", params)
+    
+    def check_inventory_version(self):
+        """
+        Run the version probe at most every sql_cache_version_interval seconds and
+        clear the result cache when its row changed. Only one thread probes; the
+        others keep using the cache meanwhile.
+        """
+        if time.monotonic() - self._version_checked_at < settings.sql_cache_version_interval:
+            return
+        if not self._version_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._version_checked_at < settings.sql_cache_version_interval:
+                return
+            rows, error = self._execute(settings.sql_cache_version_query)
+            self._version_checked_at = time.monotonic()
+            if error or not rows:
+                # Without a version we cannot tell what changed
+                self.result_cache.clear()
+                self.inventory_version = None
+                return
+            version = json.dumps(rows[0], sort_keys=True, default=safe_serialize)
+            if version != self.inventory_version:
+                if self.inventory_version is not None:
+                    print(f"[SQL CACHE] Inventory changed ({version}), clearing {len(self.result_cache.cache)} results")
+                self.result_cache.clear()
+                self.inventory_version = version
+        finally:
+            self._version_lock.release()
+    
+    def _execute_mysql(self, sql: str, params: Optional[tuple] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Execute SQL on a pooled MySQL connection."""
+        if not self.pool:
+            self._initialize_pool()
+        if not self.pool:
+            return [], "Database pool is not available"
+        
         connection = None
         cursor = None
+        discard = False
         try:
-            # Get connection from pool
-            if not self.pool:
-                self._initialize_pool()
-            
-            # If pool is still not available, try direct connection
-            if not self.pool:
-                connection = mysql.connector.connect(**self.config)
-            else:
-                connection = self.pool.get_connection()
-                
-            if not connection.is_connected():
-                connection.reconnect(attempts=3, delay=1)
-                
+            connection = self.pool.acquire()
             cursor = connection.cursor(dictionary=True)
-            cursor.execute(sql)
+            cursor.execute(sql, params)
             rows = cursor.fetchall()
             return rows, None
             
+        except PoolTimeout as e:
+            error_msg = f"Database busy: {e}"
+            print(error_msg)
+            return [], error_msg
         except Error as e:
             error_msg = str(e)
             print(f"Database error: {error_msg}")
-            # Force pool reset on vital errors
-            if "lost connection" in error_msg.lower() or "gone away" in error_msg.lower():
-                self.pool = None 
+            # Only this connection is broken; the rest of the pool stays in use
+            discard = is_connection_error(e)
             return [], error_msg
         except Exception as e:
             error_msg = f"Unexpected error: {str(e)}"
             print(f"{error_msg}")
             return [], error_msg
         finally:
-            # Always return connection to pool
             if cursor:
                 try:
                     cursor.close()
                 except:
                     pass
             if connection:
-                try:
-                    connection.close()  # This returns it to pool, doesn't actually close
-                except:
-                    pass
+                self.pool.release(connection, discard=discard)
+    
+    def connect(self):
+        """
+        A connection for code that runs several statements on its own cursor
+        (payment plan and discount lookups). Use it as a context manager; with
+        MySQL it is borrowed from the pool and returned on exit.
+        """
+        if self.backend == "sqlite":
+            from services import local_db
+            return local_db.CompatConnection(local_db.connect(settings.sqlite_db_path))
+        if not self.pool:
+            self._initialize_pool()
+        if not self.pool:
+            return mysql.connector.connect(**self.config)
+        return self.pool.connection()
+    
+    def _sqlite_connection(self):
+        """One connection per thread to the local stand-in database."""
+        from services import local_db
+        
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = local_db.connect(settings.sqlite_db_path)
+            self._local.connection = connection
+            self._sqlite_connections += 1
+        return connection
+    
+    def _execute_sqlite(self, sql: str, params: Optional[tuple] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Execute SQL against the local SQLite stand-in (DB_BACKEND=sqlite)."""
+        from services import local_db
+        
+        try:
+            return local_db.execute(self._sqlite_connection(), sql, params or ()), None
+        except Exception as e:
+            error_msg = str(e)
+            print(f"Database error: {error_msg}")
+            return [], error_msg
+    
+    def pool_stats(self) -> dict:
+        """Connection pool size and use (for SQLite: one connection per thread)."""
+        if self.backend == "sqlite":
+            return {"backend": self.backend, "size": self._sqlite_connections, "in_use": self._busy}
+        stats = self.pool.stats() if self.pool else {"size": 0, "in_use": 0}
+        return {"backend": self.backend, **stats}
     
     def test_connection(self) -> bool:
         """Test database connection."""
+        if self.backend == "sqlite":
+            rows, error = self._execute_sqlite("SELECT COUNT(*) AS units FROM unit_search_sorting")
+            if error:
+                return False
+            print(f"Local database connection successful ({rows[0]['units']} unit rows)")
+            return True
         try:
             if not self.pool:
                 self._initialize_pool()
                 
             if self.pool:
                 try:
-                    conn = self.pool.get_connection()
-                    if conn.is_connected():
+                    with self.pool.connection() as conn:
+                        conn.ping(reconnect=False)
                         # print("Database connection successful via pool")
-                        conn.close()
                         return True
                 except:
                     pass
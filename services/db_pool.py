@@ -0,0 +1,277 @@
+"""
+Thread-safe database connection pool with a bounded wait queue.
+
+Used by DatabaseService for MySQL. Unlike mysql.connector's pool it
+- grows on demand from min_size up to max_size connections;
+- makes callers wait (up to wait_timeout, at most max_waiters of them) when all
+  connections are busy, instead of raising PoolError;
+- pings a connection on checkout when it sat idle for a while, and replaces it
+  if the server dropped it;
+- keeps idle connections alive from a background thread and retires them after
+  max_lifetime, so the server's wait_timeout never kills a pooled connection;
+- discards a single broken connection instead of the whole pool.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+from services.metrics_service import metrics
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the wait timeout (or the wait queue is full)."""
+
+
+class _Entry:
+    __slots__ = ("connection", "created", "last_used")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = time.monotonic()
+        self.last_used = self.created
+
+
+class ConnectionPool:
+    """See module docstring. connect() opens a connection, ping(conn) raises if it is dead."""
+
+    def __init__(self, connect: Callable[[], Any], ping: Callable[[Any], None],
+                 min_size: int = 2, max_size: int = 10, wait_timeout: float = 5.0,
+                 max_waiters: int = 32, validate_after: float = 5.0,
+                 keepalive_interval: float = 60.0, max_lifetime: float = 1800.0,
+                 name: str = "db"):
+        self._connect = connect
+        self._ping = ping
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.wait_timeout = wait_timeout
+        self.max_waiters = max_waiters
+        self.validate_after = validate_after
+        self.keepalive_interval = keepalive_interval
+        self.max_lifetime = max_lifetime
+        self.name = name
+
+        self._idle = deque()  # _Entry, most recently used on the right
+        self._in_use = {}  # id(connection) -> _Entry
+        self._opening = 0  # Connections being opened outside the lock
+        self._checking = 0  # Idle connections taken out by maintain()
+        self._waiters = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stop = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+        self.created_total = 0
+        self.discarded_total = 0
+        self.timeouts_total = 0
+
+    # ── Checkout / checkin ───────────────────────────────────────────────
+
+    def acquire(self, timeout: Optional[float] = None):
+        """A live connection; waits while the pool is at max_size. Raises PoolTimeout."""
+        timeout = self.wait_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout(f"{self.name} pool is closed")
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use[id(entry.connection)] = entry
+                    break
+                if self._size() < self.max_size:
+                    self._opening += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or (not waited and self._waiters >= self.max_waiters):
+                    self.timeouts_total += 1
+                    raise PoolTimeout(
+                        f"{self.name} pool exhausted: {self.max_size} connections busy, "
+                        f"{self._waiters} waiting, waited {time.monotonic() - start:.1f}s"
+                    )
+                waited = True
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+        if waited:
+            metrics.observe("db_pool_wait", time.monotonic() - start)
+        if entry is None:
+            return self._open_checked_out()
+        return self._validated(entry)
+
+    def release(self, connection, discard: bool = False):
+        """Return a connection; discard=True closes it (e.g. after "server has gone away")."""
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                return
+            now = time.monotonic()
+            if discard or self._closed or now - entry.created > self.max_lifetime:
+                self.discarded_total += 1
+                retire = True
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+                retire = False
+            self._cond.notify()
+        if retire:
+            self._close(connection)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ...; a connection that raised a connection error is discarded."""
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Exception as e:
+            discard = is_connection_error(e)
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def _open_checked_out(self):
+        try:
+            connection = self._connect()
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            raise
+        entry = _Entry(connection)
+        with self._cond:
+            self._opening -= 1
+            self.created_total += 1
+            self._in_use[id(connection)] = entry
+        return connection
+
+    def _validated(self, entry: _Entry):
+        """Ping an idle-for-a-while connection; swap it for a new one if it is dead or too old."""
+        now = time.monotonic()
+        stale = now - entry.created > self.max_lifetime
+        if not stale and now - entry.last_used < self.validate_after:
+            return entry.connection
+        if not stale:
+            try:
+                self._ping(entry.connection)
+                return entry.connection
+            except Exception as e:
+                print(f"[DB POOL] Dropping dead connection: {e}")
+        with self._cond:
+            self._in_use.pop(id(entry.connection), None)
+            self._opening += 1
+            self.discarded_total += 1
+        self._close(entry.connection)
+        return self._open_checked_out()
+
+    # ── Background keepalive ─────────────────────────────────────────────
+
+    def start_keepalive(self):
+        """Open min_size connections and keep idle ones alive in a daemon thread."""
+        if self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name=f"{self.name}-pool-keepalive",
+                                                      daemon=True)
+            self._keepalive_thread.start()
+
+    def _keepalive_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.maintain()
+            except Exception as e:
+                print(f"[DB POOL] Keepalive error: {e}")
+            self._stop.wait(self.keepalive_interval)
+
+    def maintain(self):
+        """Retire old idle connections, ping the ones idle for a keepalive interval, refill to min_size."""
+        now = time.monotonic()
+        with self._cond:
+            checks = list(self._idle)
+            self._idle.clear()
+            self._checking = len(checks)  # Still counted in the pool size while checked
+        keep, dropped = [], 0
+        for entry in checks:
+            if now - entry.created > self.max_lifetime:
+                self._close(entry.connection)
+                dropped += 1
+                continue
+            if now - entry.last_used >= self.keepalive_interval:
+                try:
+                    self._ping(entry.connection)
+                    entry.last_used = time.monotonic()
+                except Exception as e:
+                    print(f"[DB POOL] Keepalive dropped a dead connection: {e}")
+                    self._close(entry.connection)
+                    dropped += 1
+                    continue
+            keep.append(entry)
+        with self._cond:
+            self._checking = 0
+            self._idle.extendleft(reversed(keep))
+            self.discarded_total += dropped
+            missing = self.min_size - self._size()
+            self._opening += max(0, missing)
+            self._cond.notify_all()
+        for _ in range(max(0, missing)):
+            try:
+                entry = _Entry(self._connect())
+            except Exception as e:
+                print(f"[DB POOL] Could not open connection: {e}")
+                with self._cond:
+                    self._opening -= 1
+                continue
+            with self._cond:
+                self._opening -= 1
+                self.created_total += 1
+                self._idle.appendleft(entry)
+                self._cond.notify()
+
+    # ── Introspection / shutdown ─────────────────────────────────────────
+
+    def _size(self) -> int:
+        return len(self._idle) + len(self._in_use) + self._opening + self._checking
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self._size(),
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiters,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "created_total": self.created_total,
+                "discarded_total": self.discarded_total,
+                "timeouts_total": self.timeouts_total,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._stop.set()
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for entry in idle:
+            self._close(entry.connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def is_connection_error(error: Exception) -> bool:
+    """True for errors after which the connection itself is unusable."""
+    message = str(error).lower()
+    return any(phrase in message for phrase in (
+        "gone away", "lost connection", "not connected", "broken pipe", "connection reset", "closed database",
+    ))
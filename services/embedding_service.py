@@ -0,0 +1,117 @@
+"""Embedding backends for RAG: HuggingFace (PyTorch) or int8-quantized ONNX Runtime."""
+import os
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+
+ONNX_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported (and int8-quantized) ONNX transformer.
+
+    Reproduces the sentence-transformers pipeline used by HuggingFaceEmbeddings for
+    multilingual-e5: mean pooling over the attention mask, then L2 normalization.
+    Export the model first with `python export_onnx_model.py`.
+    """
+
+    def __init__(self, model_dir: str, max_length: int = 512, batch_size: int = 16, num_threads: int = 0):
+        # Imported here so onnxruntime is only required when this backend is selected
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self._np = np
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("<pad>") or 0, pad_token="<pad>")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]):
+        np = self._np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling (same as the sentence-transformers Pooling module for e5)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents in batches."""
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._encode_batch([text])[0].tolist()
+
+
+def create_huggingface_embeddings():
+    """PyTorch sentence-transformers backend (the original RAG setup)."""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=settings.embedding_model,
+        encode_kwargs={"normalize_embeddings": True}
+    )
+
+
+def create_onnx_embeddings():
+    """Quantized ONNX Runtime backend."""
+    return OnnxEmbeddings(settings.onnx_model_dir, num_threads=settings.onnx_num_threads)
+
+
+def create_embeddings(backend: str = None):
+    """
+    Create the embedding backend selected by settings.embedding_backend.
+
+    Falls back to HuggingFace when the ONNX backend is requested but onnxruntime
+    or the exported model is missing, so a misconfigured worker still serves RAG.
+    """
+    backend = (backend or settings.embedding_backend).lower()
+
+    if backend == "onnx":
+        model_path = os.path.join(settings.onnx_model_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            print(f"WARNING: ONNX model not found at {model_path} (run export_onnx_model.py). Falling back to HuggingFace.")
+        else:
+            try:
+                embeddings = create_onnx_embeddings()
+                print(f"SUCCESS: Loaded ONNX embedding backend from {settings.onnx_model_dir}")
+                return embeddings
+            except ImportError as e:
+                print(f"WARNING: ONNX backend unavailable ({e}). Falling back to HuggingFace.")
+    elif backend != "huggingface":
+        print(f"WARNING: Unknown embedding backend '{backend}'. Using HuggingFace.")
+
+    return create_huggingface_embeddings()
@@ -3,9 +3,14 @@
 import re
 import json
 import os
+from typing import List
 from langchain.tools import tool
 # from langchain_openai import ChatOpenAI
 from config import settings
+from services.result_types import LanguageDetection
+from services.metrics_service import metrics
+from services.tracing_service import langchain_trace_handler
+from services.llm_usage_service import llm_usage_handler
 
 # Global LLM instance (lazy loaded)
 _llm_instance = None
@@ -16,7 +21,8 @@ def _get_llm():
     if _llm_instance is None:
         from langchain_openai import ChatOpenAI
         os.environ["OPENAI_API_KEY"] = settings.openai_api_key
-        _llm_instance = ChatOpenAI(model=settings.llm_model, temperature=0.2)
+        _llm_instance = ChatOpenAI(model=settings.llm_model, temperature=0.2,
+                                   callbacks=[llm_usage_handler(), langchain_trace_handler()])
     return _llm_instance
 
 # Session memory structure reference (handled by Agent logic, not stored here globally)
@@ -34,13 +40,13 @@ def enhanced_detect_language_tool(text: str) -> str:
     """
     return detect_language_logic(text)
 
-def detect_language_logic(text: str) -> str:
+def detect_language_result(text: str) -> LanguageDetection:
     """
     Enhanced language detection with real estate context awareness.
     CRITICAL: Distinguish between Arabic with numbers vs Franco-Arabic.
     """
     if not text or not text.strip():
-        return json.dumps({"language": "en", "confidence": 0.0, "reasoning": "Empty input"})
+        return LanguageDetection(language="en", confidence=0.0, reasoning="Empty input")
     
     # ✅ EXTRACT LANGUAGE HINT if present (highest priority)
     # Pattern: [Respond in English|Arabic|Franco-Arabic]
@@ -60,14 +66,14 @@ def detect_language_logic(text: str) -> str:
         # Remove hint from text for further processing
         clean_text = re.sub(hint_pattern, '', text, flags=re.IGNORECASE).strip()
         
-        return json.dumps({
-            "language": detected_lang,
-            "confidence": 1.0,
-            "reasoning": f"Explicit language hint detected: [{hint_lang}]",
-            "detected_patterns": ["language_hint"],
-            "arabic_ratio": 0.0,
-            "hint_provided": True
-        })
+        return LanguageDetection(
+            language=detected_lang,
+            confidence=1.0,
+            reasoning=f"Explicit language hint detected: [{hint_lang}]",
+            detected_patterns=["language_hint"],
+            arabic_ratio=0.0,
+            hint_provided=True
+        )
         
     # ✅ QUICK FRANCO CHECK: Common Franco words that should trigger immediate Franco detection
     text_lower = text.lower()
@@ -88,13 +94,13 @@ def detect_language_logic(text: str) -> str:
 
     if franco_matches and len(text_lower) < 100:  # Short queries with Franco words
         # print(f"[QUICK FRANCO DETECTION] Found: {franco_matches}")
-        return json.dumps({
-            "language": "franco",
-            "confidence": 0.95,
-            "reasoning": f"Quick detection: Found Franco indicators: {franco_matches}",
-            "detected_patterns": franco_matches,
-            "arabic_ratio": 0.0
-        })
+        return LanguageDetection(
+            language="franco",
+            confidence=0.95,
+            reasoning=f"Quick detection: Found Franco indicators: {franco_matches}",
+            detected_patterns=franco_matches,
+            arabic_ratio=0.0
+        )
 
     # 🚀 PERFORMANCE: Skip LLM language detection when disabled
     if not settings.use_llm_language_detection:
@@ -111,29 +117,29 @@ def detect_language_logic(text: str) -> str:
         franco_matches = [p for p in franco_patterns if p in text_lower]
 
         if arabic_ratio > 0.5:
-            return json.dumps({
-                "language": "ar",
-                "confidence": 0.9,
-                "reasoning": f"Fast heuristic: High Arabic ratio ({arabic_ratio:.1%})",
-                "detected_patterns": [],
-                "arabic_ratio": arabic_ratio
-            })
+            return LanguageDetection(
+                language="ar",
+                confidence=0.9,
+                reasoning=f"Fast heuristic: High Arabic ratio ({arabic_ratio:.1%})",
+                detected_patterns=[],
+                arabic_ratio=arabic_ratio
+            )
         if franco_matches:
-            return json.dumps({
-                "language": "franco",
-                "confidence": 0.85,
-                "reasoning": f"Fast heuristic: Franco patterns: {franco_matches}",
-                "detected_patterns": franco_matches,
-                "arabic_ratio": arabic_ratio
-            })
-
-        return json.dumps({
-            "language": "en",
-            "confidence": 0.6,
-            "reasoning": "Fast heuristic: Default to English",
-            "detected_patterns": [],
-            "arabic_ratio": arabic_ratio
-        })
+            return LanguageDetection(
+                language="franco",
+                confidence=0.85,
+                reasoning=f"Fast heuristic: Franco patterns: {franco_matches}",
+                detected_patterns=franco_matches,
+                arabic_ratio=arabic_ratio
+            )
+
+        return LanguageDetection(
+            language="en",
+            confidence=0.6,
+            reasoning="Fast heuristic: Default to English",
+            detected_patterns=[],
+            arabic_ratio=arabic_ratio
+        )
 
 
     prompt = f"""You are an expert language detection system specialized in real estate queries.
@@ -173,15 +179,14 @@ Return ONLY JSON:
         result = result.replace("```json", "").replace("```", "").strip()
         detection = json.loads(result)
 
-        detection.setdefault("language", "en")
-        detection.setdefault("confidence", 0.5)
-        detection.setdefault("reasoning", "Default detection")
-        detection.setdefault("detected_patterns", [])
-        detection.setdefault("arabic_ratio", 0.0)
-
-        # Normalize keys to match old system for compatibility if needed, OR we stick to new keys
-        # We will use NEW KEYS: 'ar', 'franco', 'en'
-        return json.dumps(detection)
+        # We use the language codes 'ar', 'franco', 'en'
+        return LanguageDetection(
+            language=detection.get("language", "en"),
+            confidence=detection.get("confidence", 0.5),
+            reasoning=detection.get("reasoning", "Default detection"),
+            detected_patterns=detection.get("detected_patterns", []),
+            arabic_ratio=detection.get("arabic_ratio", 0.0)
+        )
 
     except Exception as e:
         # Enhanced fallback
@@ -226,10 +231,15 @@ Return ONLY JSON:
                 "arabic_ratio": arabic_ratio
             }
 
-        return json.dumps(fallback)
+        return LanguageDetection(**fallback)
 
 
 
+def detect_language_logic(text: str) -> str:
+    """Language detection as a JSON string (LLM tool boundary)."""
+    return detect_language_result(text).to_json()
+
+
 def get_language_instruction(language: str) -> str:
     """
     Get instruction text for agent on how to respond in the detected language.
@@ -444,6 +454,7 @@ def enhanced_translate_text_tool(text: str, source_lang: str, target_lang: str)
     """Enhanced translation - Franco/Arabic/English ONLY. NO FRENCH ALLOWED."""
     return translate_text_logic(text, source_lang, target_lang)
 
+@metrics.timed("translation")
 def translate_text_logic(text: str, source_lang: str, target_lang: str) -> str:
     """Enhanced translation - Franco/Arabic/English ONLY. NO FRENCH ALLOWED."""
 
@@ -600,8 +611,67 @@ Return ONLY the translated text (no explanations):
         print(f"[ERROR] Translation failed: {e}")
         return text
 
+_ARABIC_SCRIPT = re.compile(r'[\u0600-\u06FF]')
+_LATIN_LETTERS = re.compile(r'[A-Za-z]')
+
+
+def _in_target_script(text: str, target_lang: str) -> bool:
+    """True if text needs no translation: no Arabic script for en/franco, no Latin letters for ar."""
+    if target_lang == 'ar':
+        return not _LATIN_LETTERS.search(text)
+    return not _ARABIC_SCRIPT.search(text)
+
+
+@metrics.timed("translation_batch")
+def translate_segments(segments: List[str], source_lang: str, target_lang: str) -> List[str]:
+    """
+    Translate many text segments at once, returning them in the same order.
+
+    Segments already in the target script are returned unchanged, identical
+    segments are translated once, cached translations are reused, and the
+    remaining LLM calls run concurrently. Surrounding whitespace is kept.
+    """
+    from services.cache_service import translation_cache
+    from services.stage_scheduler import stage_scheduler
+
+    translations = {}
+    pending = []
+    for segment in segments:
+        core = segment.strip()
+        if not core or core in translations or core in pending or _in_target_script(core, target_lang):
+            continue
+        cached = translation_cache.get(core, source_lang, target_lang)
+        if cached is not None:
+            translations[core] = cached
+        else:
+            pending.append(core)
+
+    if pending:
+        stages = {
+            str(i): (lambda core=core: translate_text_logic(core, source_lang, target_lang))
+            for i, core in enumerate(pending)
+        }
+        results = stage_scheduler.run(stages)
+        for i, core in enumerate(pending):
+            translated = results[str(i)]
+            translations[core] = translated
+            if translated != core:  # translate_text_logic returns the input on failure
+                translation_cache.set(core, source_lang, target_lang, translated)
+
+    print(f"[TRANSLATE] {len(segments)} segments: {len(translations) - len(pending)} cached, "
+          f"{len(pending)} translated concurrently")
+
+    output = []
+    for segment in segments:
+        core = segment.strip()
+        if core in translations:
+            start = segment.index(core)
+            segment = segment[:start] + translations[core] + segment[start + len(core):]
+        output.append(segment)
+    return output
+
 # Map legacy function to LOGIC function (callable)
-detect_language = detect_language_logic
+detect_language = detect_language_result
 # Map explicit translation logic for import
 translate_text_logic_func = translate_text_logic
 
@@ -0,0 +1,231 @@
+"""
+LLM call and token accounting per turn, call site and session, with a per-turn budget.
+
+chat_service opens a turn for each message (llm_usage.turn(session_id)). A
+LangChain callback handler attached to the LLM records the token usage of
+every response against the call site (the metrics stage the call ran in, the
+agent tool that made it, or "orchestrator") and checks the turn's budget
+before each call. A call over budget raises LLMBudgetExceeded: optional calls
+(fuzzy retry, translations, "no results" wording) fall back to their cheap
+path, and the agent loop ends with the best answer it has so far.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.metrics_service import metrics
+
+# LangGraph nodes that run the orchestrator model
+_ORCHESTRATOR_NODES = ("agent", "model")
+
+
+class LLMBudgetExceeded(Exception):
+    """The turn already used its configured maximum of LLM calls or tokens."""
+
+
+class TurnUsage:
+    """LLM calls and tokens of one chat turn."""
+
+    def __init__(self, session_id: str, max_calls: int, max_tokens: int):
+        self.session_id = session_id
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.by_site: Dict[str, Dict[str, int]] = {}
+        self.budget_exceeded = False
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def reserve_call(self, site: str):
+        """Count a call about to start; raises LLMBudgetExceeded if the turn is out of budget."""
+        with self._lock:
+            over_calls = self.max_calls and self.calls >= self.max_calls
+            over_tokens = self.max_tokens and self.total_tokens >= self.max_tokens
+            if over_calls or over_tokens:
+                self.budget_exceeded = True
+                raise LLMBudgetExceeded(
+                    f"LLM budget exceeded at {site}: {self.calls} calls, {self.total_tokens} tokens "
+                    f"(max {self.max_calls or '-'} calls, {self.max_tokens or '-'} tokens)"
+                )
+            self.calls += 1
+            self._site(site)["calls"] += 1
+
+    def add_tokens(self, site: str, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            entry = self._site(site)
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+
+    def _site(self, site: str) -> Dict[str, int]:
+        if site not in self.by_site:
+            self.by_site[site] = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+        return self.by_site[site]
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "budget_exceeded": self.budget_exceeded,
+                "by_call_site": {site: dict(entry) for site, entry in self.by_site.items()},
+            }
+
+
+_current_turn: contextvars.ContextVar[Optional[TurnUsage]] = contextvars.ContextVar("llm_turn", default=None)
+
+
+class LLMUsageTracker:
+    """Per-turn budgets plus running totals by call site and session (exported on /metrics)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.site_totals: Dict[str, Dict[str, int]] = {}
+        self.session_totals: Dict[str, Dict[str, int]] = {}
+        self.budget_exceeded_turns = 0
+
+    @contextmanager
+    def turn(self, session_id: str):
+        """Account the LLM calls made in this block (and stages it starts) as one turn."""
+        usage = TurnUsage(session_id, settings.max_llm_calls_per_turn, settings.max_llm_tokens_per_turn)
+        token = _current_turn.set(usage)
+        try:
+            yield usage
+        finally:
+            _current_turn.reset(token)
+            self._finish(usage)
+
+    @staticmethod
+    def current_turn() -> Optional[TurnUsage]:
+        return _current_turn.get()
+
+    def _finish(self, usage: TurnUsage):
+        summary = usage.summary()
+        with self._lock:
+            for site, entry in summary["by_call_site"].items():
+                totals = self.site_totals.setdefault(site, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+                for key, value in entry.items():
+                    totals[key] += value
+            session = self.session_totals.setdefault(usage.session_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            for key in session:
+                session[key] += summary[key]
+            if usage.budget_exceeded:
+                self.budget_exceeded_turns += 1
+        if summary["calls"]:
+            sites = ", ".join(f"{site}={entry['calls']}/{entry['input_tokens'] + entry['output_tokens']}"
+                              for site, entry in summary["by_call_site"].items())
+            flag = " BUDGET EXCEEDED" if usage.budget_exceeded else ""
+            print(f"[LLM USAGE] session={usage.session_id} calls={summary['calls']} "
+                  f"tokens={summary['input_tokens']}+{summary['output_tokens']}{flag} | {sites}")
+
+    def forget_session(self, session_id: str):
+        with self._lock:
+            self.session_totals.pop(session_id, None)
+
+    def collect(self):
+        """Counters for metrics.register_collector."""
+        with self._lock:
+            sites = {site: dict(entry) for site, entry in self.site_totals.items()}
+            exceeded = self.budget_exceeded_turns
+        return [
+            ("llm_calls_total", "LLM calls by call site.", "counter",
+             [({"call_site": site}, entry["calls"]) for site, entry in sorted(sites.items())]),
+            ("llm_tokens_total", "LLM tokens by call site and direction.", "counter",
+             [({"call_site": site, "direction": direction}, entry[f"{direction}_tokens"])
+              for site, entry in sorted(sites.items()) for direction in ("input", "output")]),
+            ("llm_budget_exceeded_turns_total", "Turns that hit the per-turn LLM budget.", "counter",
+             [({}, exceeded)]),
+        ]
+
+
+# Global usage tracker
+llm_usage = LLMUsageTracker()
+metrics.register_collector(llm_usage.collect)
+
+_callback_handler = None
+
+
+def llm_usage_handler():
+    """Shared LangChain callback handler that enforces the turn budget and records token usage."""
+    global _callback_handler
+    if _callback_handler is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMUsageCallbackHandler(BaseCallbackHandler):
+            # Budget errors must reach the caller instead of being logged by the callback manager
+            raise_error = True
+
+            def __init__(self):
+                self._lock = threading.Lock()
+                self._runs: Dict[Any, tuple] = {}  # LLM run_id -> (turn, call site)
+                self._tools: Dict[Any, tuple] = {}  # tool run_id -> (tool name, stage at tool start)
+
+            def _call_site(self, parent_run_id, metadata) -> str:
+                if (metadata or {}).get("langgraph_node") in _ORCHESTRATOR_NODES:
+                    return "orchestrator"
+                stage = metrics.current_stage()
+                tool = self._tools.get(parent_run_id)
+                if tool is not None and stage == tool[1]:
+                    # No stage of its own inside the tool: attribute the call to the tool
+                    return f"tool:{tool[0]}"
+                return stage or "other"
+
+            def _start(self, run_id, parent_run_id, metadata):
+                usage = _current_turn.get()
+                if usage is None:
+                    return
+                site = self._call_site(parent_run_id, metadata)
+                usage.reserve_call(site)
+                with self._lock:
+                    self._runs[run_id] = (usage, site)
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+                self._start(run_id, parent_run_id, metadata)
+
+            def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+                self._start(run_id, parent_run_id, metadata)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                with self._lock:
+                    entry = self._runs.pop(run_id, None)
+                if entry is None:
+                    return
+                usage_metadata = {}
+                try:
+                    usage_metadata = response.generations[0][0].message.usage_metadata or {}
+                except (AttributeError, IndexError):
+                    pass
+                if not usage_metadata:
+                    token_usage = (response.llm_output or {}).get("token_usage") or {}
+                    usage_metadata = {"input_tokens": token_usage.get("prompt_tokens", 0),
+                                      "output_tokens": token_usage.get("completion_tokens", 0)}
+                turn, site = entry
+                turn.add_tokens(site, usage_metadata.get("input_tokens", 0) or 0, usage_metadata.get("output_tokens", 0) or 0)
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                with self._lock:
+                    self._runs.pop(run_id, None)
+
+            def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+                with self._lock:
+                    self._tools[run_id] = ((serialized or {}).get("name") or "tool", metrics.current_stage())
+
+            def on_tool_end(self, output, *, run_id, **kwargs):
+                with self._lock:
+                    self._tools.pop(run_id, None)
+
+            def on_tool_error(self, error, *, run_id, **kwargs):
+                with self._lock:
+                    self._tools.pop(run_id, None)
+
+        _callback_handler = LLMUsageCallbackHandler()
+    return _callback_handler
@@ -0,0 +1,517 @@
+"""
+SQLite stand-in for the eshtri MySQL schema, for offline development and benchmarks.
+
+Only the tables and columns the chatbot reads are created: unit_search_sorting,
+unit_search_engine, unit_search_engine2, bi_unit, unit_details, promo and
+promo_text. generate_inventory() fills them with seeded synthetic units in both
+languages (lang_id 1 = English, 2 = Arabic).
+
+Build a database with: python generate_local_db.py --units 10000
+Point the app at it with: DB_BACKEND=sqlite (and SQLITE_DB_PATH if you changed --out)
+"""
+import os
+import random
+import re
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import COLUMNS
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SCHEMA
+# ═══════════════════════════════════════════════════════════════════════════
+
+_INTEGER_COLUMNS = {
+    "lang_id", "comp_text_id", "unit_id", "balcony", "bathroom", "room", "floor", "stat_id",
+    "phs_usg_id", "comp_id", "reg_id", "cat_id", "mod_id", "sec_id", "usg_id", "dev_id",
+    "kitchen", "storage", "utility", "bld_id", "terrace", "dressing", "club", "garage", "ac",
+    "flr_id", "has_promo", "sorting_id", "unit_search_status", "financing",
+}
+_REAL_COLUMNS = {
+    "area", "garden_size", "price", "outdoor_area", "roof_area", "down_payment", "deposit",
+    "monthly_installment",
+}
+
+
+def _column_type(column: str) -> str:
+    if column in _INTEGER_COLUMNS:
+        return "INTEGER"
+    if column in _REAL_COLUMNS:
+        return "REAL"
+    return "TEXT"
+
+
+def column_definition(column: str) -> str:
+    """Typed like MySQL, and with its default case-insensitive text comparisons ('apartment' = 'Apartment')."""
+    column_type = _column_type(column)
+    return f"{column} {column_type}" + (" COLLATE NOCASE" if column_type == "TEXT" else "")
+
+
+UNIT_TABLES = ("unit_search_sorting", "unit_search_engine", "unit_search_engine2")
+
+BI_UNIT_COLUMNS = [
+    "unit_id", "lang_id", "comp_id", "compound_name", "price", "area", "has_promo", "promo_text",
+    "down_payment", "deposit", "monthly_installment", "payment_plan", "status_text",
+]
+
+UNIT_DETAILS_COLUMNS = ["unit_id", "lang_id", "description", "view", "orientation", "delivery_date"]
+
+SCHEMA = [
+    *[f"CREATE TABLE IF NOT EXISTS {table} ("
+      + ", ".join(column_definition(column) for column in COLUMNS) + ")"
+      for table in UNIT_TABLES],
+    "CREATE TABLE IF NOT EXISTS bi_unit ("
+    + ", ".join(column_definition(column) for column in BI_UNIT_COLUMNS) + ")",
+    "CREATE TABLE IF NOT EXISTS unit_details (unit_id INTEGER, lang_id INTEGER, description TEXT, "
+    "view TEXT, orientation TEXT, delivery_date TEXT)",
+    "CREATE TABLE IF NOT EXISTS promo (prom_id INTEGER PRIMARY KEY, unt_id INTEGER, comp_id INTEGER, "
+    "start_date TEXT, end_date TEXT)",
+    "CREATE TABLE IF NOT EXISTS promo_text (prom_id INTEGER, lang_id INTEGER, title TEXT, text TEXT)",
+]
+
+# Lookups the app makes by unit/promo id, plus the common search filters
+INDEXES = [
+    *[f"CREATE INDEX IF NOT EXISTS idx_{table}_unit ON {table} (unit_id, lang_id)" for table in UNIT_TABLES],
+    "CREATE INDEX IF NOT EXISTS idx_unit_search_sorting_search ON unit_search_sorting (lang_id, room, price)",
+    # Keyset order of "show more" pages (services/search_pagination.py)
+    "CREATE INDEX IF NOT EXISTS idx_unit_search_sorting_keyset ON unit_search_sorting (lang_id, sorting_id, unit_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bi_unit_unit ON bi_unit (unit_id, lang_id)",
+    "CREATE INDEX IF NOT EXISTS idx_unit_details_unit ON unit_details (unit_id, lang_id)",
+    "CREATE INDEX IF NOT EXISTS idx_promo_unit ON promo (unt_id)",
+    "CREATE INDEX IF NOT EXISTS idx_promo_text_promo ON promo_text (prom_id, lang_id)",
+]
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# CONNECTION (MySQL dialect shims)
+# ═══════════════════════════════════════════════════════════════════════════
+
+_SHOW_COLUMNS = re.compile(r'^\s*SHOW\s+COLUMNS\s+FROM\s+`?(\w+)`?\s*;?\s*$', re.IGNORECASE)
+_SHOW_TABLES = re.compile(r'^\s*SHOW\s+TABLES\s*;?\s*$', re.IGNORECASE)
+_SHOW_INDEX = re.compile(r'^\s*SHOW\s+(?:INDEX|INDEXES|KEYS)\s+FROM\s+`?(\w+)`?\s*;?\s*$', re.IGNORECASE)
+
+
+def _dict_factory(cursor, row) -> Dict[str, Any]:
+    return {description[0]: value for description, value in zip(cursor.description, row)}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the local database with dict rows and MySQL-compatible LOWER/UPPER for Arabic text."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Local database not found at {path}. Run: python generate_local_db.py")
+    return _prepare(sqlite3.connect(path, check_same_thread=False))
+
+
+def connect_memory() -> sqlite3.Connection:
+    """A private in-memory database with the same row format and functions as connect()."""
+    return _prepare(sqlite3.connect(":memory:", check_same_thread=False))
+
+
+def _prepare(connection: sqlite3.Connection) -> sqlite3.Connection:
+    connection.row_factory = _dict_factory
+    # SQLite's built-in LOWER/UPPER only fold ASCII
+    connection.create_function("LOWER", 1, lambda value: value.lower() if isinstance(value, str) else value,
+                               deterministic=True)
+    connection.create_function("UPPER", 1, lambda value: value.upper() if isinstance(value, str) else value,
+                               deterministic=True)
+    return connection
+
+
+def translate_mysql(sql: str) -> str:
+    """Rewrite the MySQL-only statements the app and scripts use into SQLite."""
+    match = _SHOW_COLUMNS.match(sql)
+    if match:
+        return (f"SELECT name AS Field, type AS Type, CASE WHEN \"notnull\" THEN 'NO' ELSE 'YES' END AS \"Null\", "
+                f"dflt_value AS \"Default\" FROM pragma_table_info('{match.group(1)}')")
+    match = _SHOW_INDEX.match(sql)
+    if match:
+        return (f"SELECT il.name AS Key_name, ii.seqno + 1 AS Seq_in_index, ii.name AS Column_name "
+                f"FROM pragma_index_list('{match.group(1)}') il, pragma_index_info(il.name) ii "
+                f"ORDER BY il.name, ii.seqno")
+    if _SHOW_TABLES.match(sql):
+        return "SELECT name AS Tables_in_eshtri FROM sqlite_master WHERE type = 'table' ORDER BY name"
+    return sql
+
+
+def execute(connection: sqlite3.Connection, sql: str, params=()) -> List[Dict[str, Any]]:
+    """Run one statement (with optional %s parameters) and return its rows as dicts."""
+    sql = translate_mysql(sql)
+    if params:
+        sql = sql.replace("%s", "?")  # mysql-connector placeholders
+    cursor = connection.execute(sql, params)
+    try:
+        return cursor.fetchall() if cursor.description else []
+    finally:
+        cursor.close()
+
+
+class CompatCursor:
+    """Cursor with the mysql-connector calls the app uses (rows are always dicts)."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, sql: str, params=()):
+        sql = translate_mysql(sql)
+        if params:
+            sql = sql.replace("%s", "?")  # mysql-connector placeholders
+        self._cursor.execute(sql, params)
+
+    def fetchone(self) -> Optional[Dict[str, Any]]:
+        return self._cursor.fetchone() if self._cursor.description else None
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return self._cursor.fetchall() if self._cursor.description else []
+
+    def close(self):
+        self._cursor.close()
+
+
+class CompatConnection:
+    """Stands in for mysql.connector.connect(...) in code that manages its own cursors."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self._connection = connection
+
+    def cursor(self, dictionary: bool = True) -> CompatCursor:
+        return CompatCursor(self._connection)
+
+    def is_connected(self) -> bool:
+        return True
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SYNTHETIC INVENTORY
+# ═══════════════════════════════════════════════════════════════════════════
+
+# (English, Arabic, weight, price per m² in EGP)
+REGIONS = [
+    ("New Cairo", "القاهرة الجديدة", 0.26, 62000),
+    ("Sheikh Zayed", "الشيخ زايد", 0.14, 58000),
+    ("6th of October", "السادس من أكتوبر", 0.14, 42000),
+    ("New Capital", "العاصمة الإدارية الجديدة", 0.16, 48000),
+    ("Mostakbal City", "مدينة المستقبل", 0.08, 45000),
+    ("North Coast", "الساحل الشمالي", 0.12, 85000),
+    ("Ain Sokhna", "العين السخنة", 0.06, 55000),
+    ("Madinaty", "مدينتي", 0.04, 50000),
+]
+
+# (English, Arabic, weight, room choices, (median area, spread), price multiplier)
+UNIT_TYPES = [
+    ("Apartment", "شقة", 0.52, (1, 2, 2, 3, 3, 3, 4), (150, 0.30), 1.0),
+    ("Studio", "استوديو", 0.06, (1,), (65, 0.20), 1.05),
+    ("Duplex", "دوبلكس", 0.08, (3, 4, 4, 5), (240, 0.25), 1.05),
+    ("Penthouse", "بنتهاوس", 0.04, (3, 4), (260, 0.25), 1.15),
+    ("Townhouse", "تاون هاوس", 0.10, (3, 4, 4), (260, 0.20), 1.20),
+    ("Twin House", "توين هاوس", 0.07, (4, 4, 5), (300, 0.20), 1.25),
+    ("Villa", "فيلا", 0.07, (4, 5, 5, 6), (420, 0.30), 1.35),
+    ("Chalet", "شاليه", 0.06, (1, 2, 2, 3), (110, 0.25), 1.10),
+]
+
+# (English, Arabic, weight, stat_id)
+STATUSES = [
+    ("Available", "متاحة", 0.68, 1),
+    ("Reserved", "محجوزة", 0.14, 2),
+    ("Sold", "مباعة", 0.11, 3),
+    ("Temporary Locked", "مغلقة مؤقتا", 0.05, 4),
+    ("Off Market", "غير متاحة", 0.02, 5),
+]
+
+FINISHING = [("Fully Finished", "تشطيب كامل"), ("Semi Finished", "نصف تشطيب"),
+             ("Core & Shell", "على الطوب"), ("Furnished", "مفروشة")]
+
+DEVELOPERS = [
+    ("Talaat Moustafa Group", "مجموعة طلعت مصطفى"), ("Palm Hills", "بالم هيلز"), ("SODIC", "سوديك"),
+    ("Emaar Misr", "إعمار مصر"), ("Mountain View", "ماونتن فيو"), ("Hassan Allam", "حسن علام"),
+    ("Ora Developers", "أورا"), ("La Vista", "لافيستا"), ("Madinet Masr", "مدينة مصر"),
+    ("Hyde Park", "هايد بارك"), ("Tatweer Misr", "تطوير مصر"), ("Misr Italia", "مصر إيطاليا"),
+]
+
+COMPOUND_WORDS = [
+    ("Park", "بارك"), ("Heights", "هايتس"), ("Residence", "ريزيدنس"), ("Gardens", "جاردنز"),
+    ("Hills", "هيلز"), ("Bay", "باي"), ("Village", "فيلدج"), ("Square", "سكوير"), ("View", "فيو"),
+    ("Lagoons", "لاجونز"), ("Valley", "فالي"), ("Greens", "جرينز"),
+]
+
+# (English title, Arabic title, percent range) — a unit can have no promo, a % promo or a text-only offer
+PROMO_KINDS = [
+    ("Summer Offer", "عرض الصيف", (5, 15)),
+    ("Cash Discount", "خصم الكاش", (10, 25)),
+    ("Launch Price", "سعر الإطلاق", (3, 8)),
+    ("Zero Down Payment", "بدون مقدم", None),
+]
+
+PAYMENT_PLANS = [
+    # (years, down payment %, English, Arabic)
+    (0, 100, "Cash", "كاش"),
+    (5, 10, "10% down payment over 5 years", "مقدم 10% على 5 سنوات"),
+    (7, 10, "10% down payment over 7 years", "مقدم 10% على 7 سنوات"),
+    (8, 5, "5% down payment over 8 years", "مقدم 5% على 8 سنوات"),
+    (10, 0, "0% down payment over 10 years", "بدون مقدم على 10 سنوات"),
+]
+
+
+def _weighted(rng: random.Random, items, weight_index: int):
+    return rng.choices(items, weights=[item[weight_index] for item in items])[0]
+
+
+def _build_catalog(rng: random.Random, n_compounds: int) -> List[Dict[str, Any]]:
+    """Compounds, each tied to a region and a developer."""
+    compounds = []
+    for comp_id in range(1, n_compounds + 1):
+        region_index = REGIONS.index(_weighted(rng, REGIONS, 2))
+        dev_index = rng.randrange(len(DEVELOPERS))
+        word_en, word_ar = rng.choice(COMPOUND_WORDS)
+        dev_en, dev_ar = DEVELOPERS[dev_index]
+        compounds.append({
+            "comp_id": comp_id,
+            "reg_id": region_index + 1,
+            "dev_id": dev_index + 1,
+            "name_en": f"{dev_en.split()[0]} {word_en} {comp_id}",
+            "name_ar": f"{word_ar} {dev_ar.split()[-1]} {comp_id}",
+            "features": rng.sample(["Club House", "Swimming Pools", "Gym", "Kids Area", "Mall",
+                                    "Security 24/7", "Landscape", "Beach Access"], 4),
+        })
+    return compounds
+
+
+def _generate_unit(rng: random.Random, unit_id: int, compound: Dict[str, Any], today: date) -> Tuple[Dict, Dict]:
+    """One unit's language-independent values and its promo (or None)."""
+    type_index = UNIT_TYPES.index(_weighted(rng, UNIT_TYPES, 2))
+    _, _, _, rooms, (median_area, spread), multiplier = UNIT_TYPES[type_index]
+    region = REGIONS[compound["reg_id"] - 1]
+
+    room = rng.choice(rooms)
+    area = round(median_area * rng.lognormvariate(0, spread) * (0.8 + 0.1 * room / max(rooms)), 0)
+    price = round(area * region[3] * multiplier * rng.uniform(0.85, 1.2), -3)
+    status_index = STATUSES.index(_weighted(rng, STATUSES, 2))
+    plan_index = rng.choices(range(len(PAYMENT_PLANS)), weights=[0.15, 0.3, 0.3, 0.15, 0.1])[0]
+    years, down_pct = PAYMENT_PLANS[plan_index][:2]
+    down_payment = round(price * down_pct / 100, 0)
+    monthly = round((price - down_payment) / (years * 12), 0) if years else 0.0
+
+    unit = {
+        "unit_id": unit_id,
+        "comp_id": compound["comp_id"],
+        "reg_id": compound["reg_id"],
+        "dev_id": compound["dev_id"],
+        "type_index": type_index,
+        "status_index": status_index,
+        "plan_index": plan_index,
+        "finishing_index": rng.randrange(len(FINISHING)),
+        "room": room,
+        "bathroom": max(1, room - rng.choice((0, 0, 1))),
+        "area": area,
+        "price": price,
+        "floor": 0 if type_index in (4, 5, 6) else rng.randint(0, 12),
+        "garden_size": round(rng.uniform(30, 300), 0) if type_index in (4, 5, 6) or rng.random() < 0.1 else 0.0,
+        "down_payment": down_payment,
+        "deposit": round(price * 0.05, 0),
+        "monthly_installment": monthly,
+        "delivery_date": (today + timedelta(days=rng.randint(-365, 5 * 365))).isoformat(),
+        "price_update_date": (today - timedelta(days=rng.randint(0, 180))).isoformat(),
+        "has_video": rng.random() < 0.2,
+    }
+
+    promo = None
+    if rng.random() < 0.18:
+        kind_index = rng.randrange(len(PROMO_KINDS))
+        percent_range = PROMO_KINDS[kind_index][2]
+        promo = {
+            "kind_index": kind_index,
+            "percent": rng.randint(*percent_range) if percent_range else None,
+            "start_date": (today - timedelta(days=rng.randint(0, 60))).isoformat(),
+            "end_date": (today + timedelta(days=rng.randint(7, 120))).isoformat(),
+            # Some promos only live in the promo tables, not in the has_promo/promo_text columns
+            "flag_on_unit": rng.random() < 0.7,
+        }
+    return unit, promo
+
+
+def _promo_texts(promo: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+    if promo is None:
+        return None, None
+    title_en, title_ar, _ = PROMO_KINDS[promo["kind_index"]]
+    if promo["percent"] is None:
+        return title_en, title_ar
+    return f"{title_en} - {promo['percent']}% off", f"{title_ar} - خصم {promo['percent']}%"
+
+
+def _unit_rows(unit: Dict[str, Any], compound: Dict[str, Any], promo: Optional[Dict[str, Any]]) -> List[Dict]:
+    """The unit_search_sorting rows of a unit, one per language."""
+    type_en, type_ar = UNIT_TYPES[unit["type_index"]][:2]
+    status_en, status_ar, _, stat_id = STATUSES[unit["status_index"]]
+    region_en, region_ar = REGIONS[unit["reg_id"] - 1][:2]
+    dev_en, dev_ar = DEVELOPERS[unit["dev_id"] - 1]
+    finishing_en, finishing_ar = FINISHING[unit["finishing_index"]]
+    plan_en, plan_ar = PAYMENT_PLANS[unit["plan_index"]][2:]
+    promo_en, promo_ar = _promo_texts(promo)
+    has_promo = 1 if promo is not None and promo["flag_on_unit"] else 0
+    unit_id = unit["unit_id"]
+    base_url = "https://cdn.eshtriaqar.example"
+
+    rows = []
+    for lang_id, names in ((1, (type_en, status_en, region_en, dev_en, finishing_en, plan_en, promo_en,
+                                compound["name_en"])),
+                           (2, (type_ar, status_ar, region_ar, dev_ar, finishing_ar, plan_ar, promo_ar,
+                                compound["name_ar"]))):
+        type_text, status_text, region_text, dev_name, finishing, plan_text, promo_text, compound_name = names
+        row = dict.fromkeys(COLUMNS)
+        row.update({
+            "lang_id": lang_id,
+            "comp_text_id": compound["comp_id"] * 10 + lang_id,
+            "unt_code": f"U-{unit_id:07d}",
+            "unit_id": unit_id,
+            "area": unit["area"],
+            "balcony": 0 if unit["floor"] == 0 else 1,
+            "bathroom": unit["bathroom"],
+            "room": unit["room"],
+            "floor": unit["floor"],
+            "garden_size": unit["garden_size"],
+            "stat_id": stat_id,
+            "price": unit["price"],
+            "delivery_date": unit["delivery_date"],
+            "phs_usg_id": unit["type_index"] + 1,
+            "finishing": finishing,
+            "comp_id": compound["comp_id"],
+            "developer_description_short": dev_name,
+            "developer_name": dev_name,
+            "reg_id": unit["reg_id"],
+            "region_text": region_text,
+            "category": "Residential" if lang_id == 1 else "سكني",
+            "cat_id": 1,
+            "usage_text": type_text,
+            "model_text": type_text,
+            "model_name": f"{type_text} {unit['room']}",
+            "mod_id": unit["type_index"] + 1,
+            "compound_text": compound_name,
+            "compound_name": compound_name,
+            "usg_id": unit["type_index"] + 1,
+            "dev_id": unit["dev_id"],
+            "dev_code": f"D{unit['dev_id']:03d}",
+            "comp_code": f"C{compound['comp_id']:05d}",
+            "kitchen": 1,
+            "storage": int(unit["area"] > 200),
+            "club": 1,
+            "garage": int(unit["type_index"] >= 4),
+            "ac": int(unit["finishing_index"] in (0, 3)),
+            "down_payment": unit["down_payment"],
+            "deposit": unit["deposit"],
+            "monthly_installment": unit["monthly_installment"],
+            "installment_type": "Monthly" if lang_id == 1 else "شهري",
+            "payment_plan": plan_text,
+            "promo_text": promo_text if has_promo else None,
+            "has_promo": has_promo,
+            "price_update_date": unit["price_update_date"],
+            "video_url": f"https://www.youtube.com/watch?v=u{unit_id}" if unit["has_video"] else None,
+            "comp_feature_1": compound["features"][0],
+            "comp_feature_2": compound["features"][1],
+            "comp_feature_3": compound["features"][2],
+            "comp_feature_4": compound["features"][3],
+            "sorting_id": unit_id,
+            "unit_image": f"{base_url}/units/{unit_id}",
+            "sm_unit_image": f"{base_url}/units/sm/{unit_id}.jpg",
+            "developer_logo": f"{base_url}/developers/{unit['dev_id']}.png",
+            "compound_image": f"{base_url}/compounds/{compound['comp_id']}",
+            "unit_search_status": 1 if stat_id == 1 else 0,
+            "status_text": status_text,
+            "financing": int(unit["plan_index"] > 0),
+        })
+        rows.append(row)
+    return rows
+
+
+def _insert(connection: sqlite3.Connection, table: str, columns: List[str], rows: List[Dict[str, Any]]):
+    if rows:
+        placeholders = ", ".join("?" for _ in columns)
+        connection.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+            [tuple(row.get(column) for column in columns) for row in rows],
+        )
+
+
+def create_schema(connection: sqlite3.Connection):
+    for statement in SCHEMA:
+        connection.execute(statement)
+
+
+def generate_inventory(path: str, n_units: int = 10000, seed: int = 42, batch_size: int = 5000) -> Dict[str, Any]:
+    """
+    Create (or replace) a local database with n_units synthetic units.
+
+    The same seed always produces the same inventory. Returns row counts and timing.
+    """
+    start = time.time()
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = random.Random(seed)
+    today = date(2025, 1, 1)  # Fixed so dates are reproducible too
+    compounds = _build_catalog(rng, max(20, n_units // 150))
+
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    create_schema(connection)
+
+    promo_count = 0
+    for batch_start in range(0, n_units, batch_size):
+        sorting_rows, bi_rows, detail_rows, promo_rows, promo_text_rows = [], [], [], [], []
+        for unit_id in range(100000 + batch_start, 100000 + min(batch_start + batch_size, n_units)):
+            compound = rng.choice(compounds)
+            unit, promo = _generate_unit(rng, unit_id, compound, today)
+            rows = _unit_rows(unit, compound, promo)
+            sorting_rows.extend(rows)
+            for row in rows:
+                bi_rows.append({column: row.get(column) for column in BI_UNIT_COLUMNS})
+                view = ("Garden View", "إطلالة على الحديقة") if unit["garden_size"] else ("Street View", "إطلالة على الشارع")
+                detail_rows.append({
+                    "unit_id": unit_id, "lang_id": row["lang_id"],
+                    "description": (f"{row['usage_text']} in {row['compound_name']}, {row['region_text']}"
+                                    if row["lang_id"] == 1 else
+                                    f"{row['usage_text']} في {row['compound_name']}، {row['region_text']}"),
+                    "view": view[row["lang_id"] - 1],
+                    "orientation": rng.choice(("North", "South", "East", "West")),
+                    "delivery_date": row["delivery_date"],
+                })
+            if promo is not None:
+                promo_count += 1
+                promo_rows.append({"prom_id": promo_count, "unt_id": unit_id, "comp_id": compound["comp_id"],
+                                   "start_date": promo["start_date"], "end_date": promo["end_date"]})
+                promo_en, promo_ar = _promo_texts(promo)
+                for lang_id, text in ((1, promo_en), (2, promo_ar)):
+                    title, _, detail = text.partition(" - ")
+                    promo_text_rows.append({"prom_id": promo_count, "lang_id": lang_id, "title": title, "text": detail})
+
+        _insert(connection, "unit_search_sorting", COLUMNS, sorting_rows)
+        _insert(connection, "bi_unit", BI_UNIT_COLUMNS, bi_rows)
+        _insert(connection, "unit_details", UNIT_DETAILS_COLUMNS, detail_rows)
+        _insert(connection, "promo", ["prom_id", "unt_id", "comp_id", "start_date", "end_date"], promo_rows)
+        _insert(connection, "promo_text", ["prom_id", "lang_id", "title", "text"], promo_text_rows)
+        connection.commit()
+
+    # The search-engine tables share the unit_search_sorting layout
+    for table in UNIT_TABLES[1:]:
+        connection.execute(f"INSERT INTO {table} SELECT * FROM unit_search_sorting")
+    for statement in INDEXES:
+        connection.execute(statement)
+    connection.execute("ANALYZE")
+    connection.commit()
+
+    counts = {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in (*UNIT_TABLES, "bi_unit", "unit_details", "promo", "promo_text")}
+    connection.close()
+    return {"path": path, "units": n_units, "seed": seed, "rows": counts,
+            "seconds": round(time.time() - start, 2)}
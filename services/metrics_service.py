@@ -0,0 +1,163 @@
+"""Per-stage latency histograms and service gauges, exposed in Prometheus text format."""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from services.tracing_service import tracer
+
+# Seconds; chat turns range from sub-millisecond stages to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_PREFIX = "eshtri_chatbot"
+
+# Innermost stage running in this context (used to attribute LLM calls to a call site)
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("current_stage", default="")
+
+# (name, help, type, [(labels, value), ...]) as returned by gauge collectors
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label value."""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, List[float]] = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[str, dict]:
+        """{label value: {"count", "sum", "buckets": {le: cumulative count}}}."""
+        with self._lock:
+            return {
+                label_value: {
+                    "count": series[len(self.buckets)],
+                    "sum": series[-1],
+                    "buckets": dict(zip(self.buckets, series[:len(self.buckets)])),
+                }
+                for label_value, series in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, data in sorted(self.snapshot().items()):
+            for bound, count in data["buckets"].items():
+                labels = _format_labels({self.label: label_value, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels({self.label: label_value, "le": "+Inf"})
+            lines.append(f"{self.name}_bucket{labels} {data['count']}")
+            lines.append(f"{self.name}_sum{_format_labels({self.label: label_value})} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{_format_labels({self.label: label_value})} {data['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Stage timings of the chat pipeline plus gauges collected at scrape time.
+
+    Stages are timed with `with metrics.stage("name"):`, `@metrics.timed("name")`
+    or metrics.observe(name, seconds); the first two also open a trace span of the
+    same name when the call is part of a traced request. Gauges (cache hit ratios, DB pool use,
+    sessions) come from collectors registered by the services that own them.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            f"{METRIC_PREFIX}_stage_duration_seconds",
+            "Latency of chat pipeline stages (process_message, tools, LLM calls).",
+            label="stage",
+        )
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def observe(self, stage: str, seconds: float):
+        self.stage_seconds.observe(stage, seconds)
+
+    @staticmethod
+    def current_stage() -> str:
+        """Name of the innermost stage/timed call running in this context ("" outside any)."""
+        return _current_stage.get()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        token = _current_stage.set(name)
+        try:
+            with tracer.span(name):
+                yield
+        finally:
+            _current_stage.reset(token)
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name: str):
+        """Decorator: record every call of the function as stage name."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                token = _current_stage.set(name)
+                try:
+                    with tracer.span(name):
+                        return fn(*args, **kwargs)
+                finally:
+                    _current_stage.reset(token)
+                    self.observe(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """collector() returns (name, help, type, [(labels, value), ...]) tuples at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = self.stage_seconds.render()
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"[METRICS] Collector {getattr(collector, '__name__', collector)} failed: {e}")
+                continue
+            for name, help_text, metric_type, values in samples:
+                full_name = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {metric_type}")
+                for labels, value in values:
+                    lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,207 @@
+"""
+Resolve region / compound / developer mentions to their indexed IDs.
+
+The index holds every distinct (reg_id, region_text), (comp_id, compound_name /
+compound_text) and (dev_id, developer_name) pair in both languages, plus the
+ALIASES below, under a normalized key: lowercase, no diacritics or hamza
+variants (أ/إ/آ -> ا, ى -> ي, ة -> ه), no "el"/"al"/"ال" articles, and Franco
+digits inside words read as letters (sa7el -> sahel). A mention resolves by,
+in order: exact key, LIKE-style substring, then the closest name by trigram or
+edit-distance similarity (typos such as "Madinati", "Shiekh Zayid"). Lookups are dictionary hits or a scan of the few hundred
+distinct names, and resolved mentions are memoized.
+
+sql_validator rewrites name filters of generated SQL (region_text LIKE '%...%')
+to reg_id / comp_id / dev_id IN (...) with it.
+"""
+import re
+import threading
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Free-text name column -> indexed ID column
+NAME_ID_COLUMNS = {
+    "region_text": "reg_id",
+    "compound_name": "comp_id",
+    "compound_text": "comp_id",
+    "developer_name": "dev_id",
+}
+# Other spellings users type, keyed by a name the database uses (either language)
+ALIASES = {
+    "reg_id": {
+        "New Cairo": ["tagamoa", "tagamo3", "el tagamo3", "5th settlement", "fifth settlement", "التجمع",
+                      "التجمع الخامس"],
+        "Sheikh Zayed": ["zayed", "el sheikh zayed", "sheikh zayed city", "زايد"],
+        "6th of October": ["october", "6 october", "october city", "6th october", "اكتوبر", "6 اكتوبر"],
+        "North Coast": ["sahel", "el sahel", "sa7el", "el sa7el", "north coast sahel", "الساحل"],
+        "Madinaty": ["madinty", "medinaty"],
+        "Mostakbal City": ["mostakbal", "future city", "el mostakbal", "المستقبل"],
+        "New Capital": ["new administrative capital", "administrative capital", "el asema", "العاصمه",
+                        "العاصمه الاداريه"],
+        "Ain Sokhna": ["sokhna", "el sokhna", "السخنه", "العين السخنه"],
+    },
+}
+FUZZY_THRESHOLD = 0.6  # Trigram Dice similarity a typo must reach...
+EDIT_THRESHOLD = 0.75  # ...or 1 - edit distance / length (two typos in a short name)
+MAX_MEMOIZED = 5000
+
+_FRANCO_DIGITS = {"2": "a", "3": "a", "5": "kh", "7": "h", "8": "gh", "9": "q"}
+_FRANCO = re.compile(r"(?<=[a-z])[235789](?=[a-z]|\b)")
+_ARABIC_LETTERS = str.maketrans({"ى": "ي", "ة": "ه", "ـ": ""})
+_ARTICLES = {"el", "al", "the"}
+
+
+def normalize(text: str) -> str:
+    """Comparison key of a name: see module docstring."""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    # Drops Latin accents and Arabic tashkeel / hamza marks (أ decomposes to ا + hamza)
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn").translate(_ARABIC_LETTERS)
+    text = _FRANCO.sub(lambda m: _FRANCO_DIGITS[m.group()], text)
+    words = re.sub(r"[\W_]+", " ", text).split()
+    return " ".join(word[2:] if word.startswith("ال") and len(word) > 4 else word
+                    for word in words if word not in _ARTICLES)
+
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance (names are short, so the plain O(len(a) * len(b)) table)."""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class NameResolver:
+    """
+    Normalized name -> IDs index per ID column, loaded from the database (db) and
+    refreshed after ttl seconds or when the inventory version changes.
+    """
+
+    def __init__(self, db=None, ttl: float = 600.0, aliases: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.db = db
+        self.ttl = ttl
+        self.aliases = ALIASES if aliases is None else aliases
+        self._index: Dict[str, Dict[str, Set[int]]] = {}  # id column -> key -> ids
+        self._grams: Dict[str, Dict[str, Set[str]]] = {}  # id column -> trigram -> keys
+        self._resolved: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        self._loaded_at = float("-inf")
+        self._version = None
+        self._lock = threading.Lock()
+
+    def load(self, pairs: Dict[str, Iterable[Tuple[str, int]]]):
+        """Build the index from {name column: [(name, id), ...]}."""
+        index: Dict[str, Dict[str, Set[int]]] = {}
+        for name_column, values in pairs.items():
+            by_key = index.setdefault(NAME_ID_COLUMNS[name_column], {})
+            for name, id_ in values:
+                if name and id_ is not None and normalize(name):
+                    by_key.setdefault(normalize(name), set()).add(int(id_))
+        for id_column, aliases in self.aliases.items():
+            by_key = index.get(id_column, {})
+            for name, spellings in aliases.items():
+                ids = by_key.get(normalize(name))
+                for spelling in spellings if ids else ():
+                    by_key.setdefault(normalize(spelling), set()).update(ids)
+        grams: Dict[str, Dict[str, Set[str]]] = {}
+        for id_column, by_key in index.items():
+            for key in by_key:
+                for gram in _trigrams(key):
+                    grams.setdefault(id_column, {}).setdefault(gram, set()).add(key)
+        self._index, self._grams, self._resolved = index, grams, {}
+        self._loaded_at = float("inf") if self.db is None else time.monotonic()
+
+    def _ensure_loaded(self):
+        if self.db is None:
+            return
+        version = getattr(self.db, "inventory_version", None)
+        if time.monotonic() - self._loaded_at < self.ttl and version == self._version:
+            return
+        with self._lock:
+            if time.monotonic() - self._loaded_at < self.ttl and version == self._version:
+                return
+            pairs = {}
+            for name_column, id_column in NAME_ID_COLUMNS.items():
+                rows, error = self.db.execute_query(
+                    f"SELECT DISTINCT {id_column} AS id, {name_column} AS name FROM unit_search_sorting",
+                    use_cache=False)
+                if error:
+                    print(f"[NAME RESOLVER] {name_column} names unavailable: {error}")
+                    continue
+                pairs[name_column] = [(row["name"], row["id"]) for row in rows]
+            self.load(pairs)
+            self._version = version
+
+    def resolve(self, id_column: str, mention: str, fuzzy: bool = True) -> List[int]:
+        """IDs the mention refers to (exact, then substring, then trigram match); [] if none."""
+        self._ensure_loaded()
+        key = normalize(mention)
+        memo_key = (id_column, key if fuzzy else "=" + key)
+        if memo_key in self._resolved:
+            return list(self._resolved[memo_key])
+        by_key = self._index.get(id_column, {})
+        ids: Set[int] = set(by_key.get(key, ()))
+        if not ids and len(key) >= 3:
+            ids = {id_ for name, name_ids in by_key.items() if key in name for id_ in name_ids}
+        if not ids and fuzzy and len(key) >= 4:
+            ids = self._similar(id_column, key)
+        if len(self._resolved) >= MAX_MEMOIZED:
+            self._resolved.clear()
+        self._resolved[memo_key] = tuple(sorted(ids))
+        return sorted(ids)
+
+    def _similar(self, id_column: str, key: str) -> Set[int]:
+        """IDs of the closest names sharing a trigram: Dice >= FUZZY_THRESHOLD or edit similarity >= EDIT_THRESHOLD."""
+        grams, shared = _trigrams(key), {}
+        for gram in grams:
+            for candidate in self._grams.get(id_column, {}).get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        best, ids = 0.0, set()
+        for candidate, count in shared.items():
+            dice = 2 * count / (len(grams) + len(_trigrams(candidate)))
+            similarity = 1 - _edit_distance(key, candidate) / max(len(key), len(candidate))
+            if dice < FUZZY_THRESHOLD and similarity < EDIT_THRESHOLD:
+                continue
+            score = max(dice, similarity)
+            if score > best + 1e-9:
+                best, ids = score, set(self._index[id_column][candidate])
+            elif abs(score - best) <= 1e-9:
+                ids |= self._index[id_column][candidate]
+        return ids
+
+    def ids(self, name_column: str, pattern: str, like: bool, fuzzy: bool = True) -> Optional[List[int]]:
+        """
+        IDs for a SQL filter on name_column: the LIKE pattern over the normalized
+        names (or the = value), falling back to resolve(). None if the names are not loaded.
+        """
+        self._ensure_loaded()
+        id_column = NAME_ID_COLUMNS[name_column]
+        by_key = self._index.get(id_column)
+        if not by_key:
+            return None
+        pieces = [normalize(piece) for piece in pattern.split("%")] if like else [normalize(pattern)]
+        if not any(pieces):
+            return None
+        if like and len(pieces) > 1:
+            regex = re.compile(("" if pieces[0] == "" else "^") + ".*".join(re.escape(p) for p in pieces if p)
+                               + ("" if pieces[-1] == "" else "$"))
+            ids = sorted({id_ for name, name_ids in by_key.items() if regex.search(name) for id_ in name_ids})
+            if ids:
+                return ids
+        return self.resolve(id_column, " ".join(p for p in pieces if p), fuzzy=fuzzy)
+
+
+def _default_resolver() -> NameResolver:
+    from config import settings
+    from services.database_service import db_service
+    return NameResolver(db_service, ttl=settings.sql_name_lookup_ttl)
+
+
+# Global resolver on the shared database service (loaded on first use)
+name_resolver = _default_resolver()
@@ -3,8 +3,11 @@ import os
 import re
 import sys
 import shutil
-from typing import List, Optional
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import threading
+import multiprocessing
+from typing import Iterable, List, Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from langchain_core.documents import Document
 # from langchain_text_splitters import RecursiveCharacterTextSplitter
 # from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -12,6 +15,7 @@ from langchain_core.documents import Document
 # from langchain_community.document_loaders import PyPDFLoader
 
 from config import settings
+from services.cache_service import EmbeddingCache
 
 def safe_print(message):
     """
@@ -30,6 +34,29 @@ def safe_print(message):
             print(message.encode('ascii', errors='replace').decode('ascii'))
 
 
+def _content_hash(text: str) -> str:
+    """Stable hash used as chunk ID and embedding-cache key."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_and_chunk_file(file_path: str) -> List[Document]:
+    """Parse and chunk one policy file. Module-level so it can run in a worker process."""
+    if file_path.lower().endswith(".pdf"):
+        from langchain_community.document_loaders import PyPDFLoader
+        docs = PyPDFLoader(file_path).load()
+        full_text = "\n".join([d.page_content for d in docs])
+    elif file_path.lower().endswith(".txt"):
+        full_text = RAGService.load_txt_file(file_path)
+    else:
+        print(f"WARNING: Unsupported file type: {file_path}")
+        return []
+    
+    chunks = RAGService().enhanced_chunk_policy_text(full_text)
+    for c in chunks:
+        c.metadata["source_file"] = os.path.basename(file_path)
+    return chunks
+
+
 class RAGService:
     """Service for RAG operations including document processing and search."""
     
@@ -38,21 +65,96 @@ class RAGService:
         self.vectordb = None
         self.translation_cache = {}  # Cache for translated queries
         self.preprocessing_cache = {}  # Cache for preprocessed queries
-        # Lazy initialization
-    
+        # LRU cache of query vectors so repeated questions skip the transformer forward pass
+        self.query_embedding_cache = EmbeddingCache(
+            max_bytes=settings.query_embedding_cache_mb * 1024 * 1024
+        )
+        # Lazy initialization (or eager warm-up via start_warmup)
+        # RLock because _initialize -> _rebuild_database -> prepare_rag_from_files re-enters it
+        self._init_lock = threading.RLock()
+        self._warmup_thread = None
+        self.warmup_error = None
+        # Exact in-memory retrieval engine (settings.rag_search_engine == "numpy")
+        self._numpy_index = None
+        self._numpy_index_error = None
+        self.last_pack_stats = None  # Token stats of the last packed context
+
+    def _load_embeddings(self):
+        """Load the embedding model if it is not loaded yet."""
+        if self.embeddings:
+            return
+        from services.embedding_service import create_embeddings
+        self.embeddings = create_embeddings()
+
     def _initialize(self):
         """Initialize embeddings and vector store if not already loaded."""
         if self.embeddings and self.vectordb:
             return
-            
-        print("Initializing RAG components...")
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-        # The Chroma import is moved to _load_vectordb where it's first used
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.embedding_model,
-            encode_kwargs={"normalize_embeddings": True}
-        )
-        self._load_vectordb()
+
+        # Single-flight: concurrent first requests wait for one load instead of each loading the model
+        with self._init_lock:
+            if self.embeddings and self.vectordb:
+                return
+
+            print("Initializing RAG components...")
+            # The Chroma import is moved to _load_vectordb where it's first used
+            self._load_embeddings()
+            self._load_vectordb()
+
+    def start_warmup(self):
+        """
+        Load the embedding model and vector store in a background thread.
+        Safe to call more than once; only one warm-up thread is ever started.
+        """
+        with self._init_lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(
+                    target=self._warmup,
+                    name="rag-warmup",
+                    daemon=True
+                )
+                self._warmup_thread.start()
+        return self._warmup_thread
+
+    def _warmup(self):
+        """Warm-up thread body: initialize and run one throwaway query embedding."""
+        try:
+            self._initialize()
+            if self.embeddings:
+                # The first forward pass is much slower than the rest; pay it here, not on a user request
+                self.embeddings.embed_query("warmup")
+            if settings.rag_search_engine == "numpy":
+                self._get_numpy_index()
+            print("SUCCESS: RAG warm-up complete")
+        except Exception as e:
+            self.warmup_error = str(e)
+            print(f"WARNING: RAG warm-up failed: {e}")
+
+    def readiness(self) -> dict:
+        """
+        Report whether the embedding model and the vector store are loaded.
+        status is "ready", "warming_up", or "degraded" when warm-up failed or is
+        disabled (RAG then retries loading on each policy question).
+        """
+        embedding_ready = self.embeddings is not None
+        vector_store_ready = self.vectordb is not None
+        warming_up = bool(self._warmup_thread and self._warmup_thread.is_alive())
+        ready = embedding_ready and vector_store_ready
+        return {
+            "ready": ready,
+            "status": "ready" if ready else "warming_up" if warming_up else "degraded",
+            "embedding_model": {
+                "name": settings.embedding_model,
+                "backend": type(self.embeddings).__name__ if embedding_ready else settings.embedding_backend,
+                "ready": embedding_ready
+            },
+            "vector_store": {
+                "path": settings.rag_db_path,
+                "ready": vector_store_ready
+            },
+            "warming_up": warming_up,
+            "error": self.warmup_error
+        }
 
     def _load_vectordb(self):
         """Load existing vector database or create a new one."""
@@ -144,8 +246,9 @@ class RAGService:
 
         
         from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from services.context_packer import CHUNK_SIZE_CHARS
         splitter = RecursiveCharacterTextSplitter(
-            chunk_size=900,
+            chunk_size=CHUNK_SIZE_CHARS,
             chunk_overlap=200,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
@@ -165,60 +268,143 @@ class RAGService:
         print(f"SUCCESS: Created {len(chunks)} chunks from {len(section_docs)} sections")
         return chunks
     
-    def embed_and_store(self, chunks: List[Document]):
-        """Create and persist vector store from chunks."""
-        if os.path.exists(settings.rag_db_path):
-            shutil.rmtree(settings.rag_db_path)
-        
+    def _open_collection(self):
+        """Open (or create) the persisted Chroma collection for the current embedding model."""
         from langchain_community.vectorstores import Chroma
-        self.vectordb = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=settings.rag_db_path,
-            collection_metadata={"hnsw:space": "cosine"}
-        )
         
-        self.vectordb.persist()
-        print(f"SUCCESS: RAG database created at {settings.rag_db_path}")
+        def open_store():
+            return Chroma(
+                persist_directory=settings.rag_db_path,
+                embedding_function=self.embeddings,
+                collection_metadata={"hnsw:space": "cosine", "embedding_model": settings.embedding_model}
+            )
+        
+        try:
+            vectordb = open_store()
+        except Exception as e:
+            print(f"WARNING: Could not open RAG database ({e}), recreating it")
+            shutil.rmtree(settings.rag_db_path, ignore_errors=True)
+            vectordb = open_store()
+        
+        # Stored vectors from a different model cannot be reused
+        stored_model = (vectordb._collection.metadata or {}).get("embedding_model")
+        if stored_model != settings.embedding_model:
+            print(f"Embedding model changed ({stored_model} -> {settings.embedding_model}), re-embedding everything")
+            vectordb.delete_collection()
+            vectordb = open_store()
+        return vectordb
     
-    def prepare_rag_from_files(self, file_paths: List[str]):
-        """Prepare RAG database from multiple files."""
+    def embed_and_store(self, chunks: List[Document], sources: Optional[Iterable[str]] = None):
+        """
+        Incrementally sync the persisted vector store with chunks.
+        
+        Chunk IDs hash the source file + text, so unchanged chunks are left alone.
+        Vectors already stored for identical text are reused (content-hash cache) and
+        only new text goes through the embedding model. Chunks that disappeared are deleted:
+        from the whole store by default, or only from these source files when sources is given.
+        """
+        if self.vectordb is None:
+            self.vectordb = self._open_collection()
+        collection = self.vectordb._collection
+        
+        desired = {}
+        for chunk in chunks:
+            chunk.metadata["content_hash"] = _content_hash(chunk.page_content)
+            chunk_id = _content_hash(f"{chunk.metadata.get('source_file', '')}\n{chunk.page_content}")
+            desired.setdefault(chunk_id, chunk)
+        
+        existing = collection.get(include=["embeddings", "metadatas"])
+        existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
+        cached_vectors = {
+            metadata["content_hash"]: vector
+            for metadata, vector in zip(existing["metadatas"], existing["embeddings"])
+            if metadata and metadata.get("content_hash")
+        }
+        
+        sources = set(sources) if sources is not None else None
+        stale_ids = [
+            chunk_id for chunk_id, metadata in existing_metadata.items()
+            if chunk_id not in desired and (sources is None or (metadata or {}).get("source_file") in sources)
+        ]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+        
+        # New chunk or changed metadata (e.g. its position in the section moved)
+        changed = {
+            chunk_id: chunk for chunk_id, chunk in desired.items()
+            if existing_metadata.get(chunk_id) != chunk.metadata
+        }
+        
+        texts_to_embed = list(dict.fromkeys(
+            chunk.page_content for chunk in changed.values()
+            if chunk.metadata["content_hash"] not in cached_vectors
+        ))
+        if texts_to_embed:
+            vectors = self.embeddings.embed_documents(texts_to_embed)
+            for text, vector in zip(texts_to_embed, vectors):
+                cached_vectors[_content_hash(text)] = vector
+        
+        ids = list(changed)
+        batch_size = 500
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            collection.upsert(
+                ids=batch,
+                embeddings=[[float(x) for x in cached_vectors[changed[i].metadata["content_hash"]]] for i in batch],
+                metadatas=[changed[i].metadata for i in batch],
+                documents=[changed[i].page_content for i in batch]
+            )
+        
+        # Stored chunks changed: the in-memory index must be reloaded from them
+        if stale_ids or changed:
+            self._numpy_index = None
+            self._numpy_index_error = None
+        print(f"SUCCESS: RAG database synced at {settings.rag_db_path} "
+              f"({len(desired)} chunks: {len(changed)} upserted, {len(texts_to_embed)} embedded, "
+              f"{len(stale_ids)} deleted)")
+    
+    def prepare_rag_from_files(self, file_paths: List[str], only_these: bool = False):
+        """
+        Sync the RAG database with these files (incremental). By default they are the
+        whole corpus and chunks of any other file are removed; with only_these, the
+        chunks of other files are kept and only these files are added or updated.
+        """
+        with self._init_lock:
+            self._prepare_rag_from_files(file_paths, only_these)
+
+    @staticmethod
+    def _load_and_chunk_files(file_paths: List[str]) -> List[List[Document]]:
+        """Parse + chunk files in a process pool (PDF parsing is CPU bound)."""
+        if len(file_paths) > 1:
+            try:
+                # spawn: forking a process that runs warm-up/server threads is unsafe
+                with ProcessPoolExecutor(
+                    max_workers=min(len(file_paths), os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context("spawn")
+                ) as pool:
+                    return list(pool.map(_load_and_chunk_file, file_paths))
+            except Exception as e:
+                print(f"WARNING: Parallel parsing failed ({e}), parsing serially")
+        return [_load_and_chunk_file(file_path) for file_path in file_paths]
+
+    def _prepare_rag_from_files(self, file_paths: List[str], only_these: bool = False):
+        """Sync the vector store with files. Caller must hold the init lock."""
         # Ensure initialized before rebuilding
         if not self.embeddings:
              print("Initializing embeddings for rebuild...")
-             from langchain_community.embeddings import HuggingFaceEmbeddings
-             self.embeddings = HuggingFaceEmbeddings(
-                model_name=settings.embedding_model,
-                encode_kwargs={"normalize_embeddings": True}
-            )
+             self._load_embeddings()
 
+        print(f"Loading + chunking {len(file_paths)} files...")
         all_chunks = []
-        
-        for file_path in file_paths:
-            print(f"Loading file: {file_path}")
-            
-            if file_path.lower().endswith(".pdf"):
-                from langchain_community.document_loaders import PyPDFLoader
-                docs = PyPDFLoader(file_path).load()
-                full_text = "\n".join([d.page_content for d in docs])
-            elif file_path.lower().endswith(".txt"):
-                full_text = self.load_txt_file(file_path)
-            else:
-                print(f"WARNING: Unsupported file type: {file_path}")
-                continue
-            
-            print("Cleaning + Chunking...")
-            chunks = self.enhanced_chunk_policy_text(full_text)
-            
-            for c in chunks:
-                c.metadata["source_file"] = os.path.basename(file_path)
-            
+        for file_path, chunks in zip(file_paths, self._load_and_chunk_files(file_paths)):
+            print(f"Loaded file: {file_path} ({len(chunks)} chunks)")
             all_chunks.extend(chunks)
         
         print(f"Total chunks from all files: {len(all_chunks)}")
         
         print("Embedding & storing in Chroma DB...")
-        self.embed_and_store(all_chunks)
+        sources = {os.path.basename(file_path) for file_path in file_paths} if only_these else None
+        self.embed_and_store(all_chunks, sources=sources)
         
         print("RAG database ready!")
     
@@ -244,6 +430,20 @@ class RAGService:
         
         return translated
     
+    def known_preprocessing(self, query: str, language: Optional[str] = None) -> Optional[dict]:
+        """_preprocess_query's result if it needs no LLM call (cached or a short query), else None."""
+        cached = self.preprocessing_cache.get(f"{language}:{query}")
+        if cached is not None:
+            return cached
+        if len(query.strip().split()) < settings.preprocessing_min_words:
+            return {
+                'preprocessed': query,
+                'original': query,
+                'changes_made': [],
+                'skipped': True
+            }
+        return None
+    
     def _preprocess_query(self, query: str, language: Optional[str] = None) -> dict:
         """
         Preprocess and normalize query to improve RAG matching.
@@ -256,22 +456,11 @@ class RAGService:
         Returns:
             dict with 'preprocessed', 'original', 'changes_made'
         """
-        # Check cache first
+        # Cached, or too short to preprocess
+        known = self.known_preprocessing(query, language)
+        if known is not None:
+            return known
         cache_key = f"{language}:{query}"
-        if cache_key in self.preprocessing_cache:
-            return self.preprocessing_cache[cache_key]
-        
-        # If query is very short or simple, skip preprocessing
-        from config import settings
-        min_words = settings.preprocessing_min_words
-        if len(query.strip().split()) < min_words:
-            result = {
-                'preprocessed': query,
-                'original': query,
-                'changes_made': [],
-                'skipped': True
-            }
-            return result
         
         try:
             # Import LLM
@@ -386,7 +575,29 @@ Your goal is to ensure consistency by fixing ALL spelling and grammar mistakes.
         
         return unique_docs
     
-    def search(self, query: str, k: int = 10, language: Optional[str] = None) -> str:
+    def _get_numpy_index(self):
+        """Build (once) the exact in-memory index from the vectors stored in Chroma."""
+        if self._numpy_index is not None or self._numpy_index_error:
+            return self._numpy_index
+        
+        with self._init_lock:
+            if self._numpy_index is None and not self._numpy_index_error and self.vectordb:
+                try:
+                    from services.vector_index import NumpyVectorIndex
+                    self._numpy_index = NumpyVectorIndex.from_chroma(self.vectordb)
+                    print(f"SUCCESS: Loaded {len(self._numpy_index)} chunk vectors into the in-memory index")
+                except Exception as e:
+                    # Remember the failure so every query doesn't retry; search falls back to Chroma
+                    self._numpy_index_error = str(e)
+                    print(f"WARNING: In-memory index unavailable, using Chroma: {e}")
+        return self._numpy_index
+    
+    def _embed_query(self, query: str):
+        """Embed a search query, served from the LRU cache when the same query was seen before."""
+        return self.query_embedding_cache.get_or_compute(query, self.embeddings.embed_query)
+    
+    def search(self, query: str, k: int = 10, language: Optional[str] = None,
+               token_budget: Optional[int] = None, preprocess: bool = True) -> Optional[str]:
         """
         Perform similarity search on vector database with cross-lingual support.
         
@@ -394,10 +605,18 @@ Your goal is to ensure consistency by fixing ALL spelling and grammar mistakes.
             query: The search query
             k: Number of results to return
             language: Detected language ('ar', 'en', 'franco', or None)
+            preprocess: Normalize the query with the LLM first. When False (speculative
+                prefetch) the search only runs if that normalization is already known
+                (known_preprocessing), so it returns exactly what preprocess=True would;
+                otherwise it returns None without searching
         
         Returns:
             Formatted search results
         """
+        known = None if preprocess else self.known_preprocessing(query, language)
+        if not preprocess and known is None:
+            return None
+        
         self._initialize()
         
         if not self.vectordb:
@@ -406,7 +625,7 @@ Your goal is to ensure consistency by fixing ALL spelling and grammar mistakes.
         try:
             debug_enabled = settings.enable_rag_debug
             # PREPROCESSING LAYER - Automatically clean and improve query
-            preprocessing_result = self._preprocess_query(query, language)
+            preprocessing_result = known or self._preprocess_query(query, language)
             preprocessed_query = preprocessing_result['preprocessed']
             
             # Debug logging (Windows console safe for Arabic/Unicode)
@@ -434,25 +653,50 @@ Your goal is to ensure consistency by fixing ALL spelling and grammar mistakes.
                 print(f"[RAG DEBUG] Query length: {len(preprocessed_query)} chars")
                 print(f"[RAG DEBUG] Language: {language}")
                 print(f"[RAG DEBUG] Embedding model: {settings.embedding_model}")
+                print(f"[RAG DEBUG] Query embedding cache: {self.query_embedding_cache.stats()}")
             
             # Use MMR (Maximal Marginal Relevance) for diversified retrieval
             # This helps ensure we get chunks from different sections, not just most similar
             # Fetch=2*k candidates, return k diverse ones
-            try:
-                docs = self.vectordb.max_marginal_relevance_search(
-                    preprocessed_query, 
-                    k=k,
-                    fetch_k=min(k * 2, 50),  # Fetch more candidates for diversity
-                    lambda_mult=0.3  # Favor diversity (0.3) over pure relevance to reduce language bias
-                )
-                # Convert to (doc, score) tuples for consistency with existing code
-                # MMR doesn't return scores, so we'll use placeholder scores
-                docs = [(doc, 0.0) for doc in docs]
-            except Exception as mmr_error:
-                if debug_enabled:
-                    print(f"[RAG DEBUG] MMR failed ({mmr_error}), falling back to similarity search")
-                # Fallback to regular similarity search if MMR not supported
-                docs = self.vectordb.similarity_search_with_score(preprocessed_query, k=k)
+            query_embedding = self._embed_query(preprocessed_query)
+            fetch_k = min(k * 2, 50)  # Fetch more candidates for diversity
+            lambda_mult = 0.3  # Favor diversity (0.3) over pure relevance to reduce language bias
+            docs = None
+            
+            # 🚀 PERFORMANCE: Exact in-memory engine (sub-millisecond on a few hundred chunks, real scores)
+            if settings.rag_search_engine == "numpy":
+                index = self._get_numpy_index()
+                if index is not None:
+                    docs = index.max_marginal_relevance_search_by_vector(
+                        query_embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+                    )
+                    # Scores are real cosine similarities here, so a relevance floor is meaningful
+                    if settings.rag_min_relevance_score > 0:
+                        docs = [(doc, score) for doc, score in docs if score >= settings.rag_min_relevance_score]
+            
+            if docs is None:
+                query_embedding = query_embedding.tolist()
+                try:
+                    # Chroma's own MMR returns no scores; run the same MMR over its top
+                    # fetch_k candidates so the packer can rank by real cosine similarity
+                    from services.vector_index import NumpyVectorIndex
+                    collection = self.vectordb._collection
+                    candidates = collection.query(
+                        query_embeddings=[query_embedding], n_results=max(1, min(fetch_k, collection.count())),
+                        include=["embeddings", "documents", "metadatas"]
+                    )
+                    documents = [
+                        Document(page_content=text, metadata=metadata or {})
+                        for text, metadata in zip(candidates["documents"][0], candidates["metadatas"][0])
+                    ]
+                    docs = NumpyVectorIndex(documents, candidates["embeddings"][0]).max_marginal_relevance_search_by_vector(
+                        query_embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult
+                    ) if documents else []
+                except Exception as mmr_error:
+                    if debug_enabled:
+                        print(f"[RAG DEBUG] MMR failed ({mmr_error}), falling back to similarity search")
+                    # Fallback to regular similarity search if MMR not supported
+                    docs = self.vectordb.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
             
             if debug_enabled:
                 print(f"[RAG DEBUG] Retrieved {len(docs)} documents")
@@ -466,8 +710,17 @@ Your goal is to ensure consistency by fixing ALL spelling and grammar mistakes.
                     print(f"[RAG DEBUG]   Preview length: {len(doc.page_content)} chars")
             
             # Format results
-            final_docs = [doc for doc, score in docs]
-            final_text = "\n\n".join([f"Chunk {i+1}:\n{d.page_content}" for i, d in enumerate(final_docs)])
+            if token_budget:
+                # 🚀 PERFORMANCE: Dedupe overlapping chunks, best first, capped at the token budget
+                from services.context_packer import pack_context
+                final_text, self.last_pack_stats = pack_context(docs, token_budget)
+                stats = self.last_pack_stats
+                print(f"[RAG] Context packed: {stats['chunks_packed']}/{stats['chunks_retrieved']} chunks, "
+                      f"{stats['tokens_packed']} tokens (saved {stats['tokens_saved']}, "
+                      f"{stats['duplicates_removed']} duplicates removed)")
+            else:
+                final_docs = [doc for doc, score in docs]
+                final_text = "\n\n".join([f"Chunk {i+1}:\n{d.page_content}" for i, d in enumerate(final_docs)])
             
             if debug_enabled:
                 print(f"[RAG DEBUG] Total text returned: {len(final_text)} chars")
@@ -0,0 +1,126 @@
+"""
+Typed, parameterized queries for the price, discount and payment-plan code paths.
+
+Every query borrows a connection from DatabaseService (the shared MySQL pool,
+or the local SQLite stand-in) for the duration of one call, so no request path
+opens its own connection.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from config import PROJECTIONS
+from services.database_service import db_service, DatabaseService
+from services.result_types import Promo, UnitPrice
+
+# Tables that carry a unit's price and payment terms, in order of preference
+PRICE_TABLES = ("unit_search_engine", "unit_search_engine2", "bi_unit")
+
+_PRICE_COLUMNS = PROJECTIONS["payment"]
+
+
+class UnitRepository:
+    """Unit rows by unit_id across the unit tables."""
+
+    def __init__(self, db: DatabaseService):
+        self.db = db
+        self._schema_lock = threading.Lock()
+        self._tables: Optional[List[str]] = None
+        self._columns: Dict[str, List[str]] = {}
+
+    def price(self, unit_id: int) -> Optional[UnitPrice]:
+        """Price and payment terms from the first of PRICE_TABLES with a priced row."""
+        with self.db.connect() as connection:
+            cursor = connection.cursor(dictionary=True)
+            for table in PRICE_TABLES:
+                try:
+                    cursor.execute(f"SELECT {', '.join(_PRICE_COLUMNS)} FROM `{table}` WHERE unit_id = %s LIMIT 1",
+                                   (unit_id,))
+                    row = cursor.fetchone()
+                except Exception:
+                    continue  # Table missing or without these columns in this database
+                if row and row.get("price"):
+                    fields = {column: row.get(column) for column in _PRICE_COLUMNS}
+                    fields["price"] = float(row["price"])
+                    fields["unit_id"] = unit_id
+                    return UnitPrice(source_table=table, **fields)
+        return None
+
+    def rows_by_table(self, unit_id: int, tables: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """
+        {table: row} for every table (default: all tables) with a unit_id or unt_id
+        column that has a row for the unit. The schema is read once per process.
+        """
+        found = {}
+        with self.db.connect() as connection:
+            cursor = connection.cursor(dictionary=True)
+            for table in (list(tables) if tables is not None else self._all_tables(cursor)):
+                columns = self._table_columns(cursor, table)
+                key = "unit_id" if "unit_id" in columns else "unt_id" if "unt_id" in columns else None
+                if key is None:
+                    continue
+                try:
+                    cursor.execute(f"SELECT * FROM `{table}` WHERE {key} = %s LIMIT 1", (unit_id,))
+                    row = cursor.fetchone()
+                except Exception:
+                    continue
+                if row:
+                    found[table] = row
+        return found
+
+    def columns(self, table: str) -> List[str]:
+        """Column names of table ([] if it does not exist); cached like rows_by_table's schema reads."""
+        with self._schema_lock:
+            if table in self._columns:
+                return self._columns[table]
+        with self.db.connect() as connection:
+            return self._table_columns(connection.cursor(dictionary=True), table)
+
+    def _all_tables(self, cursor) -> List[str]:
+        with self._schema_lock:
+            if self._tables is None:
+                cursor.execute("SHOW TABLES")
+                self._tables = [next(iter(row.values())) for row in cursor.fetchall()]
+            return self._tables
+
+    def _table_columns(self, cursor, table: str) -> List[str]:
+        with self._schema_lock:
+            if table not in self._columns:
+                try:
+                    cursor.execute(f"SHOW COLUMNS FROM `{table}`")
+                    self._columns[table] = [column["Field"] for column in cursor.fetchall()]
+                except Exception:
+                    self._columns[table] = []
+            return self._columns[table]
+
+    def refresh_schema(self):
+        """Forget the cached table list and columns (after a migration)."""
+        with self._schema_lock:
+            self._tables = None
+            self._columns.clear()
+
+
+class PromoRepository:
+    """Promotions (promo / promo_text tables)."""
+
+    def __init__(self, db: DatabaseService):
+        self.db = db
+
+    def for_unit(self, unit_id: int, lang_id: int = 1) -> Optional[Promo]:
+        """The unit's promotion with its text in lang_id, or None if it has none with text."""
+        with self.db.connect() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT p.prom_id, t.title, t.text FROM promo p "
+                "JOIN promo_text t ON t.prom_id = p.prom_id AND t.lang_id = %s "
+                "WHERE p.unt_id = %s LIMIT 1",
+                (lang_id, unit_id),
+            )
+            row = cursor.fetchone()
+        if not row or not row.get("prom_id"):
+            return None
+        return Promo(prom_id=row["prom_id"], title=row.get("title"), text=row.get("text"))
+
+
+# Global repositories on the shared connection pool
+unit_repository = UnitRepository(db_service)
+promo_repository = PromoRepository(db_service)
@@ -0,0 +1,131 @@
+"""Removal of image/video mentions and structured markers from agent responses."""
+import re
+
+# Structured marker regions. Their content is dropped, so it is never scanned by the cleanup patterns.
+UNIT_DETAIL_PATTERN = re.compile(r'###UNIT_DETAIL###.*?###END_DETAIL###', re.DOTALL)
+TRAILING_MARKERS = ("<<PROPERTY_CAROUSEL_DATA>>", "<<PAYMENT_PLAN_DATA>>")
+
+# Stands in for a removed ###UNIT_DETAIL### block until newlines are collapsed, so the
+# surrounding text is cleaned exactly as if the block were still there (private-use char).
+_DETAIL_PLACEHOLDER = "\ue000"
+
+# Cleanup passes, in order, each with the words it needs (checked on the lowered text).
+# They stay separate passes: each one runs on the previous one's output (a removed line
+# can join two others), so one combined alternation changes the result on ~7% of
+# fuzzed responses. A pass whose words are absent cannot match and is skipped.
+_IMAGE = ("image",)
+_IMAGE_LOGO = ("image", "logo")
+_VIDEO = ("video",)
+_CLEANUP_PASSES = [
+    # "#### Images:" or "## Images:" headers
+    (re.compile(r'(?:^|\n)\s*#{1,4}\s*Images?:\s*(?:\n|$)', re.IGNORECASE | re.MULTILINE), '\n', _IMAGE),
+    # "Images:" section followed by image markdown lines
+    (re.compile(r'(?:^|\n)\s*Images?:\s*\n(?:\s*!\[.*?\]\(.*?\)\s*\n?)*', re.IGNORECASE | re.MULTILINE), '', _IMAGE),
+    # "Unit Image: !View Unit Image" / "Compound Image: !View Compound Image"
+    (re.compile(r'(?:^|\n)\s*(?:Unit|Compound|Developer|Property)\s*(?:Image|Logo):\s*!\[?(?:View\s*)?.*?(?:Image|Logo)\]?.*?(?:\n|$)',
+                re.IGNORECASE | re.MULTILINE), '\n', _IMAGE_LOGO),
+    # Standalone image markdown: ![Unit Image](url)
+    (re.compile(r'!\[(?:Unit|Compound|Developer|Property)?\s*(?:Image|Logo|Photo).*?\]\(.*?\)', re.IGNORECASE), '',
+     ("image", "logo", "photo")),
+    # "Unit Image:" / "Compound Image:" labels, with or without URLs
+    (re.compile(r'(?:^|\n)\s*(?:Unit|Compound|Developer)\s*(?:Image|Logo):\s*(?:https?://\S+)?\s*', re.IGNORECASE | re.MULTILINE), '',
+     _IMAGE_LOGO),
+    # Orphaned "Images:" headers
+    (re.compile(r'(?:^|\n)\s*Images?:\s*(?:\n|$)', re.IGNORECASE | re.MULTILINE), '\n', _IMAGE),
+    # "Video Tour:" / "Watch Video:" with a link or URL
+    (re.compile(r'(?:^|\n)\s*(?:Video\s*Tour|Watch\s*Video):\s*(?:\[.*?\]\(.*?\)|https?://\S+)?\s*', re.IGNORECASE | re.MULTILINE), '',
+     _VIDEO),
+    # [Watch Video](url) / [Video Tour](url)
+    (re.compile(r'\[(?:Watch\s*Video|Video\s*Tour|View\s*Video).*?\]\(.*?\)', re.IGNORECASE), '', _VIDEO),
+    # Plain video URLs (youtube, vimeo, ...)
+    (re.compile(r'(?:^|\n|\s)(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be|vimeo\.com|dailymotion\.com)/\S+',
+                re.IGNORECASE | re.MULTILINE), '', ("youtu", "vimeo", "dailymotion")),
+    # Any remaining line mentioning "video tour" / "watch video"
+    (re.compile(r'(?:^|\n)\s*(?:video\s*tour|watch\s*video).*?(?:\n|$)', re.IGNORECASE | re.MULTILINE), '\n', _VIDEO),
+]
+# Union of the words above: most responses contain none and skip the passes outright
+_CLEANUP_TRIGGER_WORDS = tuple(dict.fromkeys(word for _, _, words in _CLEANUP_PASSES for word in words))
+
+_EXCESS_NEWLINES = re.compile(r'\n{3,}')
+
+# Leftover JSON arrays of rows
+_JSON_ARRAY_PATTERNS = [
+    re.compile(r'\[\s*{\s*"unit_id".*?\}\s*\]', re.DOTALL),
+    re.compile(r'\[\s*\{\s*".*?".*?\}\s*\]', re.DOTALL),
+]
+
+
+def _markers_start_lines(text: str) -> bool:
+    """True if every structured marker starts a line (the layout the chat service produces)."""
+    for marker in ("###UNIT_DETAIL###",) + TRAILING_MARKERS:
+        i = text.find(marker)
+        while i > 0:
+            if text[i - 1] != "\n":
+                return False
+            i = text.find(marker, i + 1)
+    return True
+
+
+def _run_cleanup_passes(text: str) -> str:
+    """Apply the cleanup passes in order, skipping those whose words the current text lacks."""
+    lowered = text.lower()
+    if not any(word in lowered for word in _CLEANUP_TRIGGER_WORDS):
+        return text
+    for pattern, replacement, words in _CLEANUP_PASSES:
+        if any(word in lowered for word in words):
+            text, count = pattern.subn(replacement, text)
+            if count:
+                lowered = text.lower()
+    return text
+
+
+def _sanitize_sequential(text: str) -> str:
+    """The former pass-by-pass order, for responses with markers in the middle of a line."""
+    text = _run_cleanup_passes(text)
+    text = _EXCESS_NEWLINES.sub('\n\n', text)
+    text = UNIT_DETAIL_PATTERN.sub('', text)
+    cut = min((i for i in (text.find(marker) for marker in TRAILING_MARKERS) if i >= 0), default=-1)
+    if cut >= 0:
+        text = text[:cut]
+    for pattern in _JSON_ARRAY_PATTERNS:
+        text = pattern.sub('', text)
+    return text.strip()
+
+
+def sanitize_response(text: str) -> str:
+    """
+    Remove image/video sections, structured markers and leftover JSON from a response.
+
+    Output matches the former sequence of regex passes: marker regions are cut out
+    first (everything after a carousel/payment marker is dropped anyway), then the
+    precompiled image/video passes run in their original order over the remaining
+    prose, each only when the text contains its trigger words. A marker in the
+    middle of a line can interact with the line patterns, so such (rare) responses
+    take the sequential path.
+
+    One deliberate difference: the old passes could glue a video URL onto a marker
+    (after removing the lines between them) and leave part of its JSON payload in
+    the reply. Marker regions are removed before the passes now, so nothing leaks.
+    """
+    if not _markers_start_lines(text):
+        return _sanitize_sequential(text)
+
+    # 1. Marker regions
+    if "###UNIT_DETAIL###" in text:
+        text = UNIT_DETAIL_PATTERN.sub(_DETAIL_PLACEHOLDER, text)
+    cut = min((i for i in (text.find(marker) for marker in TRAILING_MARKERS) if i >= 0), default=-1)
+    if cut >= 0:
+        text = text[:cut]
+
+    # 2. Image/video mentions in the prose
+    text = _run_cleanup_passes(text)
+
+    if "\n\n\n" in text:
+        text = _EXCESS_NEWLINES.sub('\n\n', text)
+    text = text.replace(_DETAIL_PLACEHOLDER, '')
+
+    if "[" in text:
+        for pattern in _JSON_ARRAY_PATTERNS:
+            text = pattern.sub('', text)
+
+    return text.strip()
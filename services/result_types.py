@@ -0,0 +1,106 @@
+"""Typed results passed between internal functions.
+
+These replace JSON strings that were dumped by one function and parsed back
+by its caller. Serialize only at the LLM-tool or HTTP boundary (to_json/to_dict).
+"""
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+
+@dataclass(slots=True)
+class LanguageDetection:
+    """Result of language detection ("en", "ar" or "franco")."""
+    language: str = "en"
+    confidence: float = 0.0
+    reasoning: str = ""
+    detected_patterns: List[str] = field(default_factory=list)
+    arabic_ratio: float = 0.0
+    hint_provided: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+@dataclass(slots=True)
+class PaymentPlanDetection:
+    """Whether a query asks for a unit's payment plan, and which unit."""
+    is_payment_query: bool
+    unit_id: Optional[int] = None
+    confidence: float = 0.0
+    reason: str = ""
+    extraction_method: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+@dataclass(slots=True)
+class SqlResult:
+    """Rows returned by a unit search query (raw DB values: Decimal, datetime, ...)."""
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+    # Rows as the database returned them, before run_sql's availability filter (keyset paging)
+    fetched_rows: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_records(self, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Rows (only the given columns, e.g. a config.PROJECTIONS entry), or the single
+        {"error": ...} record callers have always received on failure.
+        """
+        if self.error:
+            return [{"error": self.error}]
+        if columns is not None:
+            return [{column: row[column] for column in columns if column in row} for row in self.rows]
+        return self.rows
+
+    def to_json(self, columns: Optional[List[str]] = None) -> str:
+        from services.database_service import safe_serialize
+        return json.dumps(self.to_records(columns), default=safe_serialize)
+
+
+@dataclass(slots=True)
+class UnitPrice:
+    """Price and payment terms of a unit, from the first unit table that lists it."""
+    unit_id: int
+    price: float
+    source_table: str
+    compound_name: Optional[str] = None
+    has_promo: Optional[int] = None
+    promo_text: Optional[str] = None
+    down_payment: Any = None
+    payment_plan: Optional[str] = None
+    deposit: Any = None
+    monthly_installment: Any = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class Promo:
+    """A promotion attached to a unit (promo + promo_text rows)."""
+    prom_id: int
+    title: Optional[str] = None
+    text: Optional[str] = None
+
+    @property
+    def description(self) -> str:
+        """"title - text", or whichever of the two exists."""
+        if self.title and self.text:
+            return f"{self.title} - {self.text}"
+        return self.title or self.text or ""
+
+
+@dataclass(slots=True)
+class SqlCheck:
+    """Generated search SQL after validation: the statement to run, or why it was rejected."""
+    sql: str
+    rewrites: List[str] = field(default_factory=list)
+    error: Optional[str] = None
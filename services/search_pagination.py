@@ -0,0 +1,152 @@
+"""
+Keyset pagination for "show me more" follow-ups to a unit search.
+
+A search's SQL is split into its filter (the WHERE clause) and an order that
+ends in a unique key, (sorting_id, unit_id) unless the search sorted by a
+column of its own. The session keeps that filter plus the key of the last unit
+shown (SearchCursor), so the next page is one index range scan:
+
+    WHERE (<filter>) AND (sorting_id > 17 OR (sorting_id = 17 AND unit_id > 1042))
+    ORDER BY sorting_id, unit_id LIMIT 5
+
+No LLM call, and no OFFSET that re-reads every earlier page.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+PAGE_SIZE = 5  # run_sql shows at most 5 units per turn
+DEFAULT_ORDER = ("sorting_id", "unit_id")
+
+_SEARCH_SQL = re.compile(
+    r"^\s*SELECT\s+(?P<columns>\*|\w+(?:\s*,\s*\w+)*)\s+FROM\s+`?(?P<table>\w+)`?"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ORDER_COLUMN = re.compile(r"^`?(?P<column>\w+)`?(?:\s+(?P<direction>ASC|DESC))?$", re.IGNORECASE)
+# Filters we cannot safely wrap in parentheses and extend
+_UNSUPPORTED = re.compile(r"\b(?:select|union|group\s+by|having|join|offset)\b", re.IGNORECASE)
+
+# Whole messages that only ask for the next page; anything longer (a location, unit
+# type or "more details") is a new question and goes through the normal path
+SHOW_MORE_PHRASES = [
+    'more', 'show more', 'show me more', 'more results', 'more units', 'more options', 'more properties',
+    'next', 'next page', 'next results', 'load more', 'see more', 'any more', 'other options', # EN
+    'المزيد', 'مزيد', 'كمان', 'في كمان', 'فيه كمان', 'غيرهم', 'وريني كمان', 'وريني تاني', 'وريني غيرهم',
+    'التالي', 'اعرض اكتر', 'اعرض اكثر', # AR
+    'kaman', 'fi kaman', 'fe kaman', 'feh kaman', 'wareny kaman', 'wareny tany', 'wareny gherhom',
+    'ghairhom', 'gherhom', '8erhom', 'aktar', 'aktr', 'el ba2y', # Franco
+]
+# Politeness around a phrase ("more please", "لو سمحت المزيد") does not change it
+_SHOW_MORE_FILLER = {'please', 'pls', 'plz', 'ok', 'okay', 'من', 'فضلك', 'لو', 'سمحت', 'law', 'sama7t', 'samaht'}
+
+
+@dataclass(slots=True)
+class SearchCursor:
+    """Filter and keyset position of the last unit search in a session."""
+    table: str
+    where: str
+    order: Tuple[Tuple[str, bool], ...]  # (column, descending) pairs ending in a unique key
+    page_size: int = PAGE_SIZE
+    after: Optional[Tuple[Any, ...]] = None  # Key of the last unit shown
+    page: int = 1
+    exhausted: bool = False
+    columns: str = "*"  # Projection of the original search
+
+    def order_sql(self) -> str:
+        return ", ".join(f"{column} {'DESC' if descending else 'ASC'}" for column, descending in self.order)
+
+    def next_page_sql(self) -> str:
+        conditions = [f"({self.where})"] if self.where else []
+        if self.after is not None:
+            conditions.append(_keyset_condition(self.order, self.after))
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return f"SELECT {self.columns} FROM {self.table}{where} ORDER BY {self.order_sql()} LIMIT {self.page_size}"
+
+    def advance(self, rows: List[Dict[str, Any]]):
+        """Move past the rows the database just returned; a short page means there is nothing after it."""
+        if rows:
+            key = tuple(rows[-1].get(column) for column, _ in self.order)
+            if any(value is None for value in key):
+                self.exhausted = True  # NULL keys cannot be compared; stop here rather than repeat units
+            else:
+                self.after = key
+        if len(rows) < self.page_size:
+            self.exhausted = True
+
+
+def _literal(value) -> str:
+    """Key values come from our own rows; numbers are inlined, anything else is quoted."""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    try:
+        return repr(float(value)) if '.' in str(value) else str(int(value))
+    except (TypeError, ValueError):
+        return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _keyset_condition(order, after) -> str:
+    """(a > x) OR (a = x AND b > y) ... — expanded so MySQL uses a range scan on the index."""
+    branches = []
+    for i, (column, descending) in enumerate(order):
+        equal = [f"{prev} = {_literal(after[j])}" for j, (prev, _) in enumerate(order[:i])]
+        branches.append(" AND ".join(equal + [f"{column} {'<' if descending else '>'} {_literal(after[i])}"]))
+    return "(" + " OR ".join(f"({branch})" for branch in branches) + ")"
+
+
+def paginated_search(sql: str) -> Tuple[str, Optional[SearchCursor]]:
+    """
+    Give a generated search SQL a deterministic keyset order and return it with
+    a cursor for the following pages. SQL we cannot page safely (joins,
+    grouping, multi-column or expression ORDER BY) is returned unchanged with
+    no cursor.
+    """
+    match = _SEARCH_SQL.match(sql)
+    if not match:
+        return sql, None
+    where = (match.group("where") or "").strip()
+    if _UNSUPPORTED.search(where):
+        return sql, None
+
+    order = tuple((column, False) for column in DEFAULT_ORDER)
+    if match.group("order"):
+        column_match = _ORDER_COLUMN.match(match.group("order").strip())
+        if not column_match:
+            return sql, None
+        column = column_match.group("column").lower()
+        descending = (column_match.group("direction") or "").upper() == "DESC"
+        order = ((column, descending),) if column == "unit_id" else ((column, descending), ("unit_id", descending))
+
+    # Rows beyond PAGE_SIZE would be cut from the reply but still move the cursor past them
+    page_size = min(int(match.group("limit") or PAGE_SIZE), PAGE_SIZE)
+    columns = match.group("columns")
+    if columns != "*":  # The keyset columns must come back with every row
+        selected = [column.strip().lower() for column in columns.split(",")]
+        columns = ", ".join(selected + [column for column, _ in order if column not in selected])
+    cursor = SearchCursor(table=match.group("table"), where=where, order=order, page_size=page_size, columns=columns)
+    where_sql = f" WHERE {where}" if where else ""
+    return f"SELECT {columns} FROM {cursor.table}{where_sql} ORDER BY {cursor.order_sql()} LIMIT {page_size}", cursor
+
+
+def _normalize_phrase(message: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", message.lower())
+    for variants, plain in (("أإآ", "ا"), ("ى", "ي"), ("ة", "ه")):
+        text = re.sub(f"[{variants}]", plain, text)
+    return " ".join(text.split())
+
+
+def is_show_more_request(message: str) -> bool:
+    """The whole message is a "show me more" / "المزيد" / "kaman" follow-up, give or take a "please"."""
+    words = _normalize_phrase(message).split()
+    while words and words[0] in _SHOW_MORE_FILLER:
+        words.pop(0)
+    while words and words[-1] in _SHOW_MORE_FILLER:
+        words.pop()
+    return " ".join(words) in _SHOW_MORE_SET
+
+
+_SHOW_MORE_SET = frozenset(_normalize_phrase(phrase) for phrase in SHOW_MORE_PHRASES)
@@ -0,0 +1,246 @@
+"""
+Slow-query log with sampled EXPLAIN plans, and the predicate analysis behind index_advisor.py.
+
+DatabaseService reports every statement slower than SLOW_QUERY_MS. The log
+appends one JSON line per slow statement (SQL, duration, query shape, trace
+id) and, at most once per shape every slow_query_explain_interval seconds, the
+statement's EXPLAIN plan: MySQL's access type/key/rows estimate, or SQLite's
+EXPLAIN QUERY PLAN. index_advisor.py aggregates the file into composite index
+recommendations.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.metrics_service import metrics
+from services.tracing_service import tracer
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_FROM = re.compile(r"\bFROM\s+`?(\w+)`?", re.IGNORECASE)
+_WHERE = re.compile(r"\bWHERE\b", re.IGNORECASE)
+_WHERE_END = re.compile(r"\b(?:ORDER\s+BY|GROUP\s+BY|HAVING|LIMIT)\b", re.IGNORECASE)
+_AND = re.compile(r"\bAND\b", re.IGNORECASE)
+_OR = re.compile(r"\bOR\b", re.IGNORECASE)
+_FUNCTION_CALL = re.compile(r"^(\w+)\s*\(\s*`?(\w+)`?", re.IGNORECASE)
+_COMPARISON = re.compile(
+    r"^`?(\w+)`?\s*(<=>|<>|!=|<=|>=|=|<|>|NOT\s+LIKE\b|LIKE\b|NOT\s+IN\b|IN\b|NOT\s+BETWEEN\b|BETWEEN\b|IS\s+NOT\b|IS\b)",
+    re.IGNORECASE,
+)
+
+# Predicate kinds an index on the bare column can serve, in composite-index order
+EQUALITY = "eq"
+RANGE = "range"
+# ...and the ones it cannot
+NOT_SARGABLE = ("like_infix", "function", "negation", "or")
+
+
+@dataclass(slots=True)
+class Predicate:
+    """One top-level AND-ed condition of a WHERE clause."""
+    column: Optional[str]
+    kind: str  # eq, range, like_infix, function, negation, or, other
+    text: str  # The condition as written, for COUNT(*) estimates
+
+    @property
+    def indexable(self) -> bool:
+        return self.kind in (EQUALITY, RANGE)
+
+
+def _mask_strings(sql: str) -> str:
+    """Same length as sql, with string literal contents blanked so keywords inside them are ignored."""
+    return _STRING.sub(lambda m: "'" + "_" * (len(m.group()) - 2) + "'", sql)
+
+
+def fingerprint(sql: str) -> Tuple[str, str]:
+    """(id, shape): the statement with literals replaced by ?, so "room = 3" and "room = 4" group together."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    shape = " ".join(shape.lower().rstrip("; \n").split())
+    return hashlib.md5(shape.encode()).hexdigest()[:12], shape
+
+
+def _split_top_level(text: str, masked: str, separator: re.Pattern) -> List[str]:
+    """Split text at separator matches that are outside parentheses (found on the masked copy)."""
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(masked):
+        ch = masked[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0:
+            match = separator.match(masked, i)
+            if match and (i == 0 or not (masked[i - 1].isalnum() or masked[i - 1] == "_")):
+                parts.append(text[start:i])
+                start = i = match.end()
+                continue
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def parse_predicates(sql: str) -> Tuple[Optional[str], List[Predicate]]:
+    """(table, predicates) of a single-table SELECT's WHERE clause."""
+    masked = _mask_strings(sql)
+    table_match = _FROM.search(masked)
+    table = table_match.group(1) if table_match else None
+    where_match = _WHERE.search(masked)
+    if not where_match:
+        return table, []
+    end_match = _WHERE_END.search(masked, where_match.end())
+    end = end_match.start() if end_match else len(sql.rstrip().rstrip(";"))
+    where, where_masked = sql[where_match.end():end].strip(), masked[where_match.end():end].strip()
+
+    if len(_split_top_level(where, where_masked, _OR)) > 1:
+        return table, [Predicate(None, "or", where)]
+
+    conjuncts, pending = [], None
+    for part in _split_top_level(where, _mask_strings(where), _AND):
+        if pending is not None:  # "x BETWEEN a AND b" was split at its AND
+            conjuncts.append(f"{pending} AND {part}")
+            pending = None
+        elif re.search(r"\bBETWEEN\b", _mask_strings(part), re.IGNORECASE):
+            pending = part
+        else:
+            conjuncts.append(part)
+    if pending is not None:
+        conjuncts.append(pending)
+    return table, [_classify(conjunct) for conjunct in conjuncts]
+
+
+def _strip_parentheses(text: str) -> str:
+    """(a = 1) -> a = 1, but not (a = 1) OR (b = 2)."""
+    while text.startswith("(") and text.endswith(")"):
+        depth, masked = 0, _mask_strings(text)
+        for i, ch in enumerate(masked):
+            depth += ch == "("
+            depth -= ch == ")"
+            if depth == 0 and i < len(masked) - 1:
+                return text
+        text = text[1:-1].strip()
+    return text
+
+
+def _classify(condition: str) -> Predicate:
+    text = _strip_parentheses(condition)
+    masked = _mask_strings(text)
+    if _split_top_level(text, masked, _OR)[1:]:
+        return Predicate(None, "or", condition)
+
+    function = _FUNCTION_CALL.match(text)
+    if function and function.group(1).upper() not in ("NOT",):
+        # LOWER(status_text) NOT IN (...): an index on status_text cannot be used
+        return Predicate(function.group(2).lower(), "function", condition)
+
+    match = _COMPARISON.match(text)
+    if not match:
+        return Predicate(None, "other", condition)
+    column, operator = match.group(1).lower(), " ".join(match.group(2).upper().split())
+    if operator in ("=", "<=>", "IN", "IS"):
+        kind = EQUALITY
+    elif operator in ("<", ">", "<=", ">=", "BETWEEN"):
+        kind = RANGE
+    elif operator == "LIKE":
+        pattern = text[match.end():].strip().strip("'\"")
+        kind = "like_infix" if pattern[:1] in ("%", "_") else RANGE  # 'Madin%' is a range on the index
+    else:
+        kind = "negation"
+    return Predicate(column, kind, condition)
+
+
+def summarize_plan(plan_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Full-scan flag, rows the optimizer expects to examine, and the indexes it chose."""
+    if plan_rows and "detail" in plan_rows[0]:  # SQLite EXPLAIN QUERY PLAN
+        details = [str(row["detail"]) for row in plan_rows]
+        return {
+            "full_scan": any(d.startswith("SCAN") and "USING" not in d and "SUBQUERY" not in d for d in details),
+            "rows_examined": None,  # SQLite has no estimate; index_advisor counts the index_columns' matches
+            "keys": sorted({m.group(1) for d in details for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", d)] if m}),
+            # "SEARCH t USING INDEX idx (lang_id=? AND room=?)" -> the columns the index range is on
+            "index_columns": [column.lower() for d in details
+                              for column in re.findall(r"(\w+)(?:=|>|<)", d.partition("(")[2])],
+        }
+    full_scan = any(str(row.get("type", "")).upper() == "ALL" for row in plan_rows)
+    rows_examined = 1
+    for row in plan_rows:
+        rows_examined *= int(row.get("rows") or 1)
+    return {
+        "full_scan": full_scan,
+        "rows_examined": rows_examined if plan_rows else None,
+        "keys": sorted({str(row["key"]) for row in plan_rows if row.get("key")}),
+    }
+
+
+class SlowQueryLog:
+    """Appends slow statements (with sampled EXPLAIN plans) to a JSON lines file."""
+
+    def __init__(self, path: str, threshold_ms: float, explain_interval: float = 300.0):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self._last_explained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def observe(self, sql: str, params: Optional[tuple], seconds: float, rows_returned: int,
+                explain: Callable[[str, Optional[tuple]], Tuple[List[Dict[str, Any]], Optional[str]]], backend: str):
+        """Record sql if it took at least threshold_ms; explain(sql, params) returns (plan rows, error)."""
+        duration_ms = seconds * 1000
+        if not self.path or duration_ms < self.threshold_ms or sql.lstrip()[:7].upper() == "EXPLAIN":
+            return
+        query_id, shape = fingerprint(sql)
+        now = time.monotonic()
+        with self._lock:
+            due = now - self._last_explained.get(query_id, float("-inf")) >= self.explain_interval
+            if due:
+                self._last_explained[query_id] = now
+            self.recorded += 1
+        entry = {
+            "ts": time.time(),
+            "query_id": query_id,
+            "shape": shape,
+            "sql": sql,
+            "params": list(params) if params else None,
+            "duration_ms": round(duration_ms, 3),
+            "rows_returned": rows_returned,
+            "backend": backend,
+            "trace_id": tracer.current_trace_id(),
+        }
+        if due:
+            plan, error = explain(sql, params)
+            if error is None:
+                entry["plan"] = plan
+                entry.update(summarize_plan(plan))
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            print(f"[SLOW QUERY] Could not write log entry: {e}")
+
+    def collect(self):
+        """Counter for metrics.register_collector."""
+        return [("slow_queries_total", "Statements slower than the slow-query threshold.", "counter",
+                 [({}, self.recorded)])]
+
+
+# Global slow-query log
+slow_query_log = SlowQueryLog(
+    settings.slow_query_log_path if settings.enable_slow_query_log else "",
+    settings.slow_query_ms,
+    settings.slow_query_explain_interval,
+)
+metrics.register_collector(slow_query_log.collect)
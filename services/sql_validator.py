@@ -0,0 +1,502 @@
+"""
+Validator and rewriter for LLM-generated unit search SQL.
+
+generate_sql_tool's output is parsed into a small AST (single-table SELECT with
+WHERE / ORDER BY / LIMIT) before it runs, and the checks below decide what is
+executed. A query that cannot be parsed or breaks a rule is rejected, never run
+as written:
+
+- one SELECT statement on an allowed table; no comments, joins, subqueries,
+  UNION, GROUP BY, INTO, locking clauses or unknown functions/columns;
+- a top-level `lang_id = N` predicate (added, or corrected to the turn's language);
+- a LIMIT of at most settings.sql_max_limit (added or lowered), a bounded OFFSET;
+- SELECT * replaced by config.SEARCH_COLUMNS (the union of the consumers' PROJECTIONS);
+- `region_text LIKE '%Cairo%'` style name filters replaced by `reg_id IN (...)`
+  when the name lookup knows the matching IDs (an indexed integer filter instead
+  of a leading-wildcard scan); ORDER BY RAND()/expressions dropped.
+
+The grammar covers what the SQL prompt asks for; anything outside it is an error.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+from config import settings, COLUMNS, SEARCH_COLUMNS
+from services.name_resolver import NAME_ID_COLUMNS, NameResolver
+from services.result_types import SqlCheck
+
+ALLOWED_TABLES = ("unit_search_sorting",)
+ALLOWED_FUNCTIONS = {"LOWER", "UPPER", "TRIM", "LENGTH", "COALESCE", "IFNULL", "ABS", "ROUND"}
+MAX_REWRITE_IDS = 50  # Above this the IN list is no cheaper than the LIKE
+
+_KNOWN_COLUMNS = {column.lower() for column in COLUMNS}
+_TOKEN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--|\#|/\*)
+  | (?P<str>[Nn]?'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*")
+  | (?P<num>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<param>%s)
+  | (?P<ident>`[^`]+`|[A-Za-z_؀-ۿ][\w؀-ۿ]*)
+  | (?P<op><=>|<>|!=|<=|>=|=|<|>)
+  | (?P<punct>[(),;*.\-])
+""", re.VERBOSE)
+_CLAUSE_KEYWORDS = {"FROM", "WHERE", "ORDER", "BY", "LIMIT", "OFFSET", "AND", "OR", "NOT", "LIKE", "IN",
+                    "BETWEEN", "IS", "NULL", "ASC", "DESC", "REGEXP", "SELECT", "TRUE", "FALSE"}
+_FORBIDDEN = {"INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "CREATE", "TRUNCATE", "REPLACE", "GRANT", "REVOKE",
+              "RENAME", "CALL", "HANDLER", "LOAD", "INTO", "OUTFILE", "DUMPFILE", "UNION", "JOIN", "GROUP",
+              "HAVING", "FOR", "LOCK", "SLEEP", "BENCHMARK", "LOAD_FILE", "INFORMATION_SCHEMA", "DISTINCT"}
+
+
+class SqlRejected(Exception):
+    """The statement is outside the allowed search grammar."""
+
+
+# ── AST ──────────────────────────────────────────────────────────────────
+
+@dataclass(slots=True)
+class Column:
+    name: str
+
+
+@dataclass(slots=True)
+class Literal:
+    raw: str  # As written: 'text', 3, 2.5, NULL, %s
+
+
+@dataclass(slots=True)
+class Func:
+    name: str
+    args: List["Operand"]
+
+
+Operand = Union[Column, Literal, Func]
+
+
+@dataclass(slots=True)
+class Comparison:
+    left: Operand
+    op: str  # =, <, LIKE, NOT LIKE, IN, NOT IN, BETWEEN, NOT BETWEEN, IS, IS NOT, REGEXP ...
+    right: List[Operand]
+
+
+@dataclass(slots=True)
+class BoolOp:
+    op: str  # AND / OR
+    items: List["Node"]
+
+
+@dataclass(slots=True)
+class Not:
+    item: "Node"
+
+
+Node = Union[Comparison, BoolOp, Not]
+
+
+@dataclass(slots=True)
+class Select:
+    columns: Optional[List[str]]  # None = *
+    table: str
+    where: Optional[Node] = None
+    order_by: List[Tuple[str, bool]] = field(default_factory=list)  # (column, descending)
+    limit: Optional[int] = None
+    offset: Optional[int] = None
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────
+
+def tokenize(sql: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    while position < len(sql):
+        match = _TOKEN.match(sql, position)
+        if not match:
+            raise SqlRejected(f"unexpected character {sql[position]!r}")
+        kind, value = match.lastgroup, match.group()
+        if kind == "comment":
+            raise SqlRejected("comments are not allowed")
+        if kind == "str" and value[0] in "Nn":
+            value = value[1:]  # N'...' national strings: the database is utf8mb4 either way
+        if kind == "ident":
+            value = value.strip("`")
+            if value.upper() in _FORBIDDEN:
+                raise SqlRejected(f"{value.upper()} is not allowed")
+        if kind != "space":
+            tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        index = self.i + offset
+        return self.tokens[index] if index < len(self.tokens) else ("eof", "")
+
+    def keyword(self, *words) -> bool:
+        """Consume the keyword sequence if it comes next."""
+        for offset, word in enumerate(words):
+            kind, value = self.peek(offset)
+            if kind != "ident" or value.upper() != word:
+                return False
+        self.i += len(words)
+        return True
+
+    def expect(self, kind: str, value: Optional[str] = None) -> str:
+        token_kind, token_value = self.peek()
+        if token_kind != kind or (value is not None and token_value.upper() != value):
+            raise SqlRejected(f"expected {value or kind}, found {token_value or 'end of statement'!r}")
+        self.i += 1
+        return token_value
+
+    def select(self) -> Select:
+        self.expect("ident", "SELECT")
+        if self.peek() == ("punct", "*"):
+            self.i += 1
+            columns = None
+        else:
+            columns = [self.column_name()]
+            while self.peek() == ("punct", ","):
+                self.i += 1
+                columns.append(self.column_name())
+        self.expect("ident", "FROM")
+        table = self.expect("ident").lower()
+        statement = Select(columns=columns, table=table)
+        if self.keyword("WHERE"):
+            statement.where = self.expression()
+        if self.keyword("ORDER", "BY"):
+            statement.order_by = self.order_items()
+        if self.keyword("LIMIT"):
+            first = self.whole_number()
+            if self.peek() == ("punct", ","):  # LIMIT offset, count
+                self.i += 1
+                statement.offset, statement.limit = first, self.whole_number()
+            else:
+                statement.limit = first
+                if self.keyword("OFFSET"):
+                    statement.offset = self.whole_number()
+        while self.peek() == ("punct", ";"):
+            self.i += 1
+        if self.peek()[0] != "eof":
+            raise SqlRejected(f"unexpected {self.peek()[1]!r} after the statement (one SELECT only)")
+        return statement
+
+    def whole_number(self) -> int:
+        value = self.expect("num")
+        if not value.isdigit():
+            raise SqlRejected(f"LIMIT and OFFSET take whole numbers, not {value!r}")
+        return int(value)
+
+    def column_name(self) -> str:
+        name = self.expect("ident")
+        if name.upper() in _CLAUSE_KEYWORDS:
+            raise SqlRejected(f"expected a column, found {name!r}")
+        return name.lower()
+
+    def order_items(self) -> List[Tuple[Union[str, Operand], bool]]:
+        items = []
+        while True:
+            operand = self.operand()
+            descending = False
+            if self.keyword("DESC"):
+                descending = True
+            else:
+                self.keyword("ASC")
+            items.append((operand.name if isinstance(operand, Column) else operand, descending))
+            if self.peek() != ("punct", ","):
+                return items
+            self.i += 1
+
+    def expression(self) -> Node:
+        return _bool_op("OR", self.conjunction, lambda: self.keyword("OR"))
+
+    def conjunction(self) -> Node:
+        return _bool_op("AND", self.negation, lambda: self.keyword("AND"))
+
+    def negation(self) -> Node:
+        if self.keyword("NOT"):
+            return Not(self.negation())
+        if self.peek() == ("punct", "("):
+            self.i += 1
+            node = self.expression()
+            self.expect("punct", ")")
+            return node
+        return self.comparison()
+
+    def comparison(self) -> Comparison:
+        left = self.operand()
+        kind, value = self.peek()
+        if kind == "op":
+            self.i += 1
+            return Comparison(left, value, [self.operand()])
+        negated = self.keyword("NOT")
+        prefix = "NOT " if negated else ""
+        if self.keyword("LIKE"):
+            return Comparison(left, prefix + "LIKE", [self.operand()])
+        if self.keyword("REGEXP"):
+            return Comparison(left, prefix + "REGEXP", [self.operand()])
+        if self.keyword("IN"):
+            self.expect("punct", "(")
+            values = [self.operand()]
+            while self.peek() == ("punct", ","):
+                self.i += 1
+                values.append(self.operand())
+            self.expect("punct", ")")
+            return Comparison(left, prefix + "IN", values)
+        if self.keyword("BETWEEN"):
+            low = self.operand()
+            self.expect("ident", "AND")
+            return Comparison(left, prefix + "BETWEEN", [low, self.operand()])
+        if not negated and self.keyword("IS"):
+            op = "IS NOT" if self.keyword("NOT") else "IS"
+            self.expect("ident", "NULL")
+            return Comparison(left, op, [Literal("NULL")])
+        raise SqlRejected(f"expected a comparison after {render_operand(left)}, found {value or 'end of statement'!r}")
+
+    def operand(self) -> Operand:
+        kind, value = self.peek()
+        if kind in ("str", "num", "param"):
+            self.i += 1
+            return Literal(value)
+        if (kind, value) == ("punct", "-") and self.peek(1)[0] == "num":
+            self.i += 2
+            return Literal("-" + self.tokens[self.i - 1][1])
+        if kind == "ident":
+            self.i += 1
+            if value.upper() in ("NULL", "TRUE", "FALSE"):
+                return Literal(value.upper())
+            if self.peek() == ("punct", "("):
+                self.i += 1
+                args = [] if self.peek() == ("punct", ")") else [self.operand()]
+                while self.peek() == ("punct", ","):
+                    self.i += 1
+                    args.append(self.operand())
+                self.expect("punct", ")")
+                return Func(value.upper(), args)
+            if value.upper() in _CLAUSE_KEYWORDS:
+                raise SqlRejected(f"unexpected {value!r}")
+            return Column(value.lower())
+        raise SqlRejected(f"unexpected {value or 'end of statement'!r}")
+
+
+def _bool_op(op: str, parse_item, next_separator) -> Node:
+    """items joined by op; "(a AND b) AND c" is flattened to one AND of a, b, c."""
+    items = []
+    while True:
+        item = parse_item()
+        items.extend(item.items if isinstance(item, BoolOp) and item.op == op else [item])
+        if not next_separator():
+            return items[0] if len(items) == 1 else BoolOp(op, items)
+
+
+def parse(sql: str) -> Select:
+    return _Parser(tokenize(sql)).select()
+
+
+# ── Rendering ────────────────────────────────────────────────────────────
+
+def render_operand(operand: Operand) -> str:
+    if isinstance(operand, Column):
+        return operand.name
+    if isinstance(operand, Func):
+        return f"{operand.name}({', '.join(render_operand(arg) for arg in operand.args)})"
+    return operand.raw
+
+
+def render_condition(node: Node, parent: Optional[str] = None) -> str:
+    if isinstance(node, BoolOp):
+        text = f" {node.op} ".join(render_condition(item, node.op) for item in node.items)
+        return f"({text})" if parent is not None and parent != node.op else text
+    if isinstance(node, Not):
+        return f"NOT ({render_condition(node.item)})"
+    left, values = render_operand(node.left), [render_operand(value) for value in node.right]
+    if node.op.endswith("IN"):
+        return f"{left} {node.op} ({', '.join(values)})"
+    if node.op.endswith("BETWEEN"):
+        return f"{left} {node.op} {values[0]} AND {values[1]}"
+    return f"{left} {node.op} {values[0]}"
+
+
+def render(statement: Select) -> str:
+    sql = f"SELECT {', '.join(statement.columns) if statement.columns else '*'} FROM {statement.table}"
+    if statement.where is not None:
+        sql += f" WHERE {render_condition(statement.where)}"
+    if statement.order_by:
+        sql += " ORDER BY " + ", ".join(f"{column} {'DESC' if descending else 'ASC'}"
+                                        for column, descending in statement.order_by)
+    if statement.limit is not None:
+        sql += f" LIMIT {statement.limit}"
+    if statement.offset:
+        sql += f" OFFSET {statement.offset}"
+    return sql
+
+
+# ── Validation / rewriting ───────────────────────────────────────────────
+
+def _string_value(operand: Operand) -> Optional[str]:
+    if isinstance(operand, Literal) and operand.raw[:1] in ("'", '"'):
+        return operand.raw[1:-1].replace("''", "'").replace("\\'", "'")
+    return None
+
+
+def _check_operand(operand: Operand):
+    if isinstance(operand, Column) and operand.name not in _KNOWN_COLUMNS:
+        raise SqlRejected(f"unknown column {operand.name!r}")
+    if isinstance(operand, Func):
+        if operand.name not in ALLOWED_FUNCTIONS:
+            raise SqlRejected(f"function {operand.name}() is not allowed")
+        for arg in operand.args:
+            _check_operand(arg)
+
+
+def _walk(node: Node):
+    yield node
+    if isinstance(node, BoolOp):
+        for item in node.items:
+            yield from _walk(item)
+    elif isinstance(node, Not):
+        yield from _walk(node.item)
+
+
+def _rewrite_names(node: Node, lookup: Optional[NameResolver], rewrites: List[str]) -> Node:
+    """Name LIKE/= filters -> indexed ID IN-lists, when the resolver knows the matching IDs."""
+    if isinstance(node, BoolOp):
+        node.items = [_rewrite_names(item, lookup, rewrites) for item in node.items]
+        return node
+    if isinstance(node, Not):
+        node.item = _rewrite_names(node.item, lookup, rewrites)
+        return node
+    left = node.left
+    if isinstance(left, Func) and left.name in ("LOWER", "UPPER", "TRIM") and len(left.args) == 1:
+        left = left.args[0]
+    if lookup is None or not isinstance(left, Column) or left.name not in NAME_ID_COLUMNS:
+        return node
+    if node.op not in ("=", "LIKE", "NOT LIKE") or _string_value(node.right[0]) is None:
+        return node
+    ids = lookup.ids(left.name, _string_value(node.right[0]).strip(), like=node.op != "=",
+                     fuzzy=node.op != "NOT LIKE")
+    if not ids or len(ids) > MAX_REWRITE_IDS:
+        return node
+    id_column = NAME_ID_COLUMNS[left.name]
+    rewritten = Comparison(Column(id_column), "NOT IN" if node.op == "NOT LIKE" else "IN",
+                           [Literal(str(id_)) for id_ in ids])
+    rewrites.append(f"{render_condition(node)} -> {render_condition(rewritten)}")
+    return rewritten
+
+
+def validate_search_sql(sql: str, lang_id: Optional[int] = None,
+                        lookup: Optional[NameResolver] = None, columns: List[str] = SEARCH_COLUMNS) -> SqlCheck:
+    """
+    Parse, check and rewrite a generated search query (see module docstring).
+
+    lang_id: the turn's language; None requires the query to filter on some lang_id.
+    columns: the select list that replaces * (a config.projection()).
+    """
+    rewrites: List[str] = []
+    try:
+        statement = parse(sql)
+        if statement.table not in ALLOWED_TABLES:
+            raise SqlRejected(f"table {statement.table!r} is not searchable")
+        for column in statement.columns or []:
+            _check_operand(Column(column))
+        for node in (_walk(statement.where) if statement.where is not None else ()):
+            if isinstance(node, Comparison):
+                for operand in [node.left, *node.right]:
+                    _check_operand(operand)
+
+        # Projection
+        if statement.columns is None:
+            statement.columns = list(columns)
+            rewrites.append("SELECT * -> search columns")
+        else:
+            missing = [column for column in ("unit_id", "sorting_id") if column not in statement.columns]
+            statement.columns += missing
+
+        # lang_id at the top level of the WHERE clause
+        conjuncts = []
+        if statement.where is not None:
+            where = statement.where
+            conjuncts = list(where.items) if isinstance(where, BoolOp) and where.op == "AND" else [where]
+        language = [node for node in conjuncts if isinstance(node, Comparison) and node.left == Column("lang_id")
+                    and node.op == "=" and isinstance(node.right[0], Literal)]
+        if lang_id is not None:
+            if language and any(node.right[0].raw != str(lang_id) for node in language):
+                rewrites.append(f"lang_id corrected to {lang_id}")
+            conjuncts = [node for node in conjuncts if not any(node is match for match in language)]
+            conjuncts.append(Comparison(Column("lang_id"), "=", [Literal(str(lang_id))]))
+            if not language:
+                rewrites.append(f"added lang_id = {lang_id}")
+        elif not language:
+            raise SqlRejected("missing lang_id filter")
+
+        conjuncts = [_rewrite_names(node, lookup, rewrites) for node in conjuncts]
+        statement.where = conjuncts[0] if len(conjuncts) == 1 else BoolOp("AND", conjuncts)
+
+        # ORDER BY plain columns only (RAND() or expressions force a sort of every match)
+        order_by = []
+        for column, descending in statement.order_by:
+            if isinstance(column, str):
+                _check_operand(Column(column))
+                order_by.append((column, descending))
+            else:
+                rewrites.append(f"dropped ORDER BY {render_operand(column)}")
+        statement.order_by = order_by
+
+        # Bounded result and skip
+        if statement.limit is None or statement.limit > settings.sql_max_limit:
+            rewrites.append(f"LIMIT {statement.limit} -> {settings.sql_max_limit}" if statement.limit is not None
+                            else f"added LIMIT {settings.sql_max_limit}")
+            statement.limit = settings.sql_max_limit
+        if statement.offset and statement.offset > settings.sql_max_offset:
+            raise SqlRejected(f"OFFSET {statement.offset} is above {settings.sql_max_offset}")
+    except SqlRejected as e:
+        print(f"[SQL GUARD] Rejected: {e} | {' '.join(sql.split())[:200]}")
+        return SqlCheck(sql=sql, error=f"Rejected SQL: {e}")
+    except ValueError as e:
+        return SqlCheck(sql=sql, error=f"Rejected SQL: {e}")
+
+    checked = render(statement)
+    if rewrites:
+        print(f"[SQL GUARD] {'; '.join(rewrites)}")
+    return SqlCheck(sql=checked, rewrites=rewrites)
+
+
+def _column_names(operand: Operand):
+    if isinstance(operand, Column):
+        yield operand.name
+    elif isinstance(operand, Func):
+        for arg in operand.args:
+            yield from _column_names(arg)
+
+
+def _is_status_exclusion(node: Node) -> bool:
+    """LOWER(status_text) NOT IN (...) / status_text NOT LIKE '%sold%' style availability filters."""
+    if not isinstance(node, Comparison) or node.op not in ("NOT IN", "NOT LIKE", "!=", "<>"):
+        return False
+    return list(_column_names(node.left)) == ["status_text"]
+
+
+def rewrite_for_projection(sql: str, table: str, columns, available_column: str) -> Optional[str]:
+    """
+    A checked search moved onto a projection of available units (services/available_units.py):
+    the status exclusions become `available_column = 1`. None if the search uses a column
+    the projection does not have.
+    """
+    statement = parse(sql)
+    where = statement.where
+    conjuncts = [] if where is None else list(where.items) if isinstance(where, BoolOp) and where.op == "AND" else [where]
+    conjuncts = [node for node in conjuncts if not _is_status_exclusion(node)]
+    used = set(statement.columns or []) | {column for column, _ in statement.order_by}
+    for conjunct in conjuncts:
+        for node in _walk(conjunct):
+            if isinstance(node, Comparison):
+                for operand in [node.left, *node.right]:
+                    used.update(_column_names(operand))
+    if statement.columns is None or not used <= set(columns):
+        return None
+    conjuncts.append(Comparison(Column(available_column), "=", [Literal("1")]))
+    statement.where = conjuncts[0] if len(conjuncts) == 1 else BoolOp("AND", conjuncts)
+    statement.table = table
+    return render(statement)
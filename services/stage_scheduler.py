@@ -0,0 +1,118 @@
+"""Concurrent execution of independent per-turn pipeline stages."""
+import contextvars
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+
+
+def normalize_stage_key(text: str) -> str:
+    """Key used to decide whether a speculative result matches the real request."""
+    return re.sub(r"[\s?؟!.]+", " ", (text or "").lower()).strip()
+
+
+class Speculation:
+    """
+    A stage started before we know it is needed (e.g. RAG retrieval while the
+    orchestrator is still routing). The consumer either takes the result, when
+    it asks for the same key, or the speculation is cancelled. Keys match after
+    normalize_stage_key unless exact (the stage's result depends on the exact text).
+    """
+
+    def __init__(self, name: str, key: str, future, exact: bool = False):
+        self.name = name
+        self.exact = exact
+        self.key = self._key(key)
+        self.future = future
+
+    def _key(self, key: str) -> str:
+        return key if self.exact else normalize_stage_key(key)
+
+    def take(self, key: str, timeout: Optional[float] = None):
+        """Result of the speculative stage if it was started for key, else None (and cancel it)."""
+        if self._key(key) != self.key:
+            self.cancel()
+            print(f"[PREFETCH] {self.name} miss")
+            return None
+        try:
+            result = self.future.result(timeout=timeout)
+            print(f"[PREFETCH] {self.name} hit")
+            return result
+        except Exception as e:
+            print(f"[PREFETCH] {self.name} failed ({e}), running it again")
+            return None
+
+    def cancel(self):
+        """Drop the speculative work. A stage already running finishes in its own pool, unused."""
+        self.future.cancel()
+
+
+class StageScheduler:
+    """
+    Runs the independent stages of a chat turn (guard, language detection,
+    intent classification, agent creation) concurrently, so a turn costs the
+    max() of the stages instead of their sum.
+
+    Speculative stages get their own small pool: a running speculation cannot be
+    cancelled, so it must never hold a worker the turn's real stages need.
+    """
+
+    def __init__(self, max_workers: int = 16, speculation_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage")
+        self._speculation_executor = ThreadPoolExecutor(max_workers=speculation_workers,
+                                                        thread_name_prefix="speculation")
+
+    def run(self, stages: Dict[str, Callable[[], Any]],
+            abort_if: Optional[Callable[[str, Any], bool]] = None) -> Dict[str, Any]:
+        """
+        Run stages concurrently and return {name: result}.
+
+        abort_if(name, result) is checked as each stage finishes; when it returns
+        True the remaining stages are cancelled and only the results collected so
+        far are returned (e.g. the guard flagged the message, nothing else matters).
+        An exception raised by a stage is re-raised here.
+        """
+        start = time.time()
+        results = {}
+        timings = {}
+
+        def timed(name, fn):
+            stage_start = time.time()
+            try:
+                return fn()
+            finally:
+                timings[name] = time.time() - stage_start
+
+        if len(stages) == 1:
+            # Nothing to overlap with: skip the thread hop
+            (name, fn), = stages.items()
+            results[name] = timed(name, fn)
+        else:
+            # Each stage runs in a copy of the caller's context, so trace spans nest under the turn
+            pending = {self._executor.submit(contextvars.copy_context().run, timed, name, fn): name
+                       for name, fn in stages.items()}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    results[name] = future.result()
+                    if abort_if and abort_if(name, results[name]):
+                        for other in pending:
+                            other.cancel()
+                        pending = {}
+                        break
+
+        if settings.enable_debug_logging:
+            stage_times = ", ".join(f"{name}={t * 1000:.0f}ms" for name, t in timings.items())
+            print(f"[STAGES] {stage_times} | wall={(time.time() - start) * 1000:.0f}ms")
+        return results
+
+    def speculate(self, name: str, key: str, fn: Callable[[], Any], exact: bool = False) -> Speculation:
+        """Start fn in the speculation pool for key; see Speculation."""
+        return Speculation(name, key, self._speculation_executor.submit(contextvars.copy_context().run, fn), exact)
+
+
+# Global scheduler instance
+stage_scheduler = StageScheduler()
@@ -0,0 +1,331 @@
+"""
+Per-request trace spans, exported as OpenTelemetry (OTLP/JSON) lines.
+
+Every /api/chat request gets a trace ID. Stages timed through metrics_service,
+LLM calls and agent tool calls (via LangChain callbacks) and DB queries become
+nested spans of that trace. When a request slower than trace_min_duration_ms
+finishes, the whole trace is appended to settings.trace_log_path as one
+OTLP/JSON "resourceSpans" object per line, the format the OpenTelemetry
+Collector's otlpjsonfile receiver reads. The file rotates at trace_max_bytes.
+Prompts and tool inputs hold user messages, so only their lengths are recorded
+unless enable_debug_logging is on.
+See trace_report.py for a quick breakdown of one trace without a collector.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+SERVICE_NAME = "eshtri-chatbot"
+
+# Attribute values longer than this (prompts, SQL) are truncated
+MAX_ATTRIBUTE_LENGTH = 2000
+
+# OTLP span kinds / status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _attribute_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON encodes 64-bit ints as strings
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    text = str(value)
+    if len(text) > MAX_ATTRIBUTE_LENGTH:
+        text = text[:MAX_ATTRIBUTE_LENGTH] + "..."
+    return {"stringValue": text}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[dict]:
+    return [{"key": key, "value": _attribute_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Trace:
+    """Spans of one request, collected until the root span ends."""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span"):
+        with self._lock:
+            self.spans.append(span)
+
+
+class Span:
+    """One timed operation; nested under the span that was current when it started."""
+
+    def __init__(self, trace: Trace, name: str, parent: Optional["Span"] = None,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+                 start_ns: Optional[int] = None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status_code = STATUS_OK
+        self.status_message = ""
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        self.status_code = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self.trace.add(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        return span
+
+
+class Tracer:
+    """
+    Creates spans under the current request's trace.
+
+    Outside a trace (scripts, tests, background warmup) span() does nothing, so
+    instrumented code costs one context-variable lookup there.
+    """
+
+    def __init__(self, path: str, min_duration_ms: float = 0.0, max_bytes: int = 0, backup_count: int = 0,
+                 include_prompts: bool = False):
+        self.path = path
+        self.min_duration_ms = min_duration_ms
+        self.max_bytes = max_bytes  # 0: never rotate
+        self.backup_count = backup_count
+        self.include_prompts = include_prompts
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    def current_trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+    def set_attribute(self, key: str, value: Any):
+        """Attach an attribute to the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.set_attribute(key, value)
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes):
+        """Root span of a new trace; the trace is exported when it ends."""
+        root = Span(Trace(secrets.token_hex(16)), name, kind=SPAN_KIND_SERVER, attributes=attributes)
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException as e:
+            root.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+            self.export(root)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """Child span of the current span; yields None (and records nothing) outside a trace."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, parent=parent, kind=kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def record_span(self, name: str, start: float, end: float, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """Record an already finished operation (start/end from time.time()) under the current span."""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = Span(parent.trace, name, parent=parent, kind=kind, attributes=attributes, start_ns=int(start * 1e9))
+        span.end(int(end * 1e9))
+
+    def export(self, root: Span):
+        """Append the root's trace as one OTLP/JSON line (skipped below min_duration_ms)."""
+        if not self.path or (root.end_ns - root.start_ns) / 1e6 < self.min_duration_ms:
+            return
+        trace = root.trace
+        with trace._lock:
+            spans = sorted(trace.spans, key=lambda s: s.start_ns)
+        line = json.dumps({"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": SERVICE_NAME},
+                "spans": [span.to_otlp() for span in spans],
+            }],
+        }]}, ensure_ascii=False)
+        try:
+            with self._write_lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._rotate(len(line.encode("utf-8")) + 1)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            print(f"[TRACE] Could not write trace {trace.trace_id}: {e}")
+
+    def _rotate(self, incoming: int):
+        """traces.jsonl -> traces.jsonl.1 -> ... when the next line would pass max_bytes."""
+        if not self.max_bytes or not os.path.exists(self.path) \
+                or os.path.getsize(self.path) + incoming <= self.max_bytes:
+            return
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def text_attributes(self, key: str, text: Any) -> Dict[str, Any]:
+        """{key: text} when prompts are recorded, else only {key_length: len(text)}."""
+        text = "" if text is None else str(text)
+        if self.include_prompts:
+            return {key: text}
+        return {f"{key}_length": len(text)}
+
+
+_callback_handler = None
+
+
+def langchain_trace_handler():
+    """
+    LangChain callback handler that records LLM and tool runs as spans.
+
+    One shared instance, so attaching it both to the LLM and to an agent run's
+    config does not record the same run twice.
+    """
+    global _callback_handler
+    if _callback_handler is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class TraceCallbackHandler(BaseCallbackHandler):
+            def __init__(self):
+                self._runs: Dict[Any, tuple] = {}  # run_id -> (span, previous current span)
+                self._lock = threading.Lock()
+
+            def _start(self, run_id, name: str, kind: int, attributes: dict, make_current: bool):
+                parent = _current_span.get()
+                if parent is None:
+                    return
+                with self._lock:
+                    if run_id in self._runs:
+                        return
+                    span = Span(parent.trace, name, parent=parent, kind=kind, attributes=attributes)
+                    self._runs[run_id] = (span, parent if make_current else None)
+                if make_current:
+                    # The tool body runs in a copy of this context, so its own spans nest under the tool
+                    _current_span.set(span)
+
+            def _end(self, run_id, error: Optional[BaseException] = None, **attributes):
+                with self._lock:
+                    entry = self._runs.pop(run_id, None)
+                if entry is None:
+                    return
+                span, previous = entry
+                span.attributes.update(attributes)
+                if error is not None:
+                    span.set_error(error)
+                if previous is not None and _current_span.get() is span:
+                    _current_span.set(previous)
+                span.end()
+
+            def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+                model = (kwargs.get("invocation_params") or {}).get("model_name") or (serialized or {}).get("name")
+                prompt = messages[0][-1].content if messages and messages[0] else ""
+                self._start(run_id, "llm.chat", SPAN_KIND_CLIENT,
+                            {"gen_ai.request.model": model, **tracer.text_attributes("gen_ai.prompt", prompt)},
+                            make_current=False)
+
+            def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+                self._start(run_id, "llm.completion", SPAN_KIND_CLIENT,
+                            tracer.text_attributes("gen_ai.prompt", prompts[0] if prompts else ""), make_current=False)
+
+            def on_llm_end(self, response, *, run_id, **kwargs):
+                usage = {}
+                try:
+                    usage = response.generations[0][0].message.usage_metadata or {}
+                except (AttributeError, IndexError):
+                    pass
+                self._end(run_id, **{
+                    "gen_ai.usage.input_tokens": usage.get("input_tokens"),
+                    "gen_ai.usage.output_tokens": usage.get("output_tokens"),
+                })
+
+            def on_llm_error(self, error, *, run_id, **kwargs):
+                self._end(run_id, error=error)
+
+            def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+                name = (serialized or {}).get("name") or "tool"
+                self._start(run_id, f"tool.{name}", SPAN_KIND_INTERNAL,
+                            {"tool.name": name, **tracer.text_attributes("tool.input", input_str)}, make_current=True)
+
+            def on_tool_end(self, output, *, run_id, **kwargs):
+                self._end(run_id, **{"tool.output_length": len(str(output))})
+
+            def on_tool_error(self, error, *, run_id, **kwargs):
+                self._end(run_id, error=error)
+
+        _callback_handler = TraceCallbackHandler()
+    return _callback_handler
+
+
+# Global tracer
+tracer = Tracer(
+    settings.trace_log_path if settings.enable_trace_log else "",
+    min_duration_ms=settings.trace_min_duration_ms,
+    max_bytes=settings.trace_max_bytes,
+    backup_count=settings.trace_backup_count,
+    include_prompts=settings.enable_debug_logging,
+)
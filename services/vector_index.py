@@ -0,0 +1,91 @@
+"""Exact in-memory vector index with vectorized MMR for small corpora."""
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class NumpyVectorIndex:
+    """
+    Exact dot-product retrieval over a single float32 matrix.
+
+    The policy corpus is a few hundred chunks, so a brute-force matrix-vector
+    product beats Chroma's client/HNSW/SQLite layers and returns real cosine
+    similarity scores (vectors are L2-normalized) instead of MMR placeholders.
+    """
+
+    def __init__(self, documents: List[Document], vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or len(documents) != matrix.shape[0]:
+            raise ValueError(f"Expected one vector per document, got {matrix.shape} for {len(documents)} documents")
+
+        # Re-normalize defensively so dot product == cosine similarity
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = np.ascontiguousarray(matrix / np.clip(norms, 1e-12, None))
+        self.documents = documents
+
+    @classmethod
+    def from_chroma(cls, vectordb) -> "NumpyVectorIndex":
+        """Load every stored chunk and its vector out of a LangChain Chroma store."""
+        data = vectordb.get(include=["embeddings", "documents", "metadatas"])
+        documents = [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ]
+        return cls(documents, data["embeddings"])
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _scores(self, vector) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        return self.matrix @ query
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the k highest scores, best first."""
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def similarity_search_by_vector(self, vector, k: int = 4) -> List[Tuple[Document, float]]:
+        """Exact top-k by cosine similarity. Returns (document, similarity) pairs."""
+        scores = self._scores(vector)
+        return [(self.documents[i], float(scores[i])) for i in self._top_k(scores, k)]
+
+    def max_marginal_relevance_search_by_vector(
+        self, vector, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5
+    ) -> List[Tuple[Document, float]]:
+        """
+        MMR over the exact top fetch_k candidates.
+
+        Each step picks argmax(lambda * sim(query, d) - (1 - lambda) * max sim(d, selected)).
+        The candidate-candidate similarity matrix is computed once and the running
+        "max similarity to the selected set" is updated with one vector op per step.
+        Returns (document, similarity to the query) pairs in selection order.
+        """
+        scores = self._scores(vector)
+        candidates = self._top_k(scores, max(fetch_k, k))
+        if candidates.size == 0:
+            return []
+
+        relevance = scores[candidates]
+        pairwise = self.matrix[candidates] @ self.matrix[candidates].T
+
+        selected = [0]  # The most relevant candidate always goes first
+        max_sim_to_selected = pairwise[:, 0].copy()
+        available = np.ones(candidates.size, dtype=bool)
+        available[0] = False
+
+        while len(selected) < min(k, candidates.size):
+            mmr = lambda_mult * relevance - (1 - lambda_mult) * max_sim_to_selected
+            mmr[~available] = -np.inf
+            best = int(np.argmax(mmr))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_sim_to_selected, pairwise[:, best], out=max_sim_to_selected)
+
+        return [(self.documents[candidates[i]], float(relevance[i])) for i in selected]
@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_available_units.db")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", DB_PATH)
+
+from config import settings, SEARCH_COLUMNS
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+from services.available_units import (AvailableUnitsSnapshot, is_available_status, normalize_image_url,
+                                      normalize_images, IMAGE_COLUMNS, IMAGE_EXTENSIONS)
+from services.sql_validator import validate_search_sql, rewrite_for_projection
+from services.search_pagination import paginated_search
+
+STATUS = ("AND LOWER(status_text) NOT IN ('reserved', 'sold', 'unavailable', 'temporary locked', 'locked', "
+          "'off market', 'محجوزة', 'محجوزه', 'مباعة', 'غير متاحة', 'مغلقة', 'مؤقتا')")
+
+
+def _db():
+    generate_inventory(DB_PATH, n_units=1500, seed=4)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    settings.enable_sql_cache = False
+    return DatabaseService()
+
+
+def test_row_helpers():
+    assert normalize_image_url("https://cdn/x/1") == "https://cdn/x/1.jpg"
+    assert normalize_image_url("https://cdn/x/1.WEBP") == "https://cdn/x/1.WEBP" and normalize_image_url(None) is None
+    assert not is_available_status("Temporary Locked") and not is_available_status("محجوزة")
+    assert is_available_status("Available") and is_available_status("متاح")
+
+
+def test_projection_rewrite():
+    sql = validate_search_sql(f"SELECT * FROM unit_search_sorting WHERE room = 3 {STATUS} AND lang_id = 1", lang_id=1).sql
+    projected = rewrite_for_projection(sql, "available_units", SEARCH_COLUMNS, "is_available")
+    print(projected[projected.index("FROM"):])
+    assert projected.endswith("FROM available_units WHERE room = 3 AND lang_id = 1 AND is_available = 1 LIMIT 5")
+    garage = validate_search_sql("SELECT * FROM unit_search_sorting WHERE garage = 1 AND lang_id = 1", lang_id=1).sql
+    assert rewrite_for_projection(garage, "available_units", SEARCH_COLUMNS, "is_available") is None
+
+
+def test_snapshot_matches_database():
+    db = _db()
+    snapshot = AvailableUnitsSnapshot(db)
+    assert snapshot.search("SELECT * FROM unit_search_sorting WHERE lang_id = 1 LIMIT 5") is None, "Not loaded yet"
+    assert snapshot.refresh() and snapshot.rows == 3000 and 0 < snapshot.available_rows < snapshot.rows
+
+    for where in ("room = 3 AND lang_id = 1", "reg_id IN (1, 2) AND price < 9000000 AND lang_id = 2",
+                  "(room = 2 OR room = 4) AND lang_id = 1"):
+        search, cursor = paginated_search(
+            validate_search_sql(f"SELECT * FROM unit_search_sorting WHERE {where} {STATUS} LIMIT 5").sql)
+        served, expected = [], []
+        rows = snapshot.search(search)
+        while rows:  # Every page from the projection...
+            served.extend(rows)
+            cursor.advance(rows)
+            if cursor.exhausted:
+                break
+            rows = snapshot.search(cursor.next_page_sql())
+        live, error = db.execute_query(search.replace("LIMIT 5", "LIMIT 10000"))  # ...vs the filtered table
+        expected = [normalize_images(row) for row in live if is_available_status(row["status_text"])]
+        assert error is None and [r["unit_id"] for r in served] == [r["unit_id"] for r in expected], where
+        assert all(str(r[c]).lower().endswith(IMAGE_EXTENSIONS) for r in served for c in IMAGE_COLUMNS if r[c])
+        print(f"{where}: {len(served)} available units, identical to the database")
+
+    search = validate_search_sql(f"SELECT * FROM unit_search_sorting WHERE room = 3 {STATUS} AND lang_id = 1 LIMIT 5").sql
+    start = time.perf_counter()
+    for _ in range(200):
+        snapshot.search(search)
+    projected_ms = (time.perf_counter() - start) / 200 * 1000
+    start = time.perf_counter()
+    for _ in range(200):
+        [normalize_images(r) for r in db.execute_query(search)[0] if is_available_status(r["status_text"])]
+    live_ms = (time.perf_counter() - start) / 200 * 1000
+    print(f"Projection {projected_ms:.2f} ms vs database + per-row cleanup {live_ms:.2f} ms per search")
+
+
+class _StringNumbersDB:
+    """A driver that hands numeric columns back as strings (VARCHAR prices, DECIMAL as text)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute_query(self, sql, use_cache=True):
+        rows, error = self.db.execute_query(sql, use_cache=use_cache)
+        return [{k: str(v) if k in ("room", "price", "area") else v for k, v in row.items()} for row in rows], error
+
+
+def test_filters_compare_like_the_database():
+    db = _db()
+    for source in (db, _StringNumbersDB(db)):
+        snapshot = AvailableUnitsSnapshot(source)
+        assert snapshot.refresh()
+        for where in ("usage_text = 'apartment' AND lang_id = 1", "category = 'RESIDENTIAL' AND room = 3 AND lang_id = 1",
+                      "usage_text = 'Apartment' AND price < 9000000 AND room >= 2 AND lang_id = 1"):
+            search = validate_search_sql(f"SELECT * FROM unit_search_sorting WHERE {where} {STATUS} LIMIT 5").sql
+            live, error = db.execute_query(search.replace("LIMIT 5", "LIMIT 10000"))
+            expected = [row["unit_id"] for row in live if is_available_status(row["status_text"])]
+            served = [row["unit_id"] for row in snapshot.search(search.replace("LIMIT 5", "LIMIT 10000"))]
+            assert error is None and expected and served == expected, (type(source).__name__, where)
+        print(f"{type(source).__name__}: mixed-case text and numeric filters match the database")
+
+
+if __name__ == "__main__":
+    test_row_helpers()
+    test_projection_rewrite()
+    test_snapshot_matches_database()
+    test_filters_compare_like_the_database()
+    print("All available units tests passed")
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+
+from services.context_packer import pack_context, count_tokens, chunks_for_budget, MAX_RETRIEVED_CHUNKS
+
+
+def _sentences(start, end):
+    return " ".join(f"Policy sentence number {i} about deposits." for i in range(start, end))
+
+
+def test_overlapping_chunks_are_deduped():
+    # Consecutive splitter chunks share their boundary text
+    first = _sentences(0, 20)
+    second = _sentences(15, 35)
+    docs = [(Document(page_content=first), 0.9), (Document(page_content=second), 0.8),
+            (Document(page_content=first), 0.7)]
+
+    context, stats = pack_context(docs, token_budget=10_000)
+
+    print(f"Stats: {stats}")
+    assert stats["duplicates_removed"] == 1
+    assert stats["chunks_packed"] == 2
+    for i in range(35):
+        assert context.count(f"number {i} ") == 1, f"Sentence {i} should appear exactly once"
+
+
+def test_budget_keeps_most_relevant_chunks():
+    docs = [(Document(page_content=f"Low relevance filler {i}. " * 30), 0.1) for i in range(10)]
+    docs.append((Document(page_content="The reservation deposit is refundable within 14 days."), 0.95))
+
+    context, stats = pack_context(docs, token_budget=200)
+
+    print(f"Stats: {stats}")
+    assert context.startswith("Chunk 1:\nThe reservation deposit")
+    assert count_tokens(context) <= 200
+    assert stats["tokens_saved"] > 0
+
+
+def test_retrieval_count_follows_the_budget():
+    assert chunks_for_budget(2000) == 18 and chunks_for_budget(200) == 2
+    assert chunks_for_budget(0) == chunks_for_budget(100_000) == MAX_RETRIEVED_CHUNKS
+
+
+if __name__ == "__main__":
+    test_overlapping_chunks_are_deduped()
+    test_budget_keeps_most_relevant_chunks()
+    test_retrieval_count_follows_the_budget()
+    print("✅ PASS")
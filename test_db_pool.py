@@ -0,0 +1,92 @@
+import sys
+import os
+import sqlite3
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.db_pool import ConnectionPool, PoolTimeout
+
+
+def _connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def _ping(connection):
+    connection.execute("SELECT 1")
+
+
+def test_burst_waits_instead_of_failing():
+    pool = ConnectionPool(_connect, _ping, min_size=0, max_size=3, wait_timeout=5)
+    errors = []
+
+    def query():
+        try:
+            with pool.connection() as connection:
+                connection.execute("SELECT 1")
+                time.sleep(0.05)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=query) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    print(f"Burst of 12 on 3 connections: {stats}")
+    assert not errors, errors
+    assert stats["created_total"] == 3 and stats["idle"] == 3 and stats["in_use"] == 0
+
+
+def test_timeout_and_bounded_queue():
+    pool = ConnectionPool(_connect, _ping, min_size=0, max_size=1, wait_timeout=0.1, max_waiters=0)
+    held = pool.acquire()
+    start = time.monotonic()
+    try:
+        pool.acquire()
+        raise AssertionError("Pool at max size with a full queue must fail fast")
+    except PoolTimeout as e:
+        print(f"Rejected: {e}")
+    assert time.monotonic() - start < 0.05
+
+    pool.max_waiters = 5
+    try:
+        pool.acquire()
+        raise AssertionError("Waiter must time out")
+    except PoolTimeout:
+        pass
+    assert pool.stats()["timeouts_total"] == 2
+    pool.release(held)
+    assert pool.acquire() is held
+
+
+def test_dead_connection_replaced_on_checkout():
+    pool = ConnectionPool(_connect, _ping, min_size=0, max_size=2, validate_after=0)
+    first = pool.acquire()
+    pool.release(first)
+    first.close()  # The server dropped it while idle
+    second = pool.acquire()
+    assert second is not first
+    second.execute("SELECT 1")
+    pool.release(second)
+    assert pool.stats()["discarded_total"] == 1 and pool.stats()["size"] == 1
+
+
+def test_keepalive_refills_and_recycles():
+    pool = ConnectionPool(_connect, _ping, min_size=2, max_size=4, keepalive_interval=0, max_lifetime=0.05)
+    pool.maintain()
+    assert pool.stats()["idle"] == 2
+    time.sleep(0.06)
+    pool.maintain()  # Both were too old: retired and replaced
+    stats = pool.stats()
+    assert stats["idle"] == 2 and stats["created_total"] == 4 and stats["discarded_total"] == 2
+    pool.close()
+
+
+if __name__ == "__main__":
+    test_burst_waits_instead_of_failing()
+    test_timeout_and_bounded_queue()
+    test_dead_connection_replaced_on_checkout()
+    test_keepalive_refills_and_recycles()
+    print("All DB pool tests passed")
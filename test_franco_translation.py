@@ -0,0 +1,56 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import language_service
+from services.cache_service import translation_cache
+
+
+def _fake_translate(calls):
+    def translate(text, source_lang, target_lang):
+        calls.append(text)
+        time.sleep(0.2)  # LLM latency
+        return f"franco({text})"
+    return translate
+
+
+def test_segments_are_deduped_skipped_and_parallel():
+    translation_cache.clear()
+    calls = []
+    original = language_service.translate_text_logic
+    language_service.translate_text_logic = _fake_translate(calls)
+    try:
+        segments = ["لقيت 3 وحدات", "\n\n", "Property ID: 12", "\n\n", "السعر 2 مليون\n", "\n\n", "لقيت 3 وحدات"]
+        start = time.time()
+        result = language_service.translate_segments(segments, 'ar', 'franco')
+        elapsed = time.time() - start
+    finally:
+        language_service.translate_text_logic = original
+
+    print(f"Calls: {calls} | {elapsed:.2f}s")
+    assert sorted(calls) == sorted(["لقيت 3 وحدات", "السعر 2 مليون"]), "Latin and duplicate segments must be skipped"
+    assert elapsed < 0.35, "Segments must be translated concurrently"
+    assert result[0] == result[6] == "franco(لقيت 3 وحدات)"
+    assert result[2] == "Property ID: 12"
+    assert result[4] == "franco(السعر 2 مليون)\n", "Surrounding whitespace must be kept"
+
+
+def test_cached_segments_skip_the_llm():
+    calls = []
+    original = language_service.translate_text_logic
+    language_service.translate_text_logic = _fake_translate(calls)
+    try:
+        result = language_service.translate_segments(["السعر 2 مليون"], 'ar', 'franco')
+    finally:
+        language_service.translate_text_logic = original
+
+    print(f"Cache stats: {translation_cache.stats()}")
+    assert calls == []
+    assert result == ["franco(السعر 2 مليون)"]
+
+
+if __name__ == "__main__":
+    test_segments_are_deduped_skipped_and_parallel()
+    test_cached_segments_skip_the_llm()
+    print("✅ PASS")
@@ -0,0 +1,90 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+from services.rag_service import RAGService
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic tiny vectors; records every text sent to the model."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _chunk(text, source):
+    return Document(page_content=text, metadata={"section": "Test", "source_file": source})
+
+
+def test_only_new_chunks_are_embedded():
+    original_path = settings.rag_db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.rag_db_path = os.path.join(tmp_dir, "rag_db")
+        try:
+            service = RAGService()
+            service.embeddings = CountingEmbeddings()
+
+            service.embed_and_store([_chunk("deposit rules", "a.txt"), _chunk("refund rules", "a.txt")])
+            assert len(service.embeddings.embedded) == 2
+
+            # Add a new file, drop one chunk, keep one unchanged
+            service.embeddings.embedded.clear()
+            service.embed_and_store([_chunk("deposit rules", "a.txt"), _chunk("new policy", "b.pdf")])
+
+            stored = service.vectordb.get()
+            print(f"Embedded on second sync: {service.embeddings.embedded} | Stored: {stored['documents']}")
+            assert service.embeddings.embedded == ["new policy"]
+            assert sorted(stored["documents"]) == ["deposit rules", "new policy"]
+        finally:
+            settings.rag_db_path = original_path
+
+
+def test_adding_one_file_keeps_the_others():
+    original_path = settings.rag_db_path
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.rag_db_path = os.path.join(tmp_dir, "rag_db")
+        try:
+            service = RAGService()
+            service.embeddings = CountingEmbeddings()
+            service.embed_and_store([_chunk("deposit rules", "a.txt"), _chunk("refund rules", "b.txt")])
+
+            # python ingest_rag.py data/new_policy.txt
+            new_file = os.path.join(tmp_dir, "new_policy.txt")
+            with open(new_file, "w", encoding="utf-8") as f:
+                f.write("Reservation policy\nA unit is held for 48 hours after the deposit is paid.\n")
+            service.embeddings.embedded.clear()
+            service.prepare_rag_from_files([new_file], only_these=True)
+
+            stored = service.vectordb.get()
+            sources = sorted({metadata["source_file"] for metadata in stored["metadatas"]})
+            print(f"Sources after adding one file: {sources}")
+            assert sources == ["a.txt", "b.txt", "new_policy.txt"]
+            assert "deposit rules" in stored["documents"] and "refund rules" in stored["documents"]
+            assert service.embeddings.embedded and "deposit rules" not in service.embeddings.embedded
+
+            # A whole-corpus sync still removes files that are gone
+            service.prepare_rag_from_files([new_file])
+            assert {metadata["source_file"] for metadata in service.vectordb.get()["metadatas"]} == {"new_policy.txt"}
+        finally:
+            settings.rag_db_path = original_path
+
+
+if __name__ == "__main__":
+    test_only_new_chunks_are_embedded()
+    test_adding_one_file_keeps_the_others()
+    print("✅ PASS")
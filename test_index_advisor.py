@@ -0,0 +1,61 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+from services.slow_query_log import parse_predicates, fingerprint, slow_query_log
+import index_advisor
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_index_advisor.db")
+LOG_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_slow_queries.jsonl")
+STATUS = "AND LOWER(status_text) NOT IN ('reserved', 'sold', 'locked')"
+
+
+def test_predicates_and_shapes():
+    table, predicates = parse_predicates(
+        "SELECT * FROM unit_search_sorting WHERE room = 3 AND lang_id = 1 AND price BETWEEN 1 AND 5000000 "
+        "AND region_text LIKE '%Cairo%' AND compound_name LIKE 'Mad%' " + STATUS + " LIMIT 5;"
+    )
+    kinds = [(p.column, p.kind) for p in predicates]
+    print(kinds)
+    assert table == "unit_search_sorting"
+    assert kinds == [("room", "eq"), ("lang_id", "eq"), ("price", "range"), ("region_text", "like_infix"),
+                     ("compound_name", "range"), ("status_text", "function")]
+    _, predicates = parse_predicates("SELECT * FROM t WHERE (room = 3 OR room = 4) AND lang_id = 2")
+    assert [p.kind for p in predicates] == ["or", "eq"]
+    assert fingerprint("SELECT * FROM t WHERE room = 3 AND x IN ('a', 'b')")[0] == \
+        fingerprint("select *  from t where room = 4 and x in ('c')")[0]
+
+
+def test_log_to_recommendation():
+    generate_inventory(DB_PATH, n_units=2000, seed=5)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    settings.enable_sql_cache = False
+    db = DatabaseService()
+    if os.path.exists(LOG_PATH):
+        os.remove(LOG_PATH)
+    slow_query_log.path, slow_query_log.threshold_ms = LOG_PATH, 0
+
+    for region, price in (("New Cairo", 9000000), ("Madinaty", 6000000), ("North Coast", 12000000)):
+        db.execute_query(f"SELECT * FROM unit_search_sorting WHERE lang_id = 1 AND region_text = '{region}' "
+                         f"AND price < {price} {STATUS} LIMIT 5")
+    db.execute_query(f"SELECT * FROM unit_search_sorting WHERE room = 3 AND lang_id = 1 {STATUS} LIMIT 5")
+    slow_query_log.path = ""
+
+    groups = index_advisor.group_queries(index_advisor.load_entries(LOG_PATH))
+    assert len(groups) == 2 and all(g["plan"] is not None for g in groups), "One EXPLAIN per shape"
+    recommendations = index_advisor.recommend(groups, db)
+    index_advisor.print_report(groups, recommendations, top=5)
+    # (lang_id, room) is served by the existing (lang_id, room, price) index
+    assert [r["columns"] for r in recommendations] == [["lang_id", "region_text", "price"]]
+    assert recommendations[0]["executions"] == 3 and recommendations[0]["rows_saved"] > 3 * 1000
+    assert index_advisor.unindexable_conditions(groups)[0][:3] == ("function", "status_text", 4)
+
+
+if __name__ == "__main__":
+    test_predicates_and_shapes()
+    test_log_to_recommendation()
+    print("All index advisor tests passed")
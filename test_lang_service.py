@@ -1,6 +1,5 @@
 import sys
 import os
-import json
 from services.language_service import detect_language
 
 def test_language_detection():
@@ -17,9 +16,8 @@ def test_language_detection():
     ]
     
     for text, expected in test_cases:
-        result_json = detect_language(text)
-        result = json.loads(result_json) if isinstance(result_json, str) else result_json
-        detected = result.get('language')
+        result = detect_language(text)
+        detected = result.language
         
         # Mapping for validation if needed (though service should return ar/franco/en now)
         print(f"Input: '{text}' -> Detected: {detected} | Expected: {expected}")
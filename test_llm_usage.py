@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.tools import tool
+
+from config import settings
+from fake_llm import FakeChatModel
+from services.llm_usage_service import llm_usage, llm_usage_handler, LLMBudgetExceeded
+from services.metrics_service import metrics
+from services.stage_scheduler import stage_scheduler
+
+
+def _model():
+    return FakeChatModel(callbacks=[llm_usage_handler()])
+
+
+def test_usage_by_call_site():
+    model = _model()
+
+    @metrics.timed("sql_generation")
+    def generate_sql():
+        return model.invoke("You are a SQL generator. User request: 3 rooms").content
+
+    @tool
+    def call_chat_agent(user_request: str) -> str:
+        """Chat tool without a stage of its own."""
+        return model.invoke(f"Answer: {user_request}").content
+
+    settings.max_llm_calls_per_turn, settings.max_llm_tokens_per_turn = 10, 0
+    with llm_usage.turn("s1") as usage:
+        generate_sql()
+        # Concurrent stages count against the same turn
+        stage_scheduler.run({
+            "guard": lambda: model.invoke("You are a security filter").content,
+            "language": metrics.timed("language_detection")(lambda: model.invoke("language detection system").content),
+        })
+        call_chat_agent.invoke({"user_request": "hello"}, config={"callbacks": [llm_usage_handler()]})
+
+    summary = usage.summary()
+    print(summary)
+    assert summary["calls"] == 4
+    assert summary["input_tokens"] > 0 and summary["output_tokens"] > 0
+    assert set(summary["by_call_site"]) == {"sql_generation", "language_detection", "other", "tool:call_chat_agent"}
+    assert llm_usage.session_totals["s1"]["calls"] == 4
+    assert 'eshtri_chatbot_llm_calls_total{call_site="sql_generation"}' in metrics.render()
+
+
+def test_budget_is_enforced():
+    model = _model()
+    settings.max_llm_calls_per_turn, settings.max_llm_tokens_per_turn = 2, 0
+    try:
+        with llm_usage.turn("s2") as usage:
+            model.invoke("hi")
+            model.invoke("hi")
+            try:
+                model.invoke("hi")
+                raise AssertionError("Third call must exceed the budget")
+            except LLMBudgetExceeded as e:
+                print(f"Blocked: {e}")
+        assert usage.calls == 2 and usage.budget_exceeded
+        # Outside a turn (scripts, warmup) nothing is limited
+        model.invoke("hi")
+    finally:
+        settings.max_llm_calls_per_turn, settings.max_llm_tokens_per_turn = 12, 40000
+
+
+if __name__ == "__main__":
+    test_usage_by_call_site()
+    test_budget_is_enforced()
+    print("All LLM usage tests passed")
@@ -0,0 +1,80 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_local.db")
+
+
+def _local_db_service():
+    settings.db_backend = "sqlite"
+    settings.sqlite_db_path = DB_PATH
+    return DatabaseService()
+
+
+def test_generator_is_seeded():
+    generate_inventory(DB_PATH, n_units=1000, seed=7)
+    first, _ = _local_db_service().execute_query("SELECT unit_id, price, region_text FROM unit_search_sorting LIMIT 20")
+    stats = generate_inventory(DB_PATH, n_units=1000, seed=7)
+    second, _ = _local_db_service().execute_query("SELECT unit_id, price, region_text FROM unit_search_sorting LIMIT 20")
+    print(f"Rows: {stats['rows']}")
+    assert first == second, "Same seed must produce the same inventory"
+    assert stats["rows"]["unit_search_sorting"] == 2000, "One row per language"
+    assert 0 < stats["rows"]["promo"] < 1000
+
+
+def test_agent_sql_runs_against_sqlite():
+    db = _local_db_service()
+    sql = ("SELECT * FROM unit_search_sorting WHERE room = 3 AND lang_id = 2 "
+           "AND LOWER(status_text) NOT IN ('reserved', 'sold', 'locked', 'محجوزة', 'مباعة') LIMIT 5;")
+    rows, error = db.execute_query(sql)
+    print(f"Arabic 3-room units: {[(r['unit_id'], r['status_text'], r['region_text']) for r in rows]}")
+    assert error is None and len(rows) == 5
+    assert all(r["room"] == 3 and r["status_text"] not in ("محجوزة", "مباعة") for r in rows)
+
+
+def test_mysql_statements_and_promo_tables():
+    db = _local_db_service()
+    columns, error = db.execute_query("SHOW COLUMNS FROM `unit_search_sorting`")
+    assert error is None and any(c["Field"] == "room" for c in columns)
+
+    rows, error = db.execute_query(
+        "SELECT p.unt_id, pt.title, pt.text FROM promo p "
+        "LEFT JOIN promo_text pt ON p.prom_id = pt.prom_id AND pt.lang_id = 1 LIMIT 5"
+    )
+    print(f"Promos: {rows}")
+    assert error is None and rows and all(r["title"] for r in rows)
+
+    rows, error = db.execute_query("SELECT * FROM no_such_table")
+    assert rows == [] and "no_such_table" in error
+
+
+def test_repositories_on_local_db():
+    from services.repositories import UnitRepository, PromoRepository
+    db = _local_db_service()
+    promo_rows, _ = db.execute_query("SELECT unt_id FROM promo LIMIT 1")
+    unit_id = promo_rows[0]["unt_id"]
+
+    units = UnitRepository(db)
+    price = units.price(unit_id)
+    promo = PromoRepository(db).for_unit(unit_id)
+    print(f"Unit {unit_id}: {price.to_dict()} | {promo}")
+    assert price.price > 0 and price.source_table in ("unit_search_engine", "unit_search_engine2", "bi_unit")
+    assert promo is not None and promo.description
+
+    tables = units.rows_by_table(unit_id)
+    assert "unit_search_sorting" in tables and "promo" in tables
+    assert units.rows_by_table(999999999) == {}
+    assert units.price(999999999) is None
+
+
+if __name__ == "__main__":
+    test_generator_is_seeded()
+    test_agent_sql_runs_against_sqlite()
+    test_mysql_statements_and_promo_tables()
+    test_repositories_on_local_db()
+    print("✅ PASS")
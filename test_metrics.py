@@ -0,0 +1,55 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.metrics_service import MetricsRegistry
+
+
+def test_stage_histogram_render():
+    registry = MetricsRegistry()
+    registry.observe("sql_generation", 0.003)
+    registry.observe("sql_generation", 0.2)
+
+    @registry.timed("sanitize")
+    def sanitize(text):
+        return text.strip()
+
+    assert sanitize("  hi ") == "hi"
+    with registry.stage("agent_invoke"):
+        time.sleep(0.002)
+
+    snapshot = registry.stage_seconds.snapshot()
+    assert snapshot["sql_generation"]["count"] == 2
+    assert snapshot["sql_generation"]["buckets"][0.005] == 1
+    assert snapshot["sql_generation"]["buckets"][0.25] == 2
+    assert snapshot["agent_invoke"]["sum"] >= 0.002
+
+    text = registry.render()
+    print(text)
+    name = "eshtri_chatbot_stage_duration_seconds"
+    assert f"# TYPE {name} histogram" in text
+    assert f'{name}_bucket{{stage="sql_generation",le="0.005"}} 1' in text
+    assert f'{name}_bucket{{stage="sql_generation",le="+Inf"}} 2' in text
+    assert f'{name}_count{{stage="sanitize"}} 1' in text
+
+
+def test_collectors():
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: [
+        ("cache_hit_ratio", "Hit ratio.", "gauge", [({"cache": 're"sponse'}, 0.5)]),
+    ])
+
+    def broken():
+        raise RuntimeError("pool gone")
+
+    registry.register_collector(broken)
+    text = registry.render()
+    assert "# TYPE eshtri_chatbot_cache_hit_ratio gauge" in text
+    assert 'eshtri_chatbot_cache_hit_ratio{cache="re\\"sponse"} 0.5' in text, "Label values are escaped"
+
+
+if __name__ == "__main__":
+    test_stage_histogram_render()
+    test_collectors()
+    print("All metrics tests passed")
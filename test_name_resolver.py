@@ -0,0 +1,90 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_name_resolver.db")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", DB_PATH)
+
+from config import settings
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+from services.name_resolver import NameResolver, normalize
+from services.sql_validator import validate_search_sql
+
+REGIONS = [("New Cairo", 1), ("القاهرة الجديدة", 1), ("Sheikh Zayed", 2), ("الشيخ زايد", 2),
+           ("6th of October", 3), ("السادس من أكتوبر", 3), ("North Coast", 6), ("الساحل الشمالي", 6),
+           ("Madinaty", 8), ("مدينتي", 8), ("New Capital", 9), ("العاصمة الإدارية", 9)]
+COMPOUNDS = [("Mountain View iCity", 40), ("ماونتن فيو آي سيتي", 40), ("Palm Hills October", 41),
+             ("بالم هيلز أكتوبر", 41), ("Sodic West", 42)]
+
+
+def _resolver():
+    resolver = NameResolver()
+    resolver.load({"region_text": REGIONS, "compound_name": COMPOUNDS})
+    return resolver
+
+
+def test_normalize():
+    assert normalize("  El-Sa7el  ") == normalize("sahel") == "sahel"
+    assert normalize("العاصمة الإدارية") == normalize("العاصمه الاداريه")
+    assert normalize("أكتوبر") == normalize("اكتوبر") and normalize("مدينتى") == normalize("مدينتي")
+    assert normalize("Café 13") == "cafe 13"
+
+
+def test_resolve_variants():
+    resolver = _resolver()
+    cases = {
+        "New Cairo": [1], "new  cairo": [1], "القاهره الجديده": [1], "el tagamo3": [1], "التجمع الخامس": [1],
+        "Shiekh Zayed": [2], "zayed": [2], "madinty": [8], "Madinati": [8], "sa7el": [6],
+        "العاصمة": [9], "new capitol": [9], "october": [3],
+    }
+    for mention, expected in cases.items():
+        assert resolver.resolve("reg_id", mention) == expected, (mention, resolver.resolve("reg_id", mention))
+    assert resolver.resolve("comp_id", "mountain view") == [40] and resolver.resolve("comp_id", "palm hils") == [41]
+    assert resolver.resolve("reg_id", "Hurghada") == [] and resolver.resolve("comp_id", "zz") == []
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        resolver.resolve("reg_id", "Shiekh Zayed")
+    per_call_us = (time.perf_counter() - start) / 10000 * 1e6
+    print(f"Memoized resolve: {per_call_us:.1f} us")
+    assert per_call_us < 100
+
+
+def test_like_patterns():
+    resolver = _resolver()
+    assert resolver.ids("region_text", "%cairo%", like=True) == [1]
+    assert resolver.ids("region_text", "New%", like=True) == [1, 9]
+    assert resolver.ids("region_text", "%Madinati%", like=True) == [8], "Typo falls back to the fuzzy match"
+    assert resolver.ids("region_text", "%Madinati%", like=True, fuzzy=False) == []
+    assert resolver.ids("developer_name", "%Emaar%", like=True) is None, "No developer names loaded"
+
+
+def test_misspelled_search_finds_units():
+    generate_inventory(DB_PATH, n_units=400, seed=8)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    db = DatabaseService()
+    resolver = NameResolver(db)
+
+    typed = "SELECT * FROM unit_search_sorting WHERE region_text LIKE '%Shiekh Zayid%' AND lang_id = 1 LIMIT 5"
+    assert not db.execute_query(typed)[0], "The raw LIKE misses the misspelling"
+    check = validate_search_sql(typed, lang_id=1, lookup=resolver)
+    rows, error = db.execute_query(check.sql)
+    print(check.sql[check.sql.index("WHERE"):], len(rows))
+    assert error is None and rows and all(row["region_text"] == "Sheikh Zayed" for row in rows)
+
+    check = validate_search_sql("SELECT * FROM unit_search_sorting WHERE region_text LIKE '%السخنه%' AND lang_id = 2",
+                                lang_id=2, lookup=resolver)
+    rows, _ = db.execute_query(check.sql)
+    assert rows and all(row["region_text"] == "العين السخنة" for row in rows)
+
+
+if __name__ == "__main__":
+    test_normalize()
+    test_resolve_variants()
+    test_like_patterns()
+    test_misspelled_search_finds_units()
+    print("All name resolver tests passed")
@@ -0,0 +1,60 @@
+import sys
+import os
+import re
+import json
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_projections.db")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", DB_PATH)
+
+from config import settings, COLUMNS, PROJECTIONS, SEARCH_COLUMNS, projection
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService, safe_serialize
+from services.result_types import SqlResult
+from services.sql_validator import validate_search_sql
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_projections_cover_their_consumers():
+    for name, columns in PROJECTIONS.items():
+        assert set(columns) <= set(COLUMNS) and len(set(columns)) == len(columns), name
+    assert projection("carousel", "detail") == PROJECTIONS["detail"]
+    assert set(PROJECTIONS["detail"]) | set(PROJECTIONS["llm_summary"]) <= set(SEARCH_COLUMNS)
+
+    # Every field the carousel and detail builders read from a search row is selected
+    with open(os.path.join(ROOT, "services", "chat_service.py"), encoding="utf-8") as f:
+        source = f.read()
+    carousel = set(re.findall(r"prop\.get\('(\w+)'", source))
+    detail = set(re.findall(r"unit_data\.get\('(\w+)'", source))
+    print(f"Carousel reads {len(carousel)} columns, detail view {len(detail)}")
+    assert carousel <= set(PROJECTIONS["carousel"]), carousel - set(PROJECTIONS["carousel"])
+    assert detail <= set(PROJECTIONS["detail"]), detail - set(PROJECTIONS["detail"])
+
+
+def test_bytes_saved():
+    generate_inventory(DB_PATH, n_units=300, seed=6)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    db = DatabaseService()
+    generated = "SELECT * FROM unit_search_sorting WHERE lang_id = 1 LIMIT 5"
+    full, _ = db.execute_query(generated)
+    searched, _ = db.execute_query(validate_search_sql(generated, lang_id=1).sql)
+    result = SqlResult(rows=searched)
+    llm = result.to_json(columns=PROJECTIONS["llm_summary"])
+
+    def size(rows):
+        return len(json.dumps(rows, default=safe_serialize, ensure_ascii=False).encode())
+
+    print(f"5 rows: SELECT * {size(full)} B ({len(full[0])} columns), search projection {size(searched)} B "
+          f"({len(searched[0])} columns), LLM JSON {len(llm.encode())} B")
+    assert set(searched[0]) == set(SEARCH_COLUMNS) and size(searched) < size(full)
+    assert set(json.loads(llm)[0]) == set(PROJECTIONS["llm_summary"]) and len(llm.encode()) < size(searched) * 0.7
+    assert SqlResult(error="boom").to_records(columns=PROJECTIONS["llm_summary"]) == [{"error": "boom"}]
+
+
+if __name__ == "__main__":
+    test_projections_cover_their_consumers()
+    test_bytes_saved()
+    print("All projection tests passed")
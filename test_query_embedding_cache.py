@@ -0,0 +1,44 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.cache_service import EmbeddingCache
+
+
+def test_repeat_query_skips_embedding():
+    calls = []
+
+    def fake_embed(text):
+        calls.append(text)
+        return [0.1] * 768
+
+    cache = EmbeddingCache(max_bytes=1024 * 1024)
+    cache.get_or_compute("what projects are available", fake_embed)
+    cache.get_or_compute("  what   projects are available ", fake_embed)
+
+    stats = cache.stats()
+    print(f"Embed calls: {len(calls)} | Stats: {stats}")
+    assert len(calls) == 1, "Whitespace variants of the same query should hit the cache"
+    assert stats['hits'] == 1 and stats['misses'] == 1
+
+
+def test_memory_bound_evicts_lru():
+    vector = [0.0] * 768  # 3072 bytes as float32
+    cache = EmbeddingCache(max_bytes=3 * 3072)
+
+    cache.set("a", vector)
+    cache.set("b", vector)
+    cache.set("c", vector)
+    cache.get("a")  # "a" becomes most recently used
+    cache.set("d", vector)  # must evict "b", the least recently used
+
+    print(f"Keys after eviction: {list(cache.cache.keys())}")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.current_bytes <= cache.max_bytes
+
+
+if __name__ == "__main__":
+    test_repeat_query_skips_embedding()
+    test_memory_bound_evicts_lru()
+    print("✅ PASS")
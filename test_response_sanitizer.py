@@ -0,0 +1,87 @@
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.response_sanitizer import sanitize_response
+from benchmark_sanitizer import legacy_clean_image_sections, sample_responses
+
+# Outputs of the former ChatService._clean_image_sections, quirks included
+GOLDEN = {
+    "image_and_video_sections": (
+        "Here are the details of the unit you asked about:- Area: 165 m²\n- Bedrooms: 3\n"
+        "- Price: 4,250,000 EGPYou can also see it here before visiting.\n"
+        "Let me know if you want the payment plan!"
+    ),
+    "echoed_carousel": "I found 5 properties for you. The frontend shows them below.",
+    "payment_plan": "Here is the payment plan for unit 53198262:\n- Down payment: 10%\n- 8 years installments",
+    "unit_detail_in_middle": "Here are the full details:\n\n\n\nThe unit has 3 bedrooms and a private garden.",
+    "leftover_json_rows": "I found these units:\n\nAsk me for details about any of them.",
+}
+
+PROSE_SNIPPETS = [
+    "The deposit is refundable within 14 days.",
+    "يجب دفع مقدم الحجز خلال 48 ساعة.",
+    "La2eet 3 units ashanak.",
+    "#### Images:",
+    "Images:",
+    "![Unit Image](https://cdn.example.com/u.jpg)",
+    "Compound Image: https://cdn.example.com/c.jpg",
+    "Developer Logo: !View Developer Logo",
+    "Video Tour: [Watch Video](https://www.youtube.com/watch?v=x)",
+    "see https://youtu.be/abc",
+    "[View Video](https://vimeo.com/1)",
+    "watch video here",
+    '[{"unit_id": 7, "price": 1}]',
+    "", "\n",
+]
+UNIT_DETAIL = '###UNIT_DETAIL###{"unit_id": 7, "video_url": "https://www.youtube.com/watch?v=x"}###END_DETAIL###'
+TRAILING = ['<<PROPERTY_CAROUSEL_DATA>>{"count": 1, "items": [{"unit_id": 7}]}', '<<PAYMENT_PLAN_DATA>>{"unit_id": 7}']
+SEPARATORS = ["\n", "\n\n", "\n\n\n", " "]
+
+
+def _prose(rng):
+    return "".join(rng.choice(PROSE_SNIPPETS) + rng.choice(SEPARATORS) for _ in range(rng.randint(1, 6)))
+
+
+def test_golden_outputs():
+    samples = sample_responses()
+    for name, expected in GOLDEN.items():
+        assert sanitize_response(samples[name]) == expected, f"{name} changed"
+    print(f"Golden outputs unchanged for {len(GOLDEN)} responses")
+
+
+def test_matches_legacy_on_random_responses():
+    # Markers on their own line after a line of prose, as the chat service lays them out
+    rng = random.Random(42)
+    for _ in range(3000):
+        text = _prose(rng)
+        if rng.random() < 0.5:
+            text = text.rstrip(" ") + "\nHere are the details:\n" + UNIT_DETAIL + rng.choice(SEPARATORS) + _prose(rng)
+        if rng.random() < 0.5:
+            text = text.rstrip(" ") + "\nHere you go:" + rng.choice(["\n", "\n\n\n"]) + rng.choice(TRAILING) + rng.choice(SEPARATORS) + _prose(rng)
+        assert sanitize_response(text) == legacy_clean_image_sections(text), repr(text)
+    print("Matches the legacy sanitizer on 3000 random responses")
+
+
+def test_mid_line_markers_match_legacy():
+    rng = random.Random(7)
+    for _ in range(1000):
+        text = _prose(rng) + "Results: " + rng.choice([UNIT_DETAIL] + TRAILING) + " " + _prose(rng)
+        assert sanitize_response(text) == legacy_clean_image_sections(text), repr(text)
+    print("Mid-line markers match the legacy sanitizer")
+
+
+def test_marker_payload_never_leaks():
+    # The old passes could glue a video URL onto the marker and leave part of its JSON behind
+    text = 'see https://youtu.be/abc\n\n\nCompound Image: https://cdn.example.com/c.jpg\n\n\n<<PAYMENT_PLAN_DATA>>{"unit_id": 7}\n'
+    print(f"Legacy: {legacy_clean_image_sections(text)!r} | New: {sanitize_response(text)!r}")
+    assert sanitize_response(text) == "see"
+
+
+if __name__ == "__main__":
+    test_golden_outputs()
+    test_matches_legacy_on_random_responses()
+    test_mid_line_markers_match_legacy()
+    test_marker_payload_never_leaks()
+    print("✅ PASS")
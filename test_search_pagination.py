@@ -0,0 +1,97 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_pagination.db")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", DB_PATH)
+
+from config import settings
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+from services.search_pagination import paginated_search, is_show_more_request
+
+SEARCH = ("SELECT * FROM unit_search_sorting WHERE room = 3 AND lang_id = 1 "
+          "AND LOWER(status_text) NOT IN ('reserved', 'sold', 'locked') LIMIT 5;")
+
+
+def _db():
+    generate_inventory(DB_PATH, n_units=400, seed=11)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    return DatabaseService()
+
+
+def test_show_more_detection():
+    for message in ["show me more", "More please!", "next", "المزيد", "وريني كمان", "fi kaman?", "el ba2y"]:
+        assert is_show_more_request(message), message
+    for message in ["Show more.", "ok more please", "لو سمحت المزيد", "Other options?", "aktar"]:
+        assert is_show_more_request(message), message
+    for message in ["show me more 3 bedroom villas in Zayed", "tell me more about unit 100045",
+                    "I want an apartment in Madinaty", "4 rooms", "more details", "more info", "tafaseel aktr",
+                    "ana 3ayez kaman villa", "عايز كمان فيلا في الشيخ زايد", "other options in zayed",
+                    "3ayez 7aga aktar", "next step"]:
+        assert not is_show_more_request(message), message
+
+
+def test_pages_match_offset_pagination():
+    db = _db()
+    sql, cursor = paginated_search(SEARCH)
+    print(f"First page: {sql}")
+    assert cursor is not None and sql.endswith("ORDER BY sorting_id ASC, unit_id ASC LIMIT 5")
+
+    expected, _ = db.execute_query(sql.replace("LIMIT 5", "LIMIT 1000"))
+    seen, rows = [], db.execute_query(sql)[0]
+    while rows:
+        seen.extend(row["unit_id"] for row in rows)
+        cursor.advance(rows)
+        if cursor.exhausted:
+            break
+        rows, error = db.execute_query(cursor.next_page_sql())
+        assert error is None, error
+    print(f"Paged through {len(seen)} units in {len(seen) // 5 + 1} pages")
+    assert seen == [row["unit_id"] for row in expected]
+    assert "OFFSET" not in cursor.next_page_sql()
+
+
+def test_custom_order_and_unsupported_sql():
+    db = _db()
+    sql, cursor = paginated_search("SELECT * FROM unit_search_sorting WHERE lang_id = 2 ORDER BY price DESC LIMIT 5")
+    assert cursor.order == (("price", True), ("unit_id", True))
+    first, _ = db.execute_query(sql)
+    cursor.advance(first)
+    second, _ = db.execute_query(cursor.next_page_sql())
+    assert len(second) == 5 and second[0]["price"] <= first[-1]["price"]
+    assert not {row["unit_id"] for row in first} & {row["unit_id"] for row in second}
+
+    grouped = "SELECT * FROM unit_search_sorting WHERE region_text IN (SELECT region_text FROM bi_unit) LIMIT 5"
+    assert paginated_search(grouped) == (grouped, None)
+
+
+def test_show_more_results_without_llm():
+    _db()
+    from services.agent_service import SessionMemory, show_more_results
+    from services.database_service import db_service
+
+    db_service.result_cache.clear()
+    memory = SessionMemory()
+    memory.detected_language = "en"
+    assert show_more_results(memory) is None, "Nothing to page before a search"
+
+    sql, memory.search_cursor = paginated_search(SEARCH)
+    first, _ = db_service.execute_query(sql)
+    memory.search_cursor.advance(first)
+    reply = show_more_results(memory)
+    print(f"{reply} {[row['unit_id'] for row in memory.last_results]}")
+    # run_sql also drops "temporary locked"/"unavailable" units, so a page may show fewer than 5
+    assert reply == f"I found {len(memory.last_results)} properties for you." and memory.new_results_fetched
+    assert memory.last_results[0]["unit_id"] > first[-1]["unit_id"] and memory.search_cursor.page == 2
+    assert not memory.search_cursor.exhausted and memory.search_cursor.after[1] >= memory.last_results[-1]["unit_id"]
+
+
+if __name__ == "__main__":
+    test_show_more_detection()
+    test_pages_match_offset_pagination()
+    test_custom_order_and_unsupported_sql()
+    test_show_more_results_without_llm()
+    print("All search pagination tests passed")
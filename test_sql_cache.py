@@ -0,0 +1,63 @@
+import sys
+import os
+import sqlite3
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from services.cache_service import QueryResultCache
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_sql_cache.db")
+SEARCH = ("SELECT * FROM unit_search_sorting WHERE room = 3 AND lang_id = 1 "
+          "AND LOWER(status_text) NOT IN ('reserved', 'sold') LIMIT 5;")
+
+
+def test_canonical_keys():
+    canonical = QueryResultCache.canonicalize
+    assert canonical(SEARCH) == canonical("select *  from UNIT_SEARCH_SORTING\n where ROOM = 3 and lang_id = 1 "
+                                          "and lower(status_text) not in ('reserved', 'sold') limit 5")
+    # Literals keep their case: 'Madinaty' and 'MADINATY' are different searches
+    assert canonical("SELECT * FROM t WHERE region_text = 'Madinaty'") != \
+        canonical("SELECT * FROM t WHERE region_text = 'MADINATY'")
+    cache = QueryResultCache()
+    assert cache.cacheable(canonical(SEARCH))
+    assert not cache.cacheable(canonical("SELECT * FROM t ORDER BY RAND() LIMIT 5"))
+    assert not cache.cacheable(canonical("UPDATE t SET price = 1"))
+    assert cache.cacheable(canonical("SELECT * FROM t WHERE description LIKE '%now()%'"))
+
+
+def test_hits_and_inventory_invalidation():
+    generate_inventory(DB_PATH, n_units=300, seed=3)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    settings.enable_sql_cache, settings.sql_cache_version_interval = True, 0
+    db = DatabaseService()
+
+    first, error = db.execute_query(SEARCH)
+    assert error is None and first
+    first[0]["unit_image"] = "mutated by the caller"
+    second, _ = db.execute_query(SEARCH.lower())
+    print(f"After two identical searches: {db.result_cache.stats()}")
+    assert db.result_cache.hits == 1 and second[0]["unit_image"] != "mutated by the caller"
+
+    # A price update moves MAX(price_update_date): the next lookup goes back to the database
+    connection = sqlite3.connect(DB_PATH)
+    connection.execute("UPDATE unit_search_sorting SET price = 1, price_update_date = '2999-01-01' "
+                       "WHERE unit_id = ?", (second[0]["unit_id"],))
+    connection.commit()
+    connection.close()
+    third, _ = db.execute_query(SEARCH)
+    print(f"After a price update: {db.result_cache.stats()}")
+    assert db.result_cache.invalidations == 1 and db.result_cache.hits == 1
+    assert any(row["price"] == 1 for row in third)
+
+    rows, error = db.execute_query("SELECT unit_id FROM unit_search_sorting WHERE unit_id = %s AND lang_id = %s",
+                                   (third[0]["unit_id"], 1))
+    assert error is None and rows == [{"unit_id": third[0]["unit_id"]}]
+
+
+if __name__ == "__main__":
+    test_canonical_keys()
+    test_hits_and_inventory_invalidation()
+    print("All SQL cache tests passed")
@@ -0,0 +1,98 @@
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_sql_validator.db")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", DB_PATH)
+
+from config import settings, SEARCH_COLUMNS
+from services.local_db import generate_inventory
+from services.database_service import DatabaseService
+from services.sql_validator import validate_search_sql, parse, render
+from services.name_resolver import NameResolver
+from services.search_pagination import paginated_search
+
+STATUS = "AND LOWER(status_text) NOT IN ('reserved', 'sold', 'locked')"
+
+
+def test_rejects_unsafe_sql():
+    for sql in [
+        "DELETE FROM unit_search_sorting WHERE lang_id = 1",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1; DROP TABLE unit_search_sorting",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1 -- AND room = 3",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1 UNION SELECT * FROM users",
+        "SELECT * FROM unit_search_sorting WHERE unit_id IN (SELECT unit_id FROM bi_unit) AND lang_id = 1",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1 AND SLEEP(5) = 0",
+        "SELECT * FROM users WHERE lang_id = 1",
+        "SELECT password FROM unit_search_sorting WHERE lang_id = 1",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1 LIMIT 5 OFFSET 100000",
+        "SELECT * FROM unit_search_sorting WHERE lang_id = 1 INTO OUTFILE '/tmp/x'",
+    ]:
+        check = validate_search_sql(sql, lang_id=1)
+        assert check.error and check.error.startswith("Rejected SQL:"), sql
+    assert validate_search_sql("SELECT * FROM unit_search_sorting WHERE room = 3").error, \
+        "lang_id is required when the caller does not know the language"
+
+
+def test_enforces_limit_language_and_projection():
+    check = validate_search_sql("select * from unit_search_sorting where room = 3 or room = 4 order by rand()", lang_id=2)
+    print(check.sql, check.rewrites)
+    assert check.sql == (f"SELECT {', '.join(SEARCH_COLUMNS)} FROM unit_search_sorting "
+                         f"WHERE (room = 3 OR room = 4) AND lang_id = 2 LIMIT {settings.sql_max_limit}")
+    check = validate_search_sql("SELECT * FROM unit_search_sorting WHERE lang_id = 1 AND price < 5000000 LIMIT 200", lang_id=2)
+    assert "lang_id = 1" not in check.sql and check.sql.endswith("AND lang_id = 2 LIMIT 5")
+
+    # Already valid SQL comes back unchanged
+    assert validate_search_sql(check.sql, lang_id=2).sql == check.sql and not validate_search_sql(check.sql).rewrites
+    sql = f"SELECT unit_id, sorting_id FROM unit_search_sorting WHERE price BETWEEN 1 AND 2 AND NOT (room = 2) AND lang_id = 1 {STATUS} ORDER BY price DESC LIMIT 3"
+    assert render(parse(sql)) == sql
+
+
+def test_exponent_numbers_and_national_strings():
+    check = validate_search_sql("SELECT * FROM unit_search_sorting WHERE price < 3e6 AND area > 1.5E+2 AND lang_id = 1", lang_id=1)
+    assert not check.error and "price < 3e6 AND area > 1.5E+2" in check.sql, check
+    check = validate_search_sql("SELECT * FROM unit_search_sorting WHERE region_text LIKE N'%زايد%' AND lang_id = 2", lang_id=2)
+    assert not check.error and "region_text LIKE '%زايد%'" in check.sql, check
+    assert validate_search_sql("SELECT * FROM unit_search_sorting WHERE lang_id = 1 LIMIT 1e9", lang_id=1).error
+
+
+def test_name_filters_become_id_filters():
+    generate_inventory(DB_PATH, n_units=400, seed=3)
+    settings.db_backend, settings.sqlite_db_path = "sqlite", DB_PATH
+    db = DatabaseService()
+    lookup = NameResolver(db)
+
+    original = f"SELECT * FROM unit_search_sorting WHERE region_text LIKE '%cairo%' AND room >= 2 {STATUS} AND lang_id = 1 LIMIT 5"
+    check = validate_search_sql(original, lang_id=1, lookup=lookup)
+    print(check.sql)
+    assert "region_text" not in check.sql.split("WHERE")[1] and "reg_id IN (" in check.sql
+    rows, error = db.execute_query(check.sql.replace("LIMIT 5", "LIMIT 1000"))
+    expected, _ = db.execute_query(original.replace("LIMIT 5", "LIMIT 1000"))
+    assert error is None and sorted(r["unit_id"] for r in rows) == sorted(r["unit_id"] for r in expected)
+    assert set(rows[0]) == set(SEARCH_COLUMNS)
+
+    # Arabic name while searching English rows: same ID
+    check = validate_search_sql("SELECT * FROM unit_search_sorting WHERE region_text = 'مدينتي' AND lang_id = 1", lang_id=1, lookup=lookup)
+    rows, _ = db.execute_query(check.sql)
+    assert rows and all(row["region_text"] == "Madinaty" for row in rows)
+
+    # Unknown names are left as written
+    unknown = validate_search_sql("SELECT * FROM unit_search_sorting WHERE compound_name LIKE '%Atlantis%' AND lang_id = 1", lang_id=1, lookup=lookup)
+    assert "compound_name LIKE '%Atlantis%'" in unknown.sql
+
+    # The projection and the keyset columns survive pagination
+    sql, cursor = paginated_search(validate_search_sql(original, lang_id=1, lookup=lookup).sql)
+    assert cursor is not None and cursor.columns.startswith("unit_id, lang_id, sorting_id")
+    first, _ = db.execute_query(sql)
+    cursor.advance(first)
+    assert not validate_search_sql(cursor.next_page_sql()).error
+
+
+if __name__ == "__main__":
+    test_rejects_unsafe_sql()
+    test_enforces_limit_language_and_projection()
+    test_exponent_numbers_and_national_strings()
+    test_name_filters_become_id_filters()
+    print("All SQL validator tests passed")
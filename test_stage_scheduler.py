@@ -0,0 +1,130 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+
+from config import settings
+from services.stage_scheduler import StageScheduler
+
+
+def _slow(value, seconds=0.2):
+    def stage():
+        time.sleep(seconds)
+        return value
+    return stage
+
+
+def test_stages_cost_max_not_sum():
+    scheduler = StageScheduler()
+    start = time.time()
+    results = scheduler.run({"guard": _slow("safe"), "language": _slow("en"), "intent": _slow("other")})
+    elapsed = time.time() - start
+
+    print(f"Results: {results} | wall: {elapsed:.2f}s")
+    assert results == {"guard": "safe", "language": "en", "intent": "other"}
+    assert elapsed < 0.4, "Three 0.2s stages should overlap"
+
+
+def test_abort_skips_waiting_for_other_stages():
+    scheduler = StageScheduler()
+    start = time.time()
+    results = scheduler.run(
+        {"guard": _slow({"safe": False}, 0.05), "language": _slow("en", 1.0)},
+        abort_if=lambda name, result: name == "guard" and not result["safe"]
+    )
+    elapsed = time.time() - start
+
+    print(f"Results: {results} | wall: {elapsed:.2f}s")
+    assert "language" not in results
+    assert elapsed < 0.5
+
+
+def test_speculation_hit_and_miss():
+    scheduler = StageScheduler()
+    hit = scheduler.speculate("RAG retrieval", "What documents are needed?", _slow("chunks", 0.05))
+    assert hit.take("what documents are needed") == "chunks"
+
+    miss = scheduler.speculate("RAG retrieval", "Find 3 bedroom units", _slow("chunks", 0.05))
+    assert miss.take("deposit policy") is None
+
+
+def test_running_speculation_does_not_hold_stage_workers():
+    scheduler = StageScheduler(max_workers=2, speculation_workers=1)
+    stuck = [scheduler.speculate("RAG retrieval", f"question {i}", _slow("chunks", 1.0)) for i in range(3)]
+    start = time.time()
+    results = scheduler.run({"guard": _slow("safe", 0.1), "language": _slow("en", 0.1)})
+    elapsed = time.time() - start
+    for speculation in stuck:
+        speculation.cancel()
+
+    print(f"Stages with busy speculation pool: {elapsed:.2f}s")
+    assert results == {"guard": "safe", "language": "en"} and elapsed < 0.5
+    assert stuck[2].future.cancelled(), "Queued speculations are dropped without running"
+
+
+class _KeywordEmbeddings:
+    """One dimension per policy keyword: a typo'd query misses what its correction finds."""
+    KEYWORDS = ("deposit", "refund", "delivery")
+
+    def embed_query(self, text):
+        return [float(text.lower().count(word)) for word in self.KEYWORDS] + [0.1]
+
+
+def _rag_service():
+    from services.rag_service import RAGService
+    from services.vector_index import NumpyVectorIndex
+    texts = ["The deposit policy: 10% deposit holds a unit for 14 days.",
+             "Refund requests are answered within 30 days.", "Delivery dates are set per phase."]
+    service = RAGService()
+    service.embeddings, service.vectordb = _KeywordEmbeddings(), object()
+    service._numpy_index = NumpyVectorIndex([Document(page_content=t) for t in texts],
+                                            [service.embeddings.embed_query(t) for t in texts])
+    llm_calls = []
+
+    def preprocess(query, language=None):  # the LLM normalization, cached like the real one
+        known = service.known_preprocessing(query, language)
+        if known is not None:
+            return known
+        llm_calls.append(query)
+        result = {"preprocessed": "what is the deposit policy", "original": query, "changes_made": ["spelling"], "skipped": False}
+        service.preprocessing_cache[f"{language}:{query}"] = result
+        return result
+
+    service._preprocess_query = preprocess
+    return service, llm_calls
+
+
+def test_rag_prefetch_hit_and_miss_return_the_same_context():
+    engine, settings.rag_search_engine = settings.rag_search_engine, "numpy"
+    min_words, settings.preprocessing_min_words = settings.preprocessing_min_words, 3
+    try:
+        service, llm_calls = _rag_service()
+        scheduler = StageScheduler()
+        query = "eh el depozit polisy bta3tko ya gama3a"  # needs the LLM normalization
+        search = lambda preprocess: service.search(query, k=1, language="franco", token_budget=500, preprocess=preprocess)
+
+        # First time: the normalization is unknown, so the speculation does not search (miss)
+        miss = scheduler.speculate("RAG retrieval", f"franco:{query}", lambda: search(False), exact=True)
+        assert miss.take(f"franco:{query}") is None
+        full = search(True)
+        assert llm_calls == [query] and "deposit policy" in full
+
+        # Asked again: the cached normalization lets the speculation reproduce the full search
+        hit = scheduler.speculate("RAG retrieval", f"franco:{query}", lambda: search(False), exact=True)
+        assert hit.take(f"franco:{query}") == full == search(True) and llm_calls == [query]
+        assert scheduler.speculate("RAG retrieval", f"franco:{query}", lambda: search(False),
+                                   exact=True).take(f"franco:{query.upper()}") is None
+        print(f"Prefetch hit and full search agree: {full!r}")
+    finally:
+        settings.rag_search_engine, settings.preprocessing_min_words = engine, min_words
+
+
+if __name__ == "__main__":
+    test_stages_cost_max_not_sum()
+    test_abort_skips_waiting_for_other_stages()
+    test_speculation_hit_and_miss()
+    test_running_speculation_does_not_hold_stage_workers()
+    test_rag_prefetch_hit_and_miss_return_the_same_context()
+    print("✅ PASS")
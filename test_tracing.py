@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.tracing_service import Tracer
+from services.metrics_service import MetricsRegistry
+from services.stage_scheduler import stage_scheduler
+
+TRACE_PATH = os.path.join(tempfile.gettempdir(), "eshtri_test_traces.jsonl")
+
+
+def _read_spans():
+    with open(TRACE_PATH, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 1, "One line per trace"
+    return lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+
+
+def test_nested_spans_are_exported():
+    if os.path.exists(TRACE_PATH):
+        os.remove(TRACE_PATH)
+    tracer = Tracer(TRACE_PATH)
+    registry = MetricsRegistry()
+    # metrics stages open spans on the global tracer; use a local one for the file
+    import services.metrics_service as metrics_module
+    global_tracer, metrics_module.tracer = metrics_module.tracer, tracer
+    try:
+        with tracer.start_trace("POST /api/chat", **{"session.id": "t1"}) as root:
+            with registry.stage("agent_invoke"):
+                with tracer.span("db_execute", **{"db.statement": "SELECT 1"}):
+                    time.sleep(0.001)
+                # Stages on the scheduler's threads nest under the span that started them
+                stage_scheduler.run({
+                    "a": lambda: registry.timed("translation")(time.sleep)(0.001),
+                    "b": lambda: registry.timed("translation")(time.sleep)(0.001),
+                })
+            trace_id = root.trace_id
+    finally:
+        metrics_module.tracer = global_tracer
+
+    spans = _read_spans()
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span["name"], []).append(span)
+    print([span["name"] for span in spans])
+
+    assert len(trace_id) == 32 and all(span["traceId"] == trace_id for span in spans)
+    root_span = by_name["POST /api/chat"][0]
+    invoke = by_name["agent_invoke"][0]
+    assert "parentSpanId" not in root_span
+    assert invoke["parentSpanId"] == root_span["spanId"]
+    assert by_name["db_execute"][0]["parentSpanId"] == invoke["spanId"]
+    assert {"key": "db.statement", "value": {"stringValue": "SELECT 1"}} in by_name["db_execute"][0]["attributes"]
+    assert len(by_name["translation"]) == 2
+    assert all(span["parentSpanId"] == invoke["spanId"] for span in by_name["translation"])
+
+
+def test_no_trace_records_nothing():
+    tracer = Tracer(TRACE_PATH)
+    with tracer.span("db_execute") as span:
+        assert span is None
+    assert tracer.current_trace_id() is None
+
+
+def test_slow_requests_only_and_rotation():
+    for suffix in ("", ".1", ".2", ".3"):
+        if os.path.exists(TRACE_PATH + suffix):
+            os.remove(TRACE_PATH + suffix)
+    with Tracer(TRACE_PATH, min_duration_ms=50).start_trace("POST /api/chat"):
+        pass
+    assert not os.path.exists(TRACE_PATH), "Fast requests are not written"
+
+    tracer = Tracer(TRACE_PATH, max_bytes=2000, backup_count=2)
+    for _ in range(30):
+        with tracer.start_trace("POST /api/chat"):
+            with tracer.span("db_execute", **{"db.statement": "SELECT 1"}):
+                pass
+    sizes = [os.path.getsize(TRACE_PATH + suffix) for suffix in ("", ".1", ".2")]
+    print(f"Rotated trace files: {sizes} bytes")
+    assert all(size <= 2000 for size in sizes) and not os.path.exists(TRACE_PATH + ".3")
+
+
+def test_prompts_only_with_debug_logging():
+    assert Tracer(TRACE_PATH).text_attributes("gen_ai.prompt", "عايز شقة في زايد") == {"gen_ai.prompt_length": 16}
+    assert Tracer(TRACE_PATH, include_prompts=True).text_attributes("tool.input", "3 rooms") == {"tool.input": "3 rooms"}
+
+
+if __name__ == "__main__":
+    test_nested_spans_are_exported()
+    test_no_trace_records_nothing()
+    test_slow_requests_only_and_rotation()
+    test_prompts_only_with_debug_logging()
+    print("All tracing tests passed")
@@ -0,0 +1,64 @@
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from langchain_core.documents import Document
+
+from services.vector_index import NumpyVectorIndex
+
+
+def _random_index(n=400, dim=768, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    documents = [Document(page_content=f"chunk {i}") for i in range(n)]
+    return NumpyVectorIndex(documents, vectors), rng
+
+
+def test_exact_top_k_matches_brute_force():
+    index, rng = _random_index()
+    query = rng.normal(size=768)
+
+    results = index.similarity_search_by_vector(query, k=10)
+
+    expected = index.matrix @ (query / np.linalg.norm(query))
+    expected_order = [f"chunk {i}" for i in np.argsort(-expected)[:10]]
+    print(f"Top-3: {[(d.page_content, round(s, 4)) for d, s in results[:3]]}")
+    assert [d.page_content for d, _ in results] == expected_order
+    assert all(-1.0 <= s <= 1.0 for _, s in results)
+
+
+def test_mmr_returns_real_scores_and_diversifies():
+    # Two near-duplicates of the query and one distinct but still relevant chunk
+    query = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    vectors = [[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.7, 0.7, 0.0]]
+    documents = [Document(page_content=name) for name in ("exact", "duplicate", "diverse")]
+    index = NumpyVectorIndex(documents, vectors)
+
+    results = index.max_marginal_relevance_search_by_vector(query, k=2, fetch_k=3, lambda_mult=0.3)
+
+    print(f"MMR: {[(d.page_content, round(s, 4)) for d, s in results]}")
+    assert [d.page_content for d, _ in results] == ["exact", "diverse"]
+    assert results[0][1] > 0.99 and 0.6 < results[1][1] < 0.8, "Scores must be cosine similarities, not placeholders"
+
+
+def test_search_is_sub_millisecond():
+    index, rng = _random_index()
+    query = rng.normal(size=768)
+    index.max_marginal_relevance_search_by_vector(query, k=35, fetch_k=50, lambda_mult=0.3)
+
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        index.similarity_search_by_vector(query, k=35)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / runs
+    print(f"Exact top-k over {len(index)} chunks: {elapsed_ms:.3f} ms")
+    assert elapsed_ms < 5, "Exact search over a few hundred chunks should be well under a few ms"
+
+
+if __name__ == "__main__":
+    test_exact_top_k_matches_brute_force()
+    test_mmr_returns_real_scores_and_diversifies()
+    test_search_is_sub_millisecond()
+    print("✅ PASS")
@@ -0,0 +1,106 @@
+"""
+Break down traced /api/chat requests from the span log.
+
+Usage:
+    python trace_report.py <trace_id> [--file logs/traces.jsonl]
+    python trace_report.py --slowest 5 [--file logs/traces.jsonl]
+
+Reads the OTLP/JSON lines written by services/tracing_service.py and prints
+each trace as an indented span tree with start offsets and durations, so one
+slow turn can be explained after the fact (LLM calls, tools, DB queries,
+translations). The same file can be fed to an OpenTelemetry Collector
+(otlpjsonfile receiver) to view traces in Jaeger or Tempo.
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+from config import settings
+
+SHOWN_ATTRIBUTES = ("db.statement", "tool.input", "tool.input_length", "gen_ai.request.model",
+                    "gen_ai.usage.input_tokens", "gen_ai.usage.output_tokens", "chat.cache_hit")
+
+
+def load_traces(path):
+    """{trace_id: [span, ...]} from an OTLP/JSON lines file."""
+    traces = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource_spans in json.loads(line).get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for span in scope_spans.get("spans", []):
+                        traces[span["traceId"]].append(span)
+    return traces
+
+
+def _attributes(span):
+    values = {}
+    for attribute in span.get("attributes", []):
+        value = attribute["value"]
+        values[attribute["key"]] = next(iter(value.values()), "") if value else ""
+    return values
+
+
+def _duration_ms(span):
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def print_trace(trace_id, spans):
+    children = defaultdict(list)
+    span_ids = {span["spanId"] for span in spans}
+    roots = []
+    for span in sorted(spans, key=lambda s: int(s["startTimeUnixNano"])):
+        parent = span.get("parentSpanId")
+        if parent and parent in span_ids:
+            children[parent].append(span)
+        else:
+            roots.append(span)
+
+    origin = min(int(span["startTimeUnixNano"]) for span in spans)
+    total = max(_duration_ms(span) for span in roots)
+    print(f"\nTrace {trace_id}  ({len(spans)} spans, {total:.0f} ms)")
+
+    def walk(span, depth):
+        offset = (int(span["startTimeUnixNano"]) - origin) / 1e6
+        error = " ERROR" if span.get("status", {}).get("code") == 2 else ""
+        print(f"  {offset:8.1f} ms {_duration_ms(span):9.1f} ms  {'  ' * depth}{span['name']}{error}")
+        attributes = _attributes(span)
+        for key in SHOWN_ATTRIBUTES:
+            if key in attributes:
+                text = " ".join(str(attributes[key]).split())
+                print(f"  {'':28}{'  ' * depth}  {key}={text[:120]}")
+        for child in children[span["spanId"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace_id", nargs="?", help="Trace ID from the X-Trace-Id header / trace_id field")
+    parser.add_argument("--file", default=settings.trace_log_path, help="Span log (default: TRACE_LOG_PATH)")
+    parser.add_argument("--slowest", type=int, default=0, help="Show the N slowest traces instead")
+    args = parser.parse_args(argv)
+
+    traces = load_traces(args.file)
+    if args.trace_id:
+        if args.trace_id not in traces:
+            print(f"Trace {args.trace_id} not found in {args.file}")
+            return 1
+        print_trace(args.trace_id, traces[args.trace_id])
+    elif args.slowest:
+        by_duration = sorted(traces.items(), key=lambda item: max(_duration_ms(s) for s in item[1]), reverse=True)
+        for trace_id, spans in by_duration[:args.slowest]:
+            print_trace(trace_id, spans)
+    else:
+        parser.print_usage()
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))